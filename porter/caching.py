@@ -0,0 +1,189 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, AnyStr, Dict, Hashable, NamedTuple, Optional, Tuple
+
+from eth_typing import ChecksumAddress
+from eth_utils import to_checksum_address as _to_checksum_address
+from nucypher_core import RetrievalKit, TreasureMap
+from nucypher_core.umbral import PublicKey, VerifiedCapsuleFrag
+
+
+CHECKSUM_ADDRESS_CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=CHECKSUM_ADDRESS_CACHE_SIZE)
+def _cached_checksum_address(value: AnyStr) -> ChecksumAddress:
+    return _to_checksum_address(value)
+
+
+def to_checksum_address(value) -> ChecksumAddress:
+    """
+    Memoized ``eth_utils.to_checksum_address``; addresses passed as strings or bytes are only hashed
+    (keccak) the first time they are seen.
+    """
+    if isinstance(value, (str, bytes)):
+        return _cached_checksum_address(value)
+    return _to_checksum_address(value)
+
+
+class CacheStats(NamedTuple):
+    """Point-in-time view of a cache's usage."""
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+    evictions: int  # entries removed to make room, or because they expired
+
+
+class LRUCache:
+    """
+    Thread-safe, bounded cache which evicts the least recently used entry once full. If a TTL is
+    specified, entries also expire once they are older than the TTL.
+    """
+
+    def __init__(self, max_size: int, ttl: Optional[float] = None):
+        if max_size <= 0:
+            raise ValueError(f"Cache size must be positive, not {max_size}")
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: Dict[Hashable, Tuple[float, Any]] = OrderedDict()  # key -> (expiry, value)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at >= time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._entries[key]
+                self._evictions += 1
+            self._misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        expires_at = (time.monotonic() + self.ttl) if self.ttl is not None else float('inf')
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(size=len(self._entries),
+                              max_size=self.max_size,
+                              hits=self._hits,
+                              misses=self._misses,
+                              evictions=self._evictions)
+
+
+class IdentityLRUCache(LRUCache):
+    """
+    LRUCache keyed on the identity of objects, for objects which are costly (or impossible) to hash by
+    value. Entries reference their object, so that its id can't be reused by another object while the
+    entry is cached.
+    """
+
+    def get(self, obj: Any, default: Any = None) -> Any:
+        entry = super().get(id(obj))
+        if entry is None or entry[0] is not obj:
+            return default
+        return entry[1]
+
+    def put(self, obj: Any, value: Any) -> None:
+        super().put(id(obj), (obj, value))
+
+
+TREASURE_MAP_DIGEST_CACHE_SIZE = 256
+
+_treasure_map_digests = IdentityLRUCache(max_size=TREASURE_MAP_DIGEST_CACHE_SIZE)  # TreasureMap -> digest
+
+
+def record_treasure_map_digest(treasure_map: TreasureMap, digest: bytes) -> None:
+    """Records a digest of the treasure map's content, e.g. computed when it was parsed."""
+    _treasure_map_digests.put(treasure_map, digest)
+
+
+def treasure_map_digest(treasure_map: TreasureMap) -> bytes:
+    """
+    Digest identifying the content of the treasure map. The digest recorded for the map is used if
+    there is one; otherwise the map is serialized and hashed once, and the result recorded.
+    """
+    digest = _treasure_map_digests.get(treasure_map)
+    if digest is not None:
+        return digest
+    digest = hashlib.sha256(bytes(treasure_map)).digest()
+    record_treasure_map_digest(treasure_map, digest)
+    return digest
+
+
+class CFragCache(LRUCache):
+    """
+    Cache of the verified cfrags obtained from each Ursula, so that retrievals of the same capsules
+    by the same Bob don't make Ursulas redo the same reencryptions. Cfrags are keyed on the policy,
+    capsule, Ursula, Bob's encrypting key, and the retrieval context. Cfrags for capsules with
+    conditions are only cached if ``cache_conditions`` is set, since conditions may no longer be
+    satisfied later on.
+    """
+
+    DEFAULT_MAX_SIZE = 10_000
+    DEFAULT_TTL = 60  # seconds
+
+    def __init__(self,
+                 max_size: int = DEFAULT_MAX_SIZE,
+                 ttl: float = DEFAULT_TTL,
+                 cache_conditions: bool = False):
+        super().__init__(max_size=max_size, ttl=ttl)
+        self.cache_conditions = cache_conditions
+
+    @staticmethod
+    def retrieval_key(treasure_map: TreasureMap, bob_encrypting_key: PublicKey, context: Optional[Dict]) -> bytes:
+        """Key for the parts of a retrieval shared by all of its retrieval kits."""
+        digest = hashlib.sha256()
+        for item in (bytes(treasure_map.hrac), bytes(bob_encrypting_key)):
+            digest.update(len(item).to_bytes(4, 'big'))
+            digest.update(item)
+        digest.update(json.dumps(context or dict(), sort_keys=True).encode())
+        return digest.digest()
+
+    def is_cacheable(self, retrieval_kit: RetrievalKit) -> bool:
+        return not retrieval_kit.conditions or self.cache_conditions
+
+    @staticmethod
+    def _key(retrieval_key: bytes, retrieval_kit: RetrievalKit, ursula_address: ChecksumAddress) -> Hashable:
+        conditions = str(retrieval_kit.conditions) if retrieval_kit.conditions else None
+        return retrieval_key, bytes(retrieval_kit.capsule), conditions, ursula_address
+
+    def get_cfrag(self,
+                  retrieval_key: bytes,
+                  retrieval_kit: RetrievalKit,
+                  ursula_address: ChecksumAddress) -> Optional[VerifiedCapsuleFrag]:
+        if not self.is_cacheable(retrieval_kit):
+            return None
+        return self.get(self._key(retrieval_key, retrieval_kit, ursula_address))
+
+    def put_cfrag(self,
+                  retrieval_key: bytes,
+                  retrieval_kit: RetrievalKit,
+                  ursula_address: ChecksumAddress,
+                  cfrag: VerifiedCapsuleFrag) -> None:
+        if self.is_cacheable(retrieval_kit):
+            self.put(self._key(retrieval_key, retrieval_kit, ursula_address), cfrag)
@@ -17,6 +17,7 @@ from nucypher.cli.types import NETWORK_PORT
 from nucypher.cli.utils import setup_emitter, get_registry
 from nucypher.config.constants import TEMPORARY_DOMAIN
 
+from porter.caching import CFragCache
 from porter.cli.literature import (
     PORTER_BASIC_AUTH_ENABLED,
     PORTER_BASIC_AUTH_REQUIRES_HTTPS,
@@ -25,6 +26,7 @@ from porter.cli.literature import (
     PORTER_RUN_MESSAGE
 )
 from porter.main import Porter, BANNER
+from porter.middleware import CertificateCache
 
 
 @click.group()
@@ -50,6 +52,14 @@ def porter():
 @click.option('--allow-origins', help="The CORS origin(s) comma-delimited list of strings/regexes for origins to allow - no origins allowed by default", type=click.STRING)
 @click.option('--dry-run', '-x', help="Execute normally without actually starting Porter", is_flag=True)
 @click.option('--eager', help="Start learning and scraping the network before starting up other services", is_flag=True, default=True)
+@click.option('--warm-sample-quantity', help="Ursula sample quantity to pre-sample in the background for plain sampling requests", type=click.IntRange(min=1), multiple=True)
+@click.option('--certificate-cache-dir', help="Directory in which Ursula TLS certificates are cached across restarts", type=click.Path(file_okay=False, path_type=Path), default=CertificateCache.DEFAULT_CERTIFICATES_DIR)
+@click.option('--no-request-thread-learning', help="Don't learn about nodes on request threads; fail fast if too few nodes are known", is_flag=True)
+@click.option('--verification-processes', help="Number of worker processes in which to verify cfrags - cfrags are verified on request threads by default", type=click.IntRange(min=1))
+@click.option('--reencryption-batch-window', help="Seconds to hold reencryption requests to the same Ursula so that concurrent retrievals of a policy are merged - disabled by default", type=click.FloatRange(min=0))
+@click.option('--cfrag-cache-size', help="Maximum number of retrieved cfrags to cache for reuse by later retrievals - disabled by default", type=click.IntRange(min=1))
+@click.option('--cfrag-cache-ttl', help="Seconds for which cached cfrags are reused", type=click.FloatRange(min=0), default=CFragCache.DEFAULT_TTL)
+@click.option('--cache-conditional-cfrags', help="Also cache cfrags of retrieval kits with conditions; conditions are then only re-evaluated once cached cfrags expire", is_flag=True)
 def run(general_config,
         network,
         eth_provider_uri,
@@ -63,7 +73,15 @@ def run(general_config,
         basic_auth_filepath,
         allow_origins,
         dry_run,
-        eager):
+        eager,
+        warm_sample_quantity,
+        certificate_cache_dir,
+        no_request_thread_learning,
+        verification_processes,
+        reencryption_batch_window,
+        cfrag_cache_size,
+        cfrag_cache_ttl,
+        cache_conditional_cfrags):
     """Start Porter's Web controller."""
     emitter = setup_emitter(general_config, banner=BANNER)
 
@@ -91,7 +109,15 @@ def run(general_config,
                         start_learning_now=eager,
                         known_nodes={teacher},
                         verify_node_bonding=False,
-                        federated_only=True)
+                        federated_only=True,
+                        warm_sample_quantities=warm_sample_quantity,
+                        learn_on_request_thread=not no_request_thread_learning,
+                        certificate_cache_dir=certificate_cache_dir,
+                        reencryption_batch_window=reencryption_batch_window,
+                        verification_processes=verification_processes,
+                        cfrag_cache_size=cfrag_cache_size,
+                        cfrag_cache_ttl=cfrag_cache_ttl,
+                        cache_conditional_cfrags=cache_conditional_cfrags)
     else:
         # decentralized/blockchain
         if not eth_provider_uri:
@@ -114,7 +140,15 @@ def run(general_config,
                         known_nodes={teacher} if teacher else None,
                         registry=registry,
                         start_learning_now=eager,
-                        eth_provider_uri=eth_provider_uri)
+                        eth_provider_uri=eth_provider_uri,
+                        warm_sample_quantities=warm_sample_quantity,
+                        learn_on_request_thread=not no_request_thread_learning,
+                        certificate_cache_dir=certificate_cache_dir,
+                        reencryption_batch_window=reencryption_batch_window,
+                        verification_processes=verification_processes,
+                        cfrag_cache_size=cfrag_cache_size,
+                        cfrag_cache_ttl=cfrag_cache_ttl,
+                        cache_conditional_cfrags=cache_conditional_cfrags)
 
     emitter.message(f"Network: {PORTER.domain.capitalize()}", color='green')
     if not federated_only:
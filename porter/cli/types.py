@@ -1,5 +1,6 @@
 import click
-from eth_utils import to_checksum_address
+
+from porter.caching import to_checksum_address
 
 
 class ChecksumAddress(click.ParamType):
@@ -0,0 +1,326 @@
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Hashable, List, NamedTuple, Optional
+
+from nucypher.utilities.concurrency import WorkerPool
+from nucypher.utilities.logging import Logger
+
+
+class CancellationToken:
+    """
+    Per-request cancellation token. Cancelling it cancels any of the request's tasks that have not
+    started yet, and signals running tasks that their results are no longer needed.
+    """
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._futures: List[Future] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def register(self, future: Future) -> None:
+        with self._lock:
+            if self.cancelled:
+                future.cancel()
+            else:
+                self._futures.append(future)
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancelled.set()
+            futures, self._futures = self._futures, []
+        for future in futures:
+            future.cancel()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into a single execution whose result (or exception)
+    is handed to every caller. If ``remember_results`` is set, completed results are also reused by
+    later calls with the same key.
+    """
+
+    def __init__(self, remember_results: bool = False):
+        self.remember_results = remember_results
+        self._calls: Dict[Hashable, Future] = dict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            future = self._calls.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not is_leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if not self.remember_results:
+                with self._lock:
+                    self._calls.pop(key, None)
+
+
+class ExecutorStats(NamedTuple):
+    """Point-in-time view of the shared executor's load."""
+    max_workers: int
+    threads: int
+    active: int
+    queued: int
+    completed: int
+
+
+class SharedExecutor:
+    """Bounded, long-lived thread pool shared by all Porter requests."""
+
+    DEFAULT_MAX_WORKERS = 32
+    THREAD_NAME_PREFIX = "porter-worker"
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=self.THREAD_NAME_PREFIX)
+        self._lock = threading.Lock()
+        self._thread_ids = set()
+        self._submitted = 0
+        self._active = 0
+        self._completed = 0
+
+    def _run(self, fn: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            self._thread_ids.add(threading.get_ident())
+            self._active += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._completed += 1
+
+    def submit(self, fn: Callable, *args, token: Optional[CancellationToken] = None, **kwargs) -> Future:
+        with self._lock:
+            self._submitted += 1
+        future = self._executor.submit(self._run, fn, *args, **kwargs)
+        future.add_done_callback(self._count_cancelled)
+        if token is not None:
+            token.register(future)
+        return future
+
+    def _count_cancelled(self, future: Future) -> None:
+        if future.cancelled():
+            with self._lock:
+                self._completed += 1
+
+    def stats(self) -> ExecutorStats:
+        with self._lock:
+            return ExecutorStats(max_workers=self.max_workers,
+                                 threads=len(self._thread_ids),
+                                 active=self._active,
+                                 queued=self._submitted - self._completed - self._active,
+                                 completed=self._completed)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+
+class LatencyTracker:
+    """Rolling window of observed latencies, used to estimate latency percentiles."""
+
+    DEFAULT_WINDOW_SIZE = 256
+
+    def __init__(self, window_size: int = DEFAULT_WINDOW_SIZE):
+        self._latencies: Deque[float] = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._latencies)
+
+    def record(self, latency: float) -> None:
+        with self._lock:
+            self._latencies.append(latency)
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        """Returns the latency at the given percentile (0-100), or None if nothing was observed yet."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return None
+        index = min(int(len(latencies) * percentile / 100), len(latencies) - 1)
+        return latencies[index]
+
+
+class HedgingPolicy:
+    """
+    Decides how long an outstanding request may run before a hedged request is issued in its place,
+    based on a percentile of observed latencies. Until enough latencies have been observed, a fixed
+    fallback delay is used.
+    """
+
+    DEFAULT_PERCENTILE = 90
+    DEFAULT_FALLBACK_DELAY = 1
+    DEFAULT_MIN_DELAY = 0.05
+    MIN_OBSERVATIONS = 20
+
+    def __init__(self,
+                 latencies: LatencyTracker,
+                 percentile: float = DEFAULT_PERCENTILE,
+                 fallback_delay: float = DEFAULT_FALLBACK_DELAY,
+                 min_delay: float = DEFAULT_MIN_DELAY):
+        self.latencies = latencies
+        self.percentile = percentile
+        self.fallback_delay = fallback_delay
+        self.min_delay = min_delay
+
+    def hedge_delay(self) -> float:
+        if len(self.latencies) < self.MIN_OBSERVATIONS:
+            return self.fallback_delay
+        return max(self.latencies.percentile(self.percentile), self.min_delay)
+
+
+class ExecutorWorkerPool:
+    """
+    Counterpart of nucypher's ``WorkerPool`` that runs its workers on a ``SharedExecutor`` instead of
+    a dedicated thread pool. Enough values are kept in flight to reach ``target_successes``; failed
+    values are replaced as soon as they fail, and, if a hedging policy is provided, a hedged value is
+    started for any value that has been outstanding for longer than the policy's delay. Outstanding
+    work is cancelled as soon as the target is reached.
+    Raises ``WorkerPool.TimedOut`` or ``WorkerPool.OutOfValues`` when the target cannot be reached.
+    """
+
+    def __init__(self,
+                 executor: SharedExecutor,
+                 worker: Callable[[Any], Any],
+                 value_factory: Callable[[int], Optional[List[Any]]],
+                 target_successes: int,
+                 timeout: float,
+                 hedging: Optional[HedgingPolicy] = None):
+        self._executor = executor
+        self._worker = worker
+        self._value_factory = value_factory
+        self._target_successes = target_successes
+        self._timeout = timeout
+        self._hedging = hedging
+
+        self.token = CancellationToken()
+        self._condition = threading.Condition()
+        self._successes: Dict[Any, Any] = dict()
+        self._failures: Dict[Any, Any] = dict()
+        self._in_flight: Dict[Any, float] = dict()  # value -> monotonic dispatch time
+        self._hedged = set()  # in flight values for which a hedge was already started
+        self._spare_values: Deque[Any] = deque()
+        self._out_of_values = False
+        self._started_at = None
+
+        self.log = Logger(self.__class__.__name__)
+
+    def _worker_wrapper(self, value: Any) -> None:
+        if self.token.cancelled:
+            return
+        try:
+            result = self._worker(value)
+        except Exception:
+            with self._condition:
+                self._in_flight.pop(value, None)
+                self._failures[value] = sys.exc_info()
+                self._condition.notify_all()
+        else:
+            with self._condition:
+                self._in_flight.pop(value, None)
+                if len(self._successes) < self._target_successes:
+                    self._successes[value] = result
+                self._condition.notify_all()
+
+    def _next_value(self) -> Optional[Any]:
+        # must be called with the condition held
+        if not self._spare_values and not self._out_of_values:
+            batch = self._value_factory(len(self._successes))
+            if batch:
+                self._spare_values.extend(batch)
+            else:
+                self._out_of_values = True
+        return self._spare_values.popleft() if self._spare_values else None
+
+    def _dispatch(self, count: int) -> None:
+        # must be called with the condition held
+        for _ in range(count):
+            value = self._next_value()
+            if value is None:
+                return
+            self._in_flight[value] = time.monotonic()
+            self._executor.submit(self._worker_wrapper, value, token=self.token)
+
+    def _hedge(self, now: float) -> Optional[float]:
+        """Starts hedged values for slow values; returns the next time at which a hedge may be needed."""
+        # must be called with the condition held
+        hedge_delay = self._hedging.hedge_delay()
+        max_in_flight = 2 * (self._target_successes - len(self._successes))
+        next_hedge_at = None
+        for value, dispatched_at in list(self._in_flight.items()):
+            if value in self._hedged:
+                continue
+            hedge_at = dispatched_at + hedge_delay
+            if hedge_at <= now:
+                if len(self._in_flight) >= max_in_flight:
+                    break
+                self._hedged.add(value)
+                self._dispatch(1)
+                # the hedge itself may need hedging later on
+                hedge_at = now + hedge_delay
+            if next_hedge_at is None or hedge_at < next_hedge_at:
+                next_hedge_at = hedge_at
+        return next_hedge_at
+
+    def start(self) -> None:
+        with self._condition:
+            self._started_at = time.monotonic()
+            self._dispatch(self._target_successes)
+
+    def get_failures(self) -> Dict:
+        with self._condition:
+            return dict(self._failures)
+
+    def block_until_target_successes(self) -> Dict:
+        deadline = self._started_at + self._timeout
+        with self._condition:
+            while len(self._successes) < self._target_successes:
+                now = time.monotonic()
+                if now >= deadline:
+                    raise WorkerPool.TimedOut(timeout=self._timeout, failures=dict(self._failures))
+
+                # replace failures
+                shortfall = self._target_successes - len(self._successes) - len(self._in_flight)
+                if shortfall > 0:
+                    self._dispatch(shortfall)
+                if not self._in_flight:
+                    raise WorkerPool.OutOfValues(failures=dict(self._failures))
+
+                wake_at = deadline
+                if self._hedging:
+                    next_hedge_at = self._hedge(now)
+                    if next_hedge_at is not None:
+                        wake_at = min(wake_at, next_hedge_at)
+                self._condition.wait(timeout=max(wake_at - now, 0))
+
+            # losers are no longer needed
+            self.token.cancel()
+            return dict(self._successes)
+
+    def cancel(self) -> None:
+        self.token.cancel()
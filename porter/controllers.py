@@ -1,6 +1,154 @@
+from contextvars import ContextVar
+from http import HTTPStatus
+from typing import Any, Callable, Dict, Iterable, Iterator, NamedTuple, Optional, Union
 
-from nucypher.control.controllers import CLIController
-from nucypher.control.emitters import StdoutEmitter
+from nucypher.control.controllers import CLIController, WebController
+from nucypher.control.emitters import StdoutEmitter, WebEmitter
+from porter.fields.base import is_raw_bytes_representation, raw_bytes_representation
+from porter.fields.exceptions import InvalidInputData
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_CONTENT_TYPE = "application/json"
+MSGPACK_CONTENT_TYPE = "application/msgpack"
+
+# whether the request being handled was sent as msgpack
+_msgpack_request = ContextVar('msgpack_request', default=False)
+
+
+class StreamedResponse(NamedTuple):
+    """Response records that are sent to the client one at a time, as they become available."""
+    records: Iterable[Dict]
+
+
+class _DecodedRequest(NamedTuple):
+    """Stand-in for a request whose body was already decoded, and merged with its query string parameters."""
+    args: Dict
+    data: bytes = b''
+
+
+class PorterWebEmitter(WebEmitter):
+    """
+    Web emitter that also supports streamed responses, and msgpack responses when byte
+    representations are serialized as raw bytes.
+    """
+
+    STREAMED_CONTENT_TYPE = "application/x-ndjson"
+
+    @staticmethod
+    def msgpack_serializer(response: Dict) -> bytes:
+        return msgpack.packb(response, use_bin_type=True)
+
+    def respond(self, json_response):
+        binary = is_raw_bytes_representation()
+        if isinstance(json_response, StreamedResponse):
+            serializer = self.msgpack_serializer if binary else self._ndjson_serializer
+            content_type = MSGPACK_CONTENT_TYPE if binary else self.STREAMED_CONTENT_TYPE
+            return self.sink(response=self._stream(json_response.records, serializer=serializer),
+                             status=HTTPStatus.OK,
+                             content_type=content_type)
+        if binary:
+            assembled_response = self.assemble_response(response=json_response)
+            return self.sink(response=self.msgpack_serializer(assembled_response),
+                             status=HTTPStatus.OK,
+                             content_type=MSGPACK_CONTENT_TYPE)
+        return super().respond(json_response=json_response)
+
+    @staticmethod
+    def _ndjson_serializer(response: Dict) -> str:
+        return WebEmitter.transport_serializer(response) + "\n"
+
+    def _stream(self,
+                records: Iterable[Dict],
+                serializer: Callable[[Dict], Union[str, bytes]]) -> Iterator[Union[str, bytes]]:
+        try:
+            for record in records:
+                assembled_record = self.assemble_response(response=record)
+                yield serializer(assembled_record)
+        except Exception as e:
+            if self.crash_on_error:
+                raise
+            # the status code was already sent; end the stream with an error record instead
+            self._log_exception(e, error_message='STREAM INTERRUPTED', log_level='warn', response_code=HTTPStatus.OK)
+            failure_message = str(e) or type(e).__name__
+            # same envelope as the records before it, and as exception_with_response
+            yield serializer(self.assemble_response(response={'failure_message': failure_message}))
+
+
+class PorterWebController(WebController):
+    """
+    Web controller that also supports:
+    - interface methods which return an iterator of records; each record is serialized and streamed
+      to the client as newline-delimited JSON (or consecutive msgpack objects).
+    - msgpack, with raw bytes instead of base64/hex text, as a content-negotiated alternative to JSON
+      for both requests (Content-Type) and responses (Accept). JSON remains the default.
+    """
+
+    _emitter_class = PorterWebEmitter
+
+    def handle_request(self, method_name, control_request, *args, **kwargs):
+        binary_response = msgpack is not None and self._accepts_msgpack(control_request)
+        binary_request = control_request.mimetype == MSGPACK_CONTENT_TYPE
+        if binary_request:
+            try:
+                request_body = self._unpack_msgpack(control_request.get_data())
+            except InvalidInputData as e:
+                return self.emitter.exception(e=e,
+                                              log_level='debug',
+                                              response_code=HTTPStatus.BAD_REQUEST,
+                                              error_message=WebController._captured_status_codes[HTTPStatus.BAD_REQUEST])
+            # same precedence as JSON requests: query string parameters, and then route parameters,
+            # override the body
+            request_body.update(control_request.args)
+            control_request = _DecodedRequest(args=request_body)
+
+        request_token = _msgpack_request.set(binary_request)
+        try:
+            # responses are serialized, and emitted, within the context
+            with raw_bytes_representation(enabled=binary_response):
+                return super().handle_request(method_name, control_request, *args, **kwargs)
+        finally:
+            _msgpack_request.reset(request_token)
+
+    @staticmethod
+    def _unpack_msgpack(data: bytes) -> Dict[str, Any]:
+        if msgpack is None:
+            raise InvalidInputData("msgpack requests are not supported - "
+                                   "run \"pip install nucypher-porter[msgpack]\" and try again.")
+        try:
+            request_body = msgpack.unpackb(data, raw=False) if data else dict()
+        except Exception as e:
+            raise InvalidInputData(f"Invalid msgpack: {e}")
+        if not isinstance(request_body, dict):
+            raise InvalidInputData(f"Unexpected msgpack object type, {type(request_body)}; expected {dict}")
+        return request_body
+
+    @staticmethod
+    def _accepts_msgpack(control_request) -> bool:
+        accept_mimetypes = getattr(control_request, 'accept_mimetypes', None)
+        if not accept_mimetypes:
+            return False
+        return accept_mimetypes.best_match([JSON_CONTENT_TYPE, MSGPACK_CONTENT_TYPE]) == MSGPACK_CONTENT_TYPE
+
+    def _perform_action(self, action: str, request: Optional[dict] = None):
+        method = getattr(self.interface, action, None)
+        serializer = method._schema
+        with raw_bytes_representation(enabled=_msgpack_request.get()):
+            params = serializer.load(request or {})  # input validation will occur here.
+        response = method(**params)
+        if isinstance(response, Iterator):
+            # records are only serialized later on, as they are streamed
+            binary = is_raw_bytes_representation()
+
+            def dump(record):
+                with raw_bytes_representation(enabled=binary):
+                    return serializer.dump(record)
+
+            return StreamedResponse(records=(dump(record) for record in response))
+        return serializer.dump(response)
 
 
 class PorterCLIController(CLIController):
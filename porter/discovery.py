@@ -0,0 +1,95 @@
+import random
+from concurrent.futures import TimeoutError as FuturesTimeoutError, as_completed
+from typing import Iterable, List, Optional, Set
+
+from eth_typing import ChecksumAddress
+from nucypher_core import MetadataResponse, NodeMetadata
+
+from nucypher.network.nodes import NodeSprout
+from nucypher.utilities.logging import Logger
+from porter.caching import to_checksum_address
+from porter.concurrency import CancellationToken, SharedExecutor
+
+
+class NodeDiscovery:
+    """
+    Resolves specific addresses that are not yet known, by querying a few known nodes in parallel
+    for their fleet metadata and remembering only the requested nodes, instead of waiting on
+    general learning rounds.
+    """
+
+    DEFAULT_MAX_TEACHERS = 5  # known nodes queried concurrently for each resolution
+
+    def __init__(self,
+                 learner: 'Learner',
+                 executor: SharedExecutor,
+                 max_teachers: int = DEFAULT_MAX_TEACHERS,
+                 reachability: Optional['ReachabilityTracker'] = None):
+        self.learner = learner
+        self.executor = executor
+        self.max_teachers = max_teachers
+        self.reachability = reachability
+        self.log = Logger(self.__class__.__name__)
+
+    def _select_teachers(self) -> List['Ursula']:
+        teachers = list(self.learner.known_nodes)
+        if self.reachability is not None:
+            # most responsive teachers first
+            teachers.sort(key=lambda node: self.reachability.responsiveness(node.checksum_address), reverse=True)
+        else:
+            random.SystemRandom().shuffle(teachers)
+        return teachers[:self.max_teachers]
+
+    def _query_teacher(self, teacher: 'Ursula') -> List[NodeMetadata]:
+        response = self.learner.network_middleware.get_nodes_via_rest(
+            node=teacher,
+            fleet_state_checksum=self.learner.known_nodes.checksum,
+            announce_nodes=[])
+        metadata = MetadataResponse.from_bytes(response.content)
+        payload = metadata.verify(teacher.stamp.as_umbral_pubkey())
+        return payload.announce_nodes
+
+    def resolve(self, addresses: Iterable[ChecksumAddress], timeout: float) -> Set[ChecksumAddress]:
+        """
+        Adds any of the addresses that are not yet known to the fleet state, if a queried teacher
+        knows about them. Returns the addresses that were resolved.
+        """
+        unknown = {to_checksum_address(address) for address in addresses}
+        unknown = {address for address in unknown if address not in self.learner.known_nodes}
+        if not unknown:
+            return set()
+
+        teachers = self._select_teachers()
+        if not teachers:
+            return set()
+
+        token = CancellationToken()
+        futures = [self.executor.submit(self._query_teacher, teacher, token=token) for teacher in teachers]
+        resolved = set()
+        try:
+            for future in as_completed(futures, timeout=timeout):
+                try:
+                    node_payloads = future.result()
+                except Exception as e:
+                    self.log.debug(f"Unable to obtain metadata from teacher: {e}")
+                    continue
+
+                for node_payload in node_payloads:
+                    sprout = NodeSprout(node_payload)
+                    address = sprout.checksum_address
+                    if address not in unknown or address in resolved:
+                        continue
+                    if self.learner.remember_node(sprout, record_fleet_state=False):
+                        resolved.add(address)
+
+                if resolved == unknown:
+                    break
+        except FuturesTimeoutError:
+            self.log.debug(f"Timed out resolving {len(unknown - resolved)} unknown node(s)")
+        finally:
+            # remaining teacher queries are no longer needed
+            token.cancel()
+
+        if resolved:
+            self.learner.known_nodes.record_fleet_state()
+        return resolved
@@ -1,11 +1,30 @@
 import json
 from base64 import b64decode, b64encode
+from contextlib import contextmanager
+from contextvars import ContextVar
 
 import click
 from marshmallow import fields
 
 from porter.fields.exceptions import InvalidInputData
 
+# byte representations are raw bytes instead of text, for binary wire formats
+_raw_bytes = ContextVar('raw_bytes', default=False)
+
+
+@contextmanager
+def raw_bytes_representation(enabled: bool = True):
+    """Byte representations are (de)serialized as raw bytes, instead of text, within the context."""
+    token = _raw_bytes.set(enabled)
+    try:
+        yield
+    finally:
+        _raw_bytes.reset(token)
+
+
+def is_raw_bytes_representation() -> bool:
+    return _raw_bytes.get()
+
 
 class BaseField:
 
@@ -47,6 +66,10 @@ class Integer(BaseField, fields.Integer):
     click_type = click.INT
 
 
+class Boolean(BaseField, fields.Boolean):
+    click_type = click.BOOL
+
+
 class PositiveInteger(Integer):
     def _validate(self, value):
         if not value > 0:
@@ -54,10 +77,15 @@ class PositiveInteger(Integer):
 
 
 class Base64BytesRepresentation(BaseField, fields.Field):
-    """Serializes/Deserializes any object's byte representation to/from bae64."""
+    """
+    Serializes/Deserializes any object's byte representation to/from bae64; raw bytes are used
+    instead for binary wire formats.
+    """
     def _serialize(self, value, attr, obj, **kwargs):
         try:
             value_bytes = value if isinstance(value, bytes) else bytes(value)
+            if is_raw_bytes_representation():
+                return value_bytes
             return b64encode(value_bytes).decode()
         except Exception as e:
             raise InvalidInputData(
@@ -65,6 +93,8 @@ class Base64BytesRepresentation(BaseField, fields.Field):
             )
 
     def _deserialize(self, value, attr, data, **kwargs):
+        if isinstance(value, bytes) and is_raw_bytes_representation():
+            return value
         try:
             return b64decode(value)
         except ValueError as e:
@@ -1,17 +1,48 @@
 from marshmallow import fields
 from nucypher_core.umbral import PublicKey
 
-from porter.fields.base import BaseField
+from porter.caching import IdentityLRUCache, LRUCache
+from porter.fields.base import BaseField, is_raw_bytes_representation
 from porter.fields.exceptions import InvalidInputData, InvalidNativeDataTypes
 
 
 class Key(BaseField, fields.Field):
+    """
+    Umbral public key, represented as a hexadecimal string.
+    Deserialized keys are interned, so that the same key isn't decompressed again on every request;
+    representations of recently serialized PublicKey objects are cached as well.
+    """
+
+    DEFAULT_CACHE_SIZE = 4096
+
+    cache = LRUCache(max_size=DEFAULT_CACHE_SIZE)  # representation -> PublicKey
+    representation_cache = IdentityLRUCache(max_size=DEFAULT_CACHE_SIZE)  # PublicKey -> (bytes, hex)
 
     def _serialize(self, value, attr, obj, **kwargs):
-        return bytes(value).hex()
+        representations = self.representation_cache.get(value)
+        if representations is None:
+            key_bytes = bytes(value)
+            representations = (key_bytes, key_bytes.hex())
+            self.representation_cache.put(value, representations)
+        key_bytes, key_hex = representations
+        if is_raw_bytes_representation():
+            return key_bytes
+        return key_hex
 
     def _deserialize(self, value, attr, data, **kwargs):
+        raw_bytes = isinstance(value, bytes) and is_raw_bytes_representation()
+        cache_key = (raw_bytes, value) if isinstance(value, (str, bytes)) else None
+        if cache_key is not None:
+            public_key = self.cache.get(cache_key)
+            if public_key is not None:
+                return public_key
+
         try:
-            return PublicKey.from_bytes(bytes.fromhex(value))
+            key_bytes = value if raw_bytes else bytes.fromhex(value)
+            public_key = PublicKey.from_bytes(key_bytes)
         except InvalidNativeDataTypes as e:
-            raise InvalidInputData(f"Could not convert input for {self.name} to an Umbral Key: {e}")
\ No newline at end of file
+            raise InvalidInputData(f"Could not convert input for {self.name} to an Umbral Key: {e}")
+
+        if cache_key is not None:
+            self.cache.put(cache_key, public_key)
+        return public_key
@@ -1,7 +1,9 @@
+import binascii
+
 from nucypher_core import RetrievalKit as RetrievalKitClass
 from nucypher_core.umbral import CapsuleFrag as CapsuleFragClass
 
-from porter.fields.base import Base64BytesRepresentation
+from porter.fields.base import Base64BytesRepresentation, StringList, is_raw_bytes_representation
 from porter.fields.exceptions import InvalidInputData
 
 
@@ -15,6 +17,47 @@ class RetrievalKit(Base64BytesRepresentation):
             raise InvalidInputData(f"Could not convert input for {self.name} to a valid RetrievalKit: {e}")
 
 
+class RetrievalKitList(StringList):
+    """
+    List of retrieval kits, decoded in a single pass over the list instead of item by item through
+    the list's inner field. Repeated kits are only decoded once, and all invalid kits are reported
+    together, by index.
+    """
+
+    MAX_REPORTED_ERRORS = 10
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(RetrievalKit(), *args, **kwargs)
+
+    def _deserialize(self, value, attr, data, **kwargs):
+        if not isinstance(value, list):
+            value = value.split(self.delimiter)
+
+        raw_bytes = is_raw_bytes_representation()
+        decoded_kits = dict()  # representation -> retrieval kit
+        retrieval_kits = []
+        errors = dict()  # index -> error
+        for index, item in enumerate(value):
+            try:
+                retrieval_kit = decoded_kits.get(item)
+                if retrieval_kit is None:
+                    retrieval_kit_bytes = item if (raw_bytes and isinstance(item, bytes)) else binascii.a2b_base64(item)
+                    retrieval_kit = RetrievalKitClass.from_bytes(retrieval_kit_bytes)
+                    decoded_kits[item] = retrieval_kit
+            except Exception as e:
+                errors[index] = e
+                continue
+            retrieval_kits.append(retrieval_kit)
+
+        if errors:
+            reported = "; ".join(f"[{index}] {error}" for index, error in list(errors.items())[:self.MAX_REPORTED_ERRORS])
+            if len(errors) > self.MAX_REPORTED_ERRORS:
+                reported += f"; and {len(errors) - self.MAX_REPORTED_ERRORS} more"
+            raise InvalidInputData(f"Could not convert input for {self.name} to valid RetrievalKits at "
+                                   f"indices {list(errors)}: {reported}")
+        return retrieval_kits
+
+
 class CapsuleFrag(Base64BytesRepresentation):
     def _deserialize(self, value, attr, data, **kwargs):
         try:
@@ -1,16 +1,43 @@
+import hashlib
+
 from nucypher_core import TreasureMap as TreasureMapClass
 
+from porter.caching import LRUCache, record_treasure_map_digest
 from porter.fields.exceptions import InvalidInputData
-from porter.fields.base import Base64BytesRepresentation
+from porter.fields.base import Base64BytesRepresentation, is_raw_bytes_representation
 
 
 class TreasureMap(Base64BytesRepresentation):
     """
     JSON Parameter representation of (unencrypted) TreasureMap.
+    Parsed treasure maps are cached by content, so that repeated requests for the same treasure
+    map get the same TreasureMap object without decoding and parsing it again. The content digest
+    is recorded for the TreasureMap object (see ``porter.caching.treasure_map_digest``).
     """
+
+    DEFAULT_CACHE_SIZE = 256
+
+    cache = LRUCache(max_size=DEFAULT_CACHE_SIZE)  # content digest -> TreasureMap
+
     def _deserialize(self, value, attr, data, **kwargs):
+        cache_key = None
+        if isinstance(value, (str, bytes)):
+            value_bytes = value.encode() if isinstance(value, str) else value
+            digest = hashlib.sha256(value_bytes).digest()
+            cache_key = (is_raw_bytes_representation(), digest)
+            treasure_map = self.cache.get(cache_key)
+            if treasure_map is not None:
+                record_treasure_map_digest(treasure_map, digest)
+                return treasure_map
+
         try:
             treasure_map_bytes = super()._deserialize(value, attr, data, **kwargs)
-            return TreasureMapClass.from_bytes(treasure_map_bytes)
+            treasure_map = TreasureMapClass.from_bytes(treasure_map_bytes)
         except Exception as e:
             raise InvalidInputData(f"Could not convert input for {self.name} to a TreasureMap: {e}") from e
+
+        if cache_key is not None:
+            self.cache.put(cache_key, treasure_map)
+            # reused by retrievals for the map, instead of serializing and hashing it again
+            record_treasure_map_digest(treasure_map, digest)
+        return treasure_map
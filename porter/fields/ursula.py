@@ -1,5 +1,4 @@
-from eth_utils import to_checksum_address
-
+from porter.caching import to_checksum_address
 from porter.cli.types import EIP55_CHECKSUM_ADDRESS
 from porter.fields.base import String
 from porter.fields.exceptions import InvalidInputData
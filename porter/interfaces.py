@@ -1,4 +1,6 @@
-from typing import Dict, List, Optional
+import hashlib
+import json
+from typing import Dict, Iterator, List, Optional
 
 from eth_typing import ChecksumAddress
 from nucypher_core import RetrievalKit, TreasureMap
@@ -6,11 +8,33 @@ from nucypher_core.umbral import PublicKey
 
 from nucypher.control.interfaces import ControlInterface, attach_schema
 from porter import schema
+from porter.caching import treasure_map_digest
+from porter.concurrency import SingleFlight
 
 
 class PorterInterface(ControlInterface):
     def __init__(self, porter: 'Porter' = None, *args, **kwargs):
         super().__init__(implementer=porter, *args, **kwargs)
+        # concurrent identical retrievals wait on a single in-flight retrieval
+        self._retrievals_in_flight = SingleFlight()
+
+    @staticmethod
+    def _retrieval_key(treasure_map: TreasureMap,
+                       retrieval_kits: List[RetrievalKit],
+                       alice_verifying_key: PublicKey,
+                       bob_encrypting_key: PublicKey,
+                       bob_verifying_key: PublicKey,
+                       context: Optional[Dict]) -> bytes:
+        digest = hashlib.sha256()
+        digest.update(len(retrieval_kits).to_bytes(4, 'big'))
+        # the treasure map is identified by its HRAC and content digest, instead of serializing it again
+        treasure_map_items = (bytes(treasure_map.hrac), treasure_map_digest(treasure_map))
+        for item in (*treasure_map_items, *retrieval_kits, alice_verifying_key, bob_encrypting_key, bob_verifying_key):
+            item_bytes = bytes(item)
+            digest.update(len(item_bytes).to_bytes(4, 'big'))
+            digest.update(item_bytes)
+        digest.update(json.dumps(context or dict(), sort_keys=True).encode())
+        return digest.digest()
 
     #
     # Alice Endpoints
@@ -19,16 +43,25 @@ class PorterInterface(ControlInterface):
     def get_ursulas(self,
                     quantity: int,
                     exclude_ursulas: Optional[List[ChecksumAddress]] = None,
-                    include_ursulas: Optional[List[ChecksumAddress]] = None) -> Dict:
+                    include_ursulas: Optional[List[ChecksumAddress]] = None,
+                    latency_aware: bool = False) -> Dict:
         ursulas_info = self.implementer.get_ursulas(
             quantity=quantity,
             exclude_ursulas=exclude_ursulas,
             include_ursulas=include_ursulas,
+            latency_aware=latency_aware,
         )
 
         response_data = {"ursulas": ursulas_info}  # list of UrsulaInfo objects
         return response_data
 
+    @attach_schema(schema.AliceGetUrsulasBatch)
+    def get_ursulas_batch(self, sampling_specs: List[Dict]) -> Dict:
+        ursulas_info = self.implementer.get_ursulas_batch(sampling_specs=sampling_specs)
+
+        response_data = {"ursulas": ursulas_info}  # list of lists of UrsulaInfo objects, one per spec
+        return response_data
+
     @attach_schema(schema.AliceRevoke)
     def revoke(self) -> dict:
         # Steps (analogous to nucypher.character.control.interfaces):
@@ -45,7 +78,15 @@ class PorterInterface(ControlInterface):
                         bob_encrypting_key: PublicKey,
                         bob_verifying_key: PublicKey,
                         context: Optional[Dict] = None) -> Dict:
-        retrieval_outcomes = self.implementer.retrieve_cfrags(
+        retrieval_key = self._retrieval_key(treasure_map=treasure_map,
+                                            retrieval_kits=retrieval_kits,
+                                            alice_verifying_key=alice_verifying_key,
+                                            bob_encrypting_key=bob_encrypting_key,
+                                            bob_verifying_key=bob_verifying_key,
+                                            context=context)
+        retrieval_outcomes = self._retrievals_in_flight.do(
+            retrieval_key,
+            self.implementer.retrieve_cfrags,
             treasure_map=treasure_map,
             retrieval_kits=retrieval_kits,
             alice_verifying_key=alice_verifying_key,
@@ -57,3 +98,31 @@ class PorterInterface(ControlInterface):
             "retrieval_results": retrieval_outcomes
         }  # list of RetrievalOutcome objects
         return response_data
+
+    @attach_schema(schema.BobRetrieveCFragsBatch)
+    def retrieve_cfrags_batch(self, retrievals: List[Dict]) -> Dict:
+        retrieval_outcomes = self.implementer.retrieve_cfrags_batch(retrievals=retrievals)
+        response_data = {
+            "retrieval_results": retrieval_outcomes
+        }  # list, per retrieval, of lists of RetrievalOutcome objects
+        return response_data
+
+    @attach_schema(schema.BobRetrieveCFragsStream)
+    def retrieve_cfrags_stream(self,
+                               treasure_map: TreasureMap,
+                               retrieval_kits: List[RetrievalKit],
+                               alice_verifying_key: PublicKey,
+                               bob_encrypting_key: PublicKey,
+                               bob_verifying_key: PublicKey,
+                               context: Optional[Dict] = None) -> Iterator[Dict]:
+        retrieval_outcomes = self.implementer.retrieve_cfrags_stream(
+            treasure_map=treasure_map,
+            retrieval_kits=retrieval_kits,
+            alice_verifying_key=alice_verifying_key,
+            bob_encrypting_key=bob_encrypting_key,
+            bob_verifying_key=bob_verifying_key,
+            context=context,
+        )
+        # one record per retrieval kit, in order of completion
+        return ({"retrieval_kit_index": index, "cfrags": outcome.cfrags, "errors": outcome.errors}
+                for index, outcome in retrieval_outcomes)
@@ -1,16 +1,17 @@
 
+import threading
 from pathlib import Path
-from typing import Dict, List, NamedTuple, Optional, Sequence
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
 
 from constant_sorrow.constants import (
     NO_BLOCKCHAIN_CONNECTION,
     NO_CONTROL_PROTOCOL
 )
 from eth_typing import ChecksumAddress
-from eth_utils import to_checksum_address
 from flask import Response, request
 from nucypher_core import RetrievalKit, TreasureMap
 from nucypher_core.umbral import PublicKey
+from twisted.internet import reactor
 
 from nucypher.blockchain.eth.agents import ContractAgency, PREApplicationAgent
 from nucypher.blockchain.eth.interfaces import BlockchainInterfaceFactory
@@ -19,19 +20,34 @@ from nucypher.blockchain.eth.registry import (
     InMemoryContractRegistry,
 )
 from nucypher.characters.lawful import Ursula
-from nucypher.control.controllers import WebController
 from nucypher.crypto.powers import DecryptingPower
 from nucypher.network.nodes import Learner
-from nucypher.network.retrieval import RetrievalClient
-from nucypher.policy.reservoir import (
-    PrefetchStrategy,
-    make_decentralized_staking_provider_reservoir,
-    make_federated_staker_reservoir,
-)
-from nucypher.utilities.concurrency import WorkerPool
+from nucypher.policy.reservoir import PrefetchStrategy
 from nucypher.utilities.logging import Logger
-from porter.controllers import PorterCLIController
+from porter.caching import CFragCache, to_checksum_address
+from porter.concurrency import (
+    ExecutorWorkerPool,
+    HedgingPolicy,
+    LatencyTracker,
+    SharedExecutor,
+    SingleFlight,
+)
+from porter.controllers import PorterCLIController, PorterWebController
+from porter.discovery import NodeDiscovery
 from porter.interfaces import PorterInterface
+from porter.middleware import CertificateCache, PorterMiddlewareClient, PorterRestMiddleware
+from porter.reachability import ReachabilityTracker
+from porter.retrieval import (
+    CFragVerificationPool,
+    PorterRetrievalClient,
+    ReencryptionBatcher,
+    RetrievalRequest,
+)
+from porter.sampling import (
+    KnownNodesSnapshotCache,
+    StakingProvidersSnapshotCache,
+    WarmSamplePool,
+)
 
 BANNER = r"""
 
@@ -53,9 +69,12 @@ class Porter(Learner):
     _SHORT_LEARNING_DELAY = 2
     _LONG_LEARNING_DELAY = 30
     _ROUNDS_WITHOUT_NODES_AFTER_WHICH_TO_SLOW_DOWN = 25
+    _LEARNING_REQUEST_RETRY_DELAY = 0.1  # seconds
 
     DEFAULT_EXECUTION_TIMEOUT = 15  # 15s
 
+    DEFAULT_MAX_WORKERS = SharedExecutor.DEFAULT_MAX_WORKERS
+
     DEFAULT_PORT = 9155
 
     _interface_class = PorterInterface
@@ -66,6 +85,9 @@ class Porter(Learner):
         uri: str
         encrypting_key: PublicKey
 
+    class InsufficientKnownNodes(Learner.NotEnoughNodes):
+        """Raised when request threads may not learn, and not enough nodes became known in time."""
+
     class RetrievalOutcome(NamedTuple):
         """
         Simple object that stores the results and errors of re-encryption operations across
@@ -83,9 +105,55 @@ class Porter(Learner):
                  node_class: object = Ursula,
                  eth_provider_uri: str = None,
                  execution_timeout: int = DEFAULT_EXECUTION_TIMEOUT,
+                 reachability_probe_interval: float = ReachabilityTracker.DEFAULT_PROBE_INTERVAL,
+                 reachability_freshness_window: float = ReachabilityTracker.DEFAULT_FRESHNESS_WINDOW,
+                 sampling_snapshot_ttl: Optional[float] = None,
+                 max_workers: int = DEFAULT_MAX_WORKERS,
+                 warm_sample_quantities: Optional[Sequence[int]] = None,
+                 warm_sample_depth: int = WarmSamplePool.DEFAULT_DEPTH,
+                 warm_sample_max_age: float = WarmSamplePool.DEFAULT_MAX_AGE,
+                 learn_on_request_thread: bool = True,
+                 http_pool_connections: int = PorterMiddlewareClient.DEFAULT_POOL_CONNECTIONS,
+                 http_pool_maxsize: int = PorterMiddlewareClient.DEFAULT_POOL_MAXSIZE,
+                 http_idle_timeout: float = PorterMiddlewareClient.DEFAULT_IDLE_TIMEOUT,
+                 certificate_cache_dir: Path = CertificateCache.DEFAULT_CERTIFICATES_DIR,
+                 max_cached_certificates: int = CertificateCache.DEFAULT_MAX_CERTIFICATES,
+                 reencryption_batch_window: Optional[float] = None,
+                 verification_processes: Optional[int] = None,
+                 cfrag_cache_size: Optional[int] = None,
+                 cfrag_cache_ttl: float = CFragCache.DEFAULT_TTL,
+                 cache_conditional_cfrags: bool = False,
                  *args, **kwargs):
         self.federated_only = federated_only
 
+        # if disabled, request threads only read the fleet state and defer learning to the learning loop
+        self.learn_on_request_thread = learn_on_request_thread
+        self._learning_requested = False
+        self._learning_request_lock = threading.Lock()
+
+        # bounded thread pool shared by all requests
+        self.executor = SharedExecutor(max_workers=max_workers)
+
+        # must exist before learning starts, since background probing is tied to the learning loop
+        self.reachability = ReachabilityTracker(learner=self,
+                                                probe_interval=reachability_probe_interval,
+                                                freshness_window=reachability_freshness_window,
+                                                executor=self.executor)
+        # extra Ursulas are contacted once outstanding ones exceed the observed p90 ping latency
+        self.ping_hedging = HedgingPolicy(latencies=self.reachability.latencies)
+
+        # direct resolution of requested Ursulas that aren't known yet
+        self.node_discovery = NodeDiscovery(learner=self, executor=self.executor, reachability=self.reachability)
+
+        # optional pre-sampling of commonly requested quantities
+        self.warm_samples = None
+        if warm_sample_quantities:
+            self.warm_samples = WarmSamplePool(sampler=self._sample_ursulas,
+                                               quantities=warm_sample_quantities,
+                                               depth=warm_sample_depth,
+                                               max_age=warm_sample_max_age,
+                                               reachability=self.reachability)
+
         if not self.federated_only:
             if not eth_provider_uri:
                 raise ValueError('ETH Provider URI is required for decentralized Porter.')
@@ -95,15 +163,65 @@ class Porter(Learner):
 
             self.registry = registry or InMemoryContractRegistry.from_latest_publication(network=domain)
             self.application_agent = ContractAgency.get_agent(PREApplicationAgent, registry=self.registry)
+            # refreshed per block, unless a TTL is specified
+            self.sampling_cache = StakingProvidersSnapshotCache(application_agent=self.application_agent,
+                                                                ttl=sampling_snapshot_ttl)
         else:
             self.registry = NO_BLOCKCHAIN_CONNECTION.bool_value(False)
             node_class.set_federated_mode(federated_only)
+            # refreshed when the fleet state changes, unless a TTL is specified
+            self.sampling_cache = KnownNodesSnapshotCache(learner=self, ttl=sampling_snapshot_ttl)
+
+        if not kwargs.get('network_middleware'):
+            # keep-alive connections and TLS sessions to each Ursula are reused across requests, and
+            # certificates are cached on disk so that they aren't fetched again after a restart
+            certificate_cache = CertificateCache(certificates_dir=certificate_cache_dir,
+                                                 max_certificates=max_cached_certificates)
+            kwargs['network_middleware'] = PorterRestMiddleware(registry=None if self.federated_only else self.registry,
+                                                                pool_connections=http_pool_connections,
+                                                                pool_maxsize=http_pool_maxsize,
+                                                                idle_timeout=http_idle_timeout,
+                                                                certificate_cache=certificate_cache)
 
         super().__init__(save_metadata=True, domain=domain, node_class=node_class, *args, **kwargs)
 
         self.log = Logger(self.__class__.__name__)
         self.execution_timeout = execution_timeout
 
+        # optionally, requests to the same Ursula from concurrent retrievals of the same policy are merged
+        self.reencryption_batcher = None
+        if reencryption_batch_window:
+            self.reencryption_batcher = ReencryptionBatcher(window=reencryption_batch_window)
+
+        # optionally, cfrags are verified in worker processes instead of on request threads
+        self.verification_pool = None
+        if verification_processes:
+            self.verification_pool = CFragVerificationPool(max_workers=verification_processes)
+
+        # optionally, cfrags are reused across retrievals of the same capsules by the same Bob
+        self.cfrag_cache = None
+        if cfrag_cache_size:
+            self.cfrag_cache = CFragCache(max_size=cfrag_cache_size,
+                                          ttl=cfrag_cache_ttl,
+                                          cache_conditions=cache_conditional_cfrags)
+
+        # spare Ursulas are contacted once outstanding reencryption requests exceed the observed p90 latency
+        self.reencryption_hedging = HedgingPolicy(latencies=LatencyTracker())
+
+        # long-lived retrieval engine shared by all retrieval requests; responsive Ursulas are contacted first
+        self.retrieval_client = PorterRetrievalClient(self,
+                                                      executor=self.executor,
+                                                      timeout=self.execution_timeout,
+                                                      batcher=self.reencryption_batcher,
+                                                      hedging=self.reencryption_hedging,
+                                                      reachability=self.reachability,
+                                                      verification_pool=self.verification_pool,
+                                                      cfrag_cache=self.cfrag_cache)
+
+        # resources that outlive individual requests are released on shutdown
+        self._shut_down = False
+        reactor.addSystemEventTrigger('before', 'shutdown', self.shutdown)
+
         # Controller Interface
         self.interface = self._interface_class(porter=self)
         self.controller = NO_CONTROL_PROTOCOL
@@ -115,42 +233,120 @@ class Porter(Learner):
     def get_ursulas(self,
                     quantity: int,
                     exclude_ursulas: Optional[Sequence[ChecksumAddress]] = None,
-                    include_ursulas: Optional[Sequence[ChecksumAddress]] = None) -> List[UrsulaInfo]:
-        reservoir = self._make_reservoir(quantity, exclude_ursulas, include_ursulas)
-        value_factory = PrefetchStrategy(reservoir, quantity)
+                    include_ursulas: Optional[Sequence[ChecksumAddress]] = None,
+                    latency_aware: bool = False) -> List[UrsulaInfo]:
+        if self.warm_samples and not (exclude_ursulas or include_ursulas or latency_aware):
+            ursulas_info = self.warm_samples.take(quantity)
+            if ursulas_info:
+                return ursulas_info
+
+        return self._sample_ursulas(quantity=quantity,
+                                    exclude_ursulas=exclude_ursulas,
+                                    include_ursulas=include_ursulas,
+                                    latency_aware=latency_aware)
+
+    def get_ursulas_batch(self, sampling_specs: Sequence[Dict]) -> List[List[UrsulaInfo]]:
+        """
+        Performs several independent samples in one pass; each sampling spec has the same
+        parameters as get_ursulas. Results are returned in the order of the specs.
+        """
+        # each Ursula is checked for reachability at most once for the whole batch
+        shared_checks = SingleFlight(remember_results=True)
 
         def get_ursula_info(ursula_address) -> Porter.UrsulaInfo:
-            if to_checksum_address(ursula_address) not in self.known_nodes:
-                raise ValueError(f"{ursula_address} is not known")
+            return shared_checks.do(ursula_address, self._get_ursula_info, ursula_address)
 
-            ursula_address = to_checksum_address(ursula_address)
-            ursula = self.known_nodes[ursula_address]
-            try:
-                # ensure node is up and reachable
-                self.network_middleware.ping(ursula)
-                return Porter.UrsulaInfo(checksum_address=ursula_address,
-                                         uri=f"{ursula.rest_interface.formal_uri}",
-                                         encrypting_key=ursula.public_keys(DecryptingPower))
-            except Exception as e:
-                self.log.debug(f"Ursula ({ursula_address}) is unreachable: {str(e)}")
-                raise
-
-        self.block_until_number_of_known_nodes_is(quantity,
-                                                  timeout=self.execution_timeout,
-                                                  learn_on_this_thread=True,
-                                                  eager=True)
-
-        worker_pool = WorkerPool(worker=get_ursula_info,
-                                 value_factory=value_factory,
-                                 target_successes=quantity,
-                                 timeout=self.execution_timeout,
-                                 stagger_timeout=1)
+        results = [None] * len(sampling_specs)
+        if not sampling_specs:
+            return results
+
+        largest_quantity = max(spec['quantity'] for spec in sampling_specs)
+        self._wait_for_known_nodes(largest_quantity, eager=True)
+        all_include_ursulas = {address for spec in sampling_specs for address in spec.get('include_ursulas') or ()}
+        if all_include_ursulas:
+            self.node_discovery.resolve(all_include_ursulas, timeout=self.execution_timeout)
+
+        worker_pools = []
+        try:
+            # start all samples before waiting on any of them
+            for index, spec in enumerate(sampling_specs):
+                quantity = spec['quantity']
+                exclude_ursulas = spec.get('exclude_ursulas')
+                include_ursulas = spec.get('include_ursulas')
+                latency_aware = spec.get('latency_aware', False)
+                if self.warm_samples and not (exclude_ursulas or include_ursulas or latency_aware):
+                    results[index] = self.warm_samples.take(quantity)
+                    if results[index]:
+                        continue
+
+                worker_pool = self._start_sampling(quantity=quantity,
+                                                   exclude_ursulas=exclude_ursulas,
+                                                   include_ursulas=include_ursulas,
+                                                   latency_aware=latency_aware,
+                                                   worker=get_ursula_info)
+                worker_pools.append((index, worker_pool))
+
+            for index, worker_pool in worker_pools:
+                successes = worker_pool.block_until_target_successes()
+                results[index] = list(successes.values())
+        finally:
+            for _, worker_pool in worker_pools:
+                worker_pool.cancel()
+
+        return results
+
+    def _get_ursula_info(self, ursula_address: ChecksumAddress) -> UrsulaInfo:
+        ursula_address = to_checksum_address(ursula_address)
+        if ursula_address not in self.known_nodes:
+            raise ValueError(f"{ursula_address} is not known")
+
+        ursula = self.known_nodes[ursula_address]
+        try:
+            # ensure node is up and reachable; only pings if the last known status is stale
+            self.reachability.check(ursula)
+            return Porter.UrsulaInfo(checksum_address=ursula_address,
+                                     uri=f"{ursula.rest_interface.formal_uri}",
+                                     encrypting_key=ursula.public_keys(DecryptingPower))
+        except Exception as e:
+            self.log.debug(f"Ursula ({ursula_address}) is unreachable: {str(e)}")
+            raise
+
+    def _start_sampling(self,
+                        quantity: int,
+                        exclude_ursulas: Optional[Sequence[ChecksumAddress]],
+                        include_ursulas: Optional[Sequence[ChecksumAddress]],
+                        latency_aware: bool,
+                        worker: Callable[[ChecksumAddress], UrsulaInfo]) -> ExecutorWorkerPool:
+        reservoir = self._make_reservoir(quantity, exclude_ursulas, include_ursulas, latency_aware)
+        value_factory = PrefetchStrategy(reservoir, quantity)
+        worker_pool = ExecutorWorkerPool(executor=self.executor,
+                                         worker=worker,
+                                         value_factory=value_factory,
+                                         target_successes=quantity,
+                                         timeout=self.execution_timeout,
+                                         hedging=self.ping_hedging)
         worker_pool.start()
+        return worker_pool
+
+    def _sample_ursulas(self,
+                        quantity: int,
+                        exclude_ursulas: Optional[Sequence[ChecksumAddress]] = None,
+                        include_ursulas: Optional[Sequence[ChecksumAddress]] = None,
+                        latency_aware: bool = False) -> List[UrsulaInfo]:
+        self._wait_for_known_nodes(quantity, eager=True)
+        if include_ursulas:
+            self.node_discovery.resolve(include_ursulas, timeout=self.execution_timeout)
+
+        worker_pool = self._start_sampling(quantity=quantity,
+                                           exclude_ursulas=exclude_ursulas,
+                                           include_ursulas=include_ursulas,
+                                           latency_aware=latency_aware,
+                                           worker=self._get_ursula_info)
         try:
             successes = worker_pool.block_until_target_successes()
         finally:
+            # outstanding work for this request is dropped; the executor's threads are reused
             worker_pool.cancel()
-            # don't wait for it to stop by "joining" - too slow...
 
         ursulas_info = successes.values()
         return list(ursulas_info)
@@ -162,9 +358,8 @@ class Porter(Learner):
                         bob_encrypting_key: PublicKey,
                         bob_verifying_key: PublicKey,
                         context: Optional[Dict] = None) -> List[RetrievalOutcome]:
-        client = RetrievalClient(self)
         context = context or dict()  # must not be None
-        results, errors = client.retrieve_cfrags(
+        results = self.retrieval_client.retrieve_cfrags(
             treasure_map,
             retrieval_kits,
             alice_verifying_key,
@@ -173,30 +368,180 @@ class Porter(Learner):
             **context,
         )
         result_outcomes = []
-        for result, error in zip(results, errors):
-            result_outcome = Porter.RetrievalOutcome(
-                cfrags=result.cfrags, errors=error.errors
-            )
+        for cfrags, errors in results:
+            result_outcome = Porter.RetrievalOutcome(cfrags=cfrags, errors=errors)
             result_outcomes.append(result_outcome)
         return result_outcomes
 
+    def retrieve_cfrags_batch(self, retrievals: Sequence[Dict]) -> List[List[RetrievalOutcome]]:
+        """
+        Performs several retrievals, possibly for different treasure maps, in a single pass; each
+        retrieval has the same parameters as retrieve_cfrags. Results are returned in the order of the
+        retrievals.
+        """
+        # retrievals that only differ in their retrieval kits are merged, and duplicate kits are
+        # retrieved once, so that each Ursula gets at most one request per policy at a time
+        merged_requests: Dict[bytes, RetrievalRequest] = dict()
+        merged_kit_indices: Dict[bytes, Dict[bytes, int]] = dict()
+        positions = []  # for each retrieval: merged request key, and index of each of its kits
+        for retrieval in retrievals:
+            context = retrieval.get('context') or dict()  # must not be None
+            request_key = PorterInterface._retrieval_key(treasure_map=retrieval['treasure_map'],
+                                                         retrieval_kits=[],
+                                                         alice_verifying_key=retrieval['alice_verifying_key'],
+                                                         bob_encrypting_key=retrieval['bob_encrypting_key'],
+                                                         bob_verifying_key=retrieval['bob_verifying_key'],
+                                                         context=context)
+            if request_key not in merged_requests:
+                merged_requests[request_key] = RetrievalRequest(treasure_map=retrieval['treasure_map'],
+                                                                retrieval_kits=[],
+                                                                alice_verifying_key=retrieval['alice_verifying_key'],
+                                                                bob_encrypting_key=retrieval['bob_encrypting_key'],
+                                                                bob_verifying_key=retrieval['bob_verifying_key'],
+                                                                context=context)
+                merged_kit_indices[request_key] = dict()
+
+            kit_indices = []
+            for retrieval_kit in retrieval['retrieval_kits']:
+                kit_bytes = bytes(retrieval_kit)
+                if kit_bytes not in merged_kit_indices[request_key]:
+                    merged_kit_indices[request_key][kit_bytes] = len(merged_requests[request_key].retrieval_kits)
+                    merged_requests[request_key].retrieval_kits.append(retrieval_kit)
+                kit_indices.append(merged_kit_indices[request_key][kit_bytes])
+            positions.append((request_key, kit_indices))
+
+        request_keys = list(merged_requests)
+        merged_results = {request_key: dict() for request_key in request_keys}
+        results = self.retrieval_client.iter_retrieve_cfrags_batch([merged_requests[key] for key in request_keys])
+        for request_index, kit_index, cfrags, errors in results:
+            merged_results[request_keys[request_index]][kit_index] = Porter.RetrievalOutcome(cfrags=cfrags, errors=errors)
+
+        return [[merged_results[request_key][kit_index] for kit_index in kit_indices]
+                for request_key, kit_indices in positions]
+
+    def retrieve_cfrags_stream(self,
+                               treasure_map: TreasureMap,
+                               retrieval_kits: Sequence[RetrievalKit],
+                               alice_verifying_key: PublicKey,
+                               bob_encrypting_key: PublicKey,
+                               bob_verifying_key: PublicKey,
+                               context: Optional[Dict] = None) -> Iterator[Tuple[int, RetrievalOutcome]]:
+        """
+        Same as retrieve_cfrags, but yields the index and outcome of each retrieval kit as soon as
+        the kit is complete, instead of waiting for all retrieval kits.
+        """
+        context = context or dict()  # must not be None
+        results = self.retrieval_client.iter_retrieve_cfrags(
+            treasure_map,
+            retrieval_kits,
+            alice_verifying_key,
+            bob_encrypting_key,
+            bob_verifying_key,
+            **context,
+        )
+        return ((index, Porter.RetrievalOutcome(cfrags=cfrags, errors=errors)) for index, cfrags, errors in results)
+
+    def _wait_for_known_nodes(self, quantity: int, eager: bool = False) -> bool:
+        if self.learn_on_request_thread:
+            return self.block_until_number_of_known_nodes_is(quantity,
+                                                             timeout=self.execution_timeout,
+                                                             learn_on_this_thread=True,
+                                                             eager=eager)
+
+        if len(self.known_nodes) >= quantity:
+            return True
+
+        # don't learn on the request thread; ask the learning loop to learn now and wait for it
+        self._request_learning()
+        try:
+            return self.block_until_number_of_known_nodes_is(quantity,
+                                                             timeout=self.execution_timeout,
+                                                             learn_on_this_thread=False)
+        except RuntimeError as e:
+            raise self.InsufficientKnownNodes(f"Insufficient known nodes: {len(self.known_nodes)} known, "
+                                              f"{quantity} needed") from e
+
+    def _request_learning(self) -> None:
+        # concurrent requests are coalesced into a single learning round
+        with self._learning_request_lock:
+            if self._learning_requested:
+                return
+            self._learning_requested = True
+        reactor.callFromThread(self._learn_now)
+
+    def _learn_now(self) -> None:
+        # runs on the reactor's thread; the requested round is run by the learning loop itself, so that
+        # it never overlaps with a scheduled round
+        learning_task = self._learning_task
+        if not learning_task.running:
+            self.log.warn("Learning loop isn't running; can't learn about nodes now.")
+            with self._learning_request_lock:
+                self._learning_requested = False
+            return
+
+        with self._learning_request_lock:
+            if not self._learning_requested:
+                return  # a round started since the request was made
+
+        if learning_task.call is None:
+            # a round is in progress; check again once it is done
+            learning_task.clock.callLater(self._LEARNING_REQUEST_RETRY_DELAY, self._learn_now)
+            return
+
+        # restart the loop's schedule, starting with a round now
+        learning_task.stop()
+        self.learning_deferred = learning_task.start(interval=learning_task.interval, now=True)
+        self.learning_deferred.addErrback(self.handle_learning_errors)
+
+    def keep_learning_about_nodes(self):
+        # each round of the learning loop serves the requests made before it started
+        with self._learning_request_lock:
+            self._learning_requested = False
+        return super().keep_learning_about_nodes()
+
     def _make_reservoir(self,
                         quantity: int,
                         exclude_ursulas: Optional[Sequence[ChecksumAddress]] = None,
-                        include_ursulas: Optional[Sequence[ChecksumAddress]] = None):
+                        include_ursulas: Optional[Sequence[ChecksumAddress]] = None,
+                        latency_aware: bool = False):
         if self.federated_only:
             sample_size = quantity - (len(include_ursulas) if include_ursulas else 0)
-            if not self.block_until_number_of_known_nodes_is(sample_size,
-                                                             timeout=self.execution_timeout,
-                                                             learn_on_this_thread=True):
+            if not self._wait_for_known_nodes(sample_size):
                 raise ValueError("Unable to learn about sufficient Ursulas")
-            return make_federated_staker_reservoir(known_nodes=self.known_nodes,
-                                                   exclude_addresses=exclude_ursulas,
-                                                   include_addresses=include_ursulas)
-        else:
-            return make_decentralized_staking_provider_reservoir(application_agent=self.application_agent,
-                                                                 exclude_addresses=exclude_ursulas,
-                                                                 include_addresses=include_ursulas)
+
+        # bias towards responsive Ursulas using measured RTT and success rate, if requested
+        responsiveness = self.reachability.responsiveness if latency_aware else None
+        return self.sampling_cache.make_reservoir(exclude_addresses=exclude_ursulas,
+                                                  include_addresses=include_ursulas,
+                                                  responsiveness=responsiveness)
+
+    def start_learning_loop(self, *args, **kwargs):
+        super().start_learning_loop(*args, **kwargs)
+        self.reachability.start()
+        if self.warm_samples:
+            self.warm_samples.start()
+
+    def stop_learning_loop(self, *args, **kwargs):
+        if self.warm_samples:
+            self.warm_samples.stop()
+        self.reachability.stop()
+        super().stop_learning_loop(*args, **kwargs)
+
+    def shutdown(self) -> None:
+        """
+        Stops learning, and releases the shared executor, cfrag verification worker processes and
+        pooled HTTP connections. Called when the reactor shuts down.
+        """
+        if self._shut_down:
+            return
+        self._shut_down = True
+        self.stop_learning_loop()
+        self.executor.shutdown(wait=False)
+        if self.verification_pool:
+            self.verification_pool.shutdown(wait=False)
+        middleware_client = getattr(self.network_middleware, 'client', None)
+        if isinstance(middleware_client, PorterMiddlewareClient):
+            middleware_client.close()
 
     def make_cli_controller(self, crash_on_error: bool = False):
         controller = PorterCLIController(app_name=self.APP_NAME,
@@ -209,9 +554,9 @@ class Porter(Learner):
                             crash_on_error: bool = False,
                             htpasswd_filepath: Path = None,
                             cors_allow_origins_list: List[str] = None):
-        controller = WebController(app_name=self.APP_NAME,
-                                   crash_on_error=crash_on_error,
-                                   interface=self._interface_class(porter=self))
+        controller = PorterWebController(app_name=self.APP_NAME,
+                                         crash_on_error=crash_on_error,
+                                         interface=self._interface_class(porter=self))
         self.controller = controller
 
         # Register Flask Decorator
@@ -248,6 +593,12 @@ class Porter(Learner):
             response = controller(method_name='get_ursulas', control_request=request)
             return response
 
+        @porter_flask_control.route('/get_ursulas/batch', methods=['POST'])
+        def get_ursulas_batch() -> Response:
+            """Porter control endpoint for performing several samples of Ursulas at once on behalf of Alice."""
+            response = controller(method_name='get_ursulas_batch', control_request=request)
+            return response
+
         @porter_flask_control.route("/revoke", methods=['POST'])
         def revoke():
             """Porter control endpoint for off-chain revocation of a policy on behalf of Alice."""
@@ -260,4 +611,19 @@ class Porter(Learner):
             response = controller(method_name='retrieve_cfrags', control_request=request)
             return response
 
+        @porter_flask_control.route("/retrieve_cfrags/batch", methods=['POST'])
+        def retrieve_cfrags_batch() -> Response:
+            """Porter control endpoint for executing PRE work orders for several policies at once on behalf of Bob."""
+            response = controller(method_name='retrieve_cfrags_batch', control_request=request)
+            return response
+
+        @porter_flask_control.route("/retrieve_cfrags/stream", methods=['POST'])
+        def retrieve_cfrags_stream() -> Response:
+            """
+            Porter control endpoint for executing a PRE work order on behalf of Bob, which streams the
+            outcome of each retrieval kit as newline-delimited JSON as soon as the kit is complete.
+            """
+            response = controller(method_name='retrieve_cfrags_stream', control_request=request)
+            return response
+
         return controller
@@ -0,0 +1,243 @@
+import os
+import queue
+import ssl
+import tempfile
+import time
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+import requests
+from cryptography.hazmat.primitives.serialization import Encoding
+from cryptography.x509 import Certificate
+from cryptography.x509.oid import NameOID
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPSConnectionPool
+
+from nucypher.config.constants import DEFAULT_CONFIG_ROOT
+from nucypher.network.middleware import NucypherMiddlewareClient, RestMiddleware
+from nucypher.utilities.logging import Logger
+
+
+class CertificateCache:
+    """
+    Bounded on-disk cache of Ursula TLS certificates, keyed on REST interface, which survives
+    restarts. Provides the subset of node storage used by the middleware client; once the cache
+    is full, the oldest certificates are removed.
+    """
+
+    DEFAULT_CERTIFICATES_DIR = DEFAULT_CONFIG_ROOT / 'porter' / 'certificates'
+    DEFAULT_MAX_CERTIFICATES = 4096
+
+    def __init__(self,
+                 certificates_dir: Path = DEFAULT_CERTIFICATES_DIR,
+                 max_certificates: int = DEFAULT_MAX_CERTIFICATES):
+        self.certificates_dir = Path(certificates_dir)
+        self.certificates_dir.mkdir(parents=True, exist_ok=True)
+        self.max_certificates = max_certificates
+        self.log = Logger(self.__class__.__name__)
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(list(self.certificates_dir.glob('*.pem')))
+
+    def generate_certificate_filepath(self, host: str, port: int) -> Path:
+        return self.certificates_dir / f'{host}:{port}.pem'
+
+    def store_node_certificate(self, certificate: Certificate, port: int) -> Path:
+        host = certificate.subject.get_attributes_for_oid(NameOID.COMMON_NAME)[0].value
+        filepath = self.generate_certificate_filepath(host=host, port=port)
+
+        # write atomically, since other threads may be reading the certificate
+        fd, temp_filepath = tempfile.mkstemp(dir=self.certificates_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as certificate_file:
+            certificate_file.write(certificate.public_bytes(Encoding.PEM))
+        os.replace(temp_filepath, filepath)
+
+        self._evict()
+        return filepath
+
+    def _evict(self) -> None:
+        with self._lock:
+            filepaths = list(self.certificates_dir.glob('*.pem'))
+            excess = len(filepaths) - self.max_certificates
+            if excess <= 0:
+                return
+            filepaths.sort(key=lambda filepath: filepath.stat().st_mtime)
+            for filepath in filepaths[:excess]:
+                filepath.unlink(missing_ok=True)
+            self.log.debug(f"Evicted {excess} certificate(s) from the certificate cache")
+
+
+class _SessionRecordingSSLSocket(ssl.SSLSocket):
+    def close(self):
+        # TLS 1.3 session tickets only arrive after the handshake, so record the session when done
+        self.context.record_session(self)
+        super().close()
+
+
+class ResumableSSLContext(ssl.SSLContext):
+    """
+    Client TLS context for connections to a single REST interface, which offers the most recent
+    resumable TLS session when connecting, so that new connections use abbreviated handshakes.
+    """
+
+    sslsocket_class = _SessionRecordingSSLSocket
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        # urllib3 performs hostname matching itself, and hosts may be IP addresses (no SNI)
+        self.check_hostname = False
+        self._session: Optional[ssl.SSLSession] = None
+        self.certificate_version: Optional[Tuple[str, int]] = None  # (filepath, mtime) of the trusted certificate
+
+    def record_session(self, ssl_socket: ssl.SSLSocket) -> None:
+        try:
+            session = ssl_socket.session
+        except (OSError, ValueError):
+            return
+        if session is not None and (session.has_ticket or ssl_socket.version() != 'TLSv1.3'):
+            self._session = session
+
+    def wrap_socket(self, sock, *args, session=None, **kwargs):
+        try:
+            ssl_socket = super().wrap_socket(sock, *args, session=session or self._session, **kwargs)
+        except ssl.SSLError:
+            self._session = None  # don't offer a session that may have led to the failure
+            raise
+        self.record_session(ssl_socket)
+        return ssl_socket
+
+
+class ResumableTLSAdapter(HTTPAdapter):
+    """
+    HTTP adapter that gives each REST interface's connection pool its own resumable TLS context.
+    The context is replaced, and idle connections closed, whenever the certificate file used to
+    verify the REST interface changes, so that a replaced certificate is no longer trusted.
+    """
+
+    @staticmethod
+    def _certificate_version(verify) -> Optional[Tuple[str, int]]:
+        if isinstance(verify, bool) or not verify:
+            return None
+        try:
+            return str(verify), os.stat(verify).st_mtime_ns
+        except OSError:
+            return None
+
+    @staticmethod
+    def _close_idle_connections(pool: HTTPSConnectionPool) -> None:
+        idle_connections = list()
+        try:
+            while True:
+                idle_connections.append(pool.pool.get(block=False))
+        except (queue.Empty, AttributeError):  # AttributeError: pool already closed
+            pass
+        for connection in idle_connections:
+            if connection is not None:
+                connection.close()
+            pool.pool.put(None, block=False)  # keep the pool's capacity
+
+    @classmethod
+    def _with_resumable_tls(cls, pool, verify=None):
+        if not isinstance(pool, HTTPSConnectionPool):
+            return pool
+        certificate_version = cls._certificate_version(verify)
+        context = pool.conn_kw.get('ssl_context')
+        if isinstance(context, ResumableSSLContext) and context.certificate_version == certificate_version:
+            return pool
+        # urllib3 loads the certificate into the pool's context for each new connection, so a
+        # context used with a previous version of the certificate would keep trusting it
+        new_context = ResumableSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        new_context.certificate_version = certificate_version
+        pool.conn_kw['ssl_context'] = new_context
+        if context is not None:
+            cls._close_idle_connections(pool)
+        return pool
+
+    def cert_verify(self, conn, url, verify, cert):
+        super().cert_verify(conn, url, verify, cert)
+        self._with_resumable_tls(conn, verify=verify)
+
+
+class PorterMiddlewareClient(NucypherMiddlewareClient):
+    """
+    Middleware client that sends requests through a shared ``requests.Session``, so that connections
+    to each Ursula's REST interface are kept alive and reused across requests. Connections that have
+    been idle for longer than ``idle_timeout`` are closed. New connections resume previous TLS sessions
+    where possible, and certificates are cached on disk if a certificate cache is provided.
+    """
+
+    DEFAULT_POOL_CONNECTIONS = 256  # number of Ursula REST interfaces with pooled connections
+    DEFAULT_POOL_MAXSIZE = 8  # connections kept alive per Ursula REST interface
+    DEFAULT_IDLE_TIMEOUT = 60  # seconds
+
+    def __init__(self,
+                 pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+                 idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+                 certificate_cache: Optional[CertificateCache] = None,
+                 *args, **kwargs):
+        super().__init__(storage=certificate_cache, *args, **kwargs)
+        self.idle_timeout = idle_timeout
+
+        self._adapter = ResumableTLSAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        session = requests.Session()
+        session.mount('https://', self._adapter)
+        self.library = session  # used in place of the requests module for all HTTP verbs
+
+        self._last_used: Dict[Tuple[str, int], float] = dict()
+        self._last_eviction = time.monotonic()
+        self._lock = Lock()
+
+    def _execute_method(self, node_or_sprout, host, port, method, endpoint, *args, **kwargs):
+        now = time.monotonic()
+        with self._lock:
+            self._last_used[(host.lower(), int(port))] = now
+        if (now - self._last_eviction) > self.idle_timeout:
+            self.evict_idle_connections()
+        return super()._execute_method(node_or_sprout, host, port, method, endpoint, *args, **kwargs)
+
+    def evict_idle_connections(self) -> int:
+        """Closes the connection pools of REST interfaces that have been idle for too long."""
+        now = time.monotonic()
+        with self._lock:
+            self._last_eviction = now
+            idle = {interface for interface, last_used in self._last_used.items()
+                    if (now - last_used) > self.idle_timeout}
+            for interface in idle:
+                del self._last_used[interface]
+
+        evicted = 0
+        pools = self._adapter.poolmanager.pools
+        for pool_key in list(pools.keys()):
+            if (pool_key.key_host, pool_key.key_port) in idle:
+                try:
+                    del pools[pool_key]  # closes the pool's connections
+                except KeyError:
+                    continue  # already evicted
+                evicted += 1
+        return evicted
+
+    def close(self) -> None:
+        self.library.close()
+
+
+class PorterRestMiddleware(RestMiddleware):
+    """REST middleware that pools keep-alive connections, and resumes TLS sessions, per Ursula."""
+
+    _client_class = PorterMiddlewareClient
+
+    def __init__(self,
+                 registry=None,
+                 eth_provider_uri: str = None,
+                 pool_connections: int = PorterMiddlewareClient.DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize: int = PorterMiddlewareClient.DEFAULT_POOL_MAXSIZE,
+                 idle_timeout: float = PorterMiddlewareClient.DEFAULT_IDLE_TIMEOUT,
+                 certificate_cache: Optional[CertificateCache] = None):
+        self.client = self._client_class(registry=registry,
+                                         eth_provider_uri=eth_provider_uri,
+                                         pool_connections=pool_connections,
+                                         pool_maxsize=pool_maxsize,
+                                         idle_timeout=idle_timeout,
+                                         certificate_cache=certificate_cache)
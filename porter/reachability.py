@@ -0,0 +1,247 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from threading import Lock
+from typing import Dict, NamedTuple, Optional
+
+from eth_typing import ChecksumAddress
+from twisted.internet import task, threads
+
+from nucypher.utilities.logging import Logger
+from porter.concurrency import LatencyTracker, SharedExecutor
+
+
+class ReachabilityStatus(NamedTuple):
+    """Most recent view of whether an Ursula can be contacted."""
+    last_checked: float  # monotonic time of the most recent ping attempt
+    last_seen: Optional[float]  # monotonic time of the most recent successful ping
+    rtt: Optional[float]  # smoothed round trip time of successful pings, in seconds
+    failures: int  # consecutive failed pings
+    success_rate: float  # smoothed ratio of successful pings
+
+    @property
+    def reachable(self) -> bool:
+        return self.failures == 0 and self.last_seen is not None
+
+
+class ReachabilityTracker:
+    """
+    Keeps a reachability table for known Ursulas that is periodically refreshed in the background,
+    so that request handlers can consult recent ping results instead of pinging on the request path.
+    If an executor is provided, the nodes of a probing round are pinged concurrently on it, with at
+    most ``max_concurrent_probes`` pings in flight.
+    """
+
+    DEFAULT_PROBE_INTERVAL = 30  # seconds between background probing rounds
+    DEFAULT_FRESHNESS_WINDOW = 60  # seconds for which a ping result is trusted
+    DEFAULT_MAX_CONCURRENT_PROBES = 8
+
+    # responsiveness of an Ursula with this RTT (and no failures) is 0.5
+    REFERENCE_RTT = 0.25
+    MIN_RESPONSIVENESS = 0.05
+
+    _RTT_SMOOTHING_FACTOR = 0.3
+    _SUCCESS_RATE_SMOOTHING_FACTOR = 0.2
+
+    class Unreachable(RuntimeError):
+        """Raised when an Ursula is known to be, or was just found to be, unreachable."""
+
+    def __init__(self,
+                 learner: 'Learner',
+                 probe_interval: float = DEFAULT_PROBE_INTERVAL,
+                 freshness_window: float = DEFAULT_FRESHNESS_WINDOW,
+                 executor: Optional[SharedExecutor] = None,
+                 max_concurrent_probes: int = DEFAULT_MAX_CONCURRENT_PROBES):
+        self.learner = learner
+        self.probe_interval = probe_interval
+        self.freshness_window = freshness_window
+        self.executor = executor
+        self.max_concurrent_probes = max_concurrent_probes
+        self.log = Logger(self.__class__.__name__)
+
+        self._table: Dict[ChecksumAddress, ReachabilityStatus] = dict()
+        self._lock = Lock()
+        self._probing_lock = Lock()  # held for the duration of a probing round
+
+        # raw RTTs of recent successful pings, across all Ursulas
+        self.latencies = LatencyTracker()
+        self._probing_task = task.LoopingCall(self._probe_in_thread)
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def __contains__(self, checksum_address: ChecksumAddress) -> bool:
+        return checksum_address in self._table
+
+    #
+    # Reachability Table
+    #
+
+    def status(self, checksum_address: ChecksumAddress) -> Optional[ReachabilityStatus]:
+        return self._table.get(checksum_address)
+
+    def fresh_status(self,
+                     checksum_address: ChecksumAddress,
+                     max_age: Optional[float] = None) -> Optional[ReachabilityStatus]:
+        """Returns the status of the Ursula if it was checked within the freshness window, otherwise None."""
+        status = self._table.get(checksum_address)
+        if status is None:
+            return None
+        max_age = self.freshness_window if max_age is None else max_age
+        if (time.monotonic() - status.last_checked) > max_age:
+            return None
+        return status
+
+    def record_success(self, checksum_address: ChecksumAddress, rtt: float) -> ReachabilityStatus:
+        now = time.monotonic()
+        with self._lock:
+            previous = self._table.get(checksum_address)
+            success_rate = 1.0
+            if previous is not None:
+                success_rate = self._smooth(self._SUCCESS_RATE_SMOOTHING_FACTOR, 1.0, previous.success_rate)
+                if previous.rtt is not None:
+                    rtt = self._smooth(self._RTT_SMOOTHING_FACTOR, rtt, previous.rtt)
+            status = ReachabilityStatus(last_checked=now,
+                                        last_seen=now,
+                                        rtt=rtt,
+                                        failures=0,
+                                        success_rate=success_rate)
+            self._table[checksum_address] = status
+        return status
+
+    def record_failure(self, checksum_address: ChecksumAddress) -> ReachabilityStatus:
+        now = time.monotonic()
+        with self._lock:
+            previous = self._table.get(checksum_address)
+            if previous is None:
+                status = ReachabilityStatus(last_checked=now,
+                                            last_seen=None,
+                                            rtt=None,
+                                            failures=1,
+                                            success_rate=0.0)
+            else:
+                success_rate = self._smooth(self._SUCCESS_RATE_SMOOTHING_FACTOR, 0.0, previous.success_rate)
+                status = previous._replace(last_checked=now,
+                                           failures=previous.failures + 1,
+                                           success_rate=success_rate)
+            self._table[checksum_address] = status
+        return status
+
+    @staticmethod
+    def _smooth(factor: float, value: float, previous_value: float) -> float:
+        return (factor * value) + ((1 - factor) * previous_value)
+
+    def responsiveness(self, checksum_address: ChecksumAddress) -> float:
+        """
+        Score in [MIN_RESPONSIVENESS, 1] combining the measured RTT and recent success rate of the Ursula;
+        Ursulas without any measurements get the score of an Ursula with the reference RTT.
+        """
+        status = self._table.get(checksum_address)
+        if status is None:
+            return 0.5
+        rtt = status.rtt if status.rtt is not None else self.REFERENCE_RTT
+        score = status.success_rate * (self.REFERENCE_RTT / (self.REFERENCE_RTT + rtt))
+        return max(score, self.MIN_RESPONSIVENESS)
+
+    def forget(self, checksum_address: ChecksumAddress) -> None:
+        with self._lock:
+            self._table.pop(checksum_address, None)
+
+    #
+    # Pinging
+    #
+
+    def ping(self, ursula: 'Ursula') -> ReachabilityStatus:
+        """Pings the Ursula now and records the outcome; raises Unreachable if the ping failed."""
+        checksum_address = ursula.checksum_address
+        start = time.monotonic()
+        try:
+            self.learner.network_middleware.ping(ursula)
+        except Exception as e:
+            self.record_failure(checksum_address)
+            raise self.Unreachable(f"Ursula ({checksum_address}) is unreachable: {e}") from e
+        rtt = time.monotonic() - start
+        self.latencies.record(rtt)
+        return self.record_success(checksum_address, rtt=rtt)
+
+    def check(self, ursula: 'Ursula', max_age: Optional[float] = None) -> ReachabilityStatus:
+        """
+        Uses the recorded status of the Ursula if it is fresh, otherwise pings it on demand.
+        Raises Unreachable if the Ursula is unreachable.
+        """
+        status = self.fresh_status(ursula.checksum_address, max_age=max_age)
+        if status is None:
+            return self.ping(ursula)
+        if not status.reachable:
+            raise self.Unreachable(f"Ursula ({ursula.checksum_address}) was unreachable "
+                                   f"after {status.failures} consecutive attempts")
+        return status
+
+    def probe_known_nodes(self) -> None:
+        """
+        Pings every known node whose status is not fresh, and drops nodes that are no longer known.
+        The round is skipped if the previous round is still running.
+        """
+        if not self._probing_lock.acquire(blocking=False):
+            self.log.debug("Previous reachability probing round is still running; skipping this round")
+            return
+        try:
+            self._probe_known_nodes()
+        finally:
+            self._probing_lock.release()
+
+    def _probe(self, ursula: 'Ursula') -> None:
+        try:
+            self.ping(ursula)
+        except self.Unreachable as e:
+            self.log.debug(str(e))
+
+    def _probe_known_nodes(self) -> None:
+        known_nodes = list(self.learner.known_nodes)
+        known_addresses = {ursula.checksum_address for ursula in known_nodes}
+        for checksum_address in list(self._table):
+            if checksum_address not in known_addresses:
+                self.forget(checksum_address)
+
+        # only refresh nodes that will become stale before the next round
+        max_age = max(self.freshness_window - self.probe_interval, 0)
+        stale_nodes = [ursula for ursula in known_nodes
+                       if self.fresh_status(ursula.checksum_address, max_age=max_age) is None]
+        if not self.executor:
+            for ursula in stale_nodes:
+                self._probe(ursula)
+            return
+
+        # bounded fan out, so that slow or dead nodes don't hold up the round or take over the executor
+        in_flight = set()
+        for ursula in stale_nodes:
+            if len(in_flight) >= self.max_concurrent_probes:
+                _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            in_flight.add(self.executor.submit(self._probe, ursula))
+        wait(in_flight)
+
+    #
+    # Background Probing
+    #
+
+    def _probe_in_thread(self):
+        return threads.deferToThread(self.probe_known_nodes)
+
+    def _handle_probing_errors(self, failure):
+        self.log.warn(f"Unhandled error during reachability probing: {failure.getTraceback()}")
+        if not self._probing_task.running:
+            # restart since errors stop the looping call
+            self.start(now=False)
+
+    def start(self, now: bool = True) -> None:
+        if self._probing_task.running:
+            return
+        d = self._probing_task.start(interval=self.probe_interval, now=now)
+        d.addErrback(self._handle_probing_errors)
+
+    def stop(self) -> None:
+        if self._probing_task.running:
+            self._probing_task.stop()
+
+    @property
+    def is_running(self) -> bool:
+        return self._probing_task.running
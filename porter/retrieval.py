@@ -0,0 +1,712 @@
+import json
+import multiprocessing
+import pickle
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from functools import partial
+from typing import Callable, Dict, Hashable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from eth_typing import ChecksumAddress
+from nucypher_core import (
+    Conditions,
+    Context,
+    EncryptedKeyFrag,
+    ReencryptionRequest,
+    ReencryptionResponse,
+    RetrievalKit,
+    TreasureMap,
+)
+from nucypher_core.umbral import Capsule, PublicKey, VerificationError, VerifiedCapsuleFrag
+
+from nucypher.crypto.signing import InvalidSignature
+from nucypher.network.exceptions import NodeSeemsToBeDown
+from nucypher.network.retrieval import RetrievalClient
+from porter.caching import CFragCache, IdentityLRUCache, to_checksum_address, treasure_map_digest
+from porter.concurrency import CancellationToken, HedgingPolicy, SharedExecutor
+from porter.reachability import ReachabilityTracker
+
+
+class RetrievalRequest(NamedTuple):
+    """Parameters of a single retrieval, i.e. of a retrieve_cfrags call."""
+    treasure_map: TreasureMap
+    retrieval_kits: Sequence[RetrievalKit]
+    alice_verifying_key: PublicKey
+    bob_encrypting_key: PublicKey
+    bob_verifying_key: PublicKey
+    context: Dict
+
+
+class ResolvedTreasureMap(NamedTuple):
+    """
+    Destinations of a treasure map, resolved to checksum addresses, along with the Ursulas among
+    them that were known in the fleet state with the given checksum.
+    """
+    destinations: Dict[ChecksumAddress, EncryptedKeyFrag]
+    fleet_state_checksum: Optional[str] = None
+    ursulas: Optional[Dict[ChecksumAddress, 'Ursula']] = None
+
+
+class RetrievalWorkOrder(NamedTuple):
+    """Reencryption request to issue to a single Ursula on behalf of one or more retrieval kits."""
+    ursula_address: ChecksumAddress
+    kit_indices: Tuple[int, ...]
+    capsules: List[Capsule]
+    conditions: Conditions  # per-capsule conditions, aligned with the capsules
+
+
+def serialize_conditions(conditions_list: Sequence[Optional[Conditions]]) -> Conditions:
+    """Combines per-capsule conditions into the JSON list (with nulls for no conditions) Ursulas expect."""
+    lingos = [json.loads(str(conditions)) if conditions else None for conditions in conditions_list]
+    return Conditions(json.dumps(lingos))
+
+
+class RetrievalPlan:
+    """
+    Tracks the progress of a retrieval, and selects Ursulas for reencryption requests so that
+    each retrieval kit gets at most ``threshold`` outstanding or successful requests at a time.
+    If a reachability tracker is provided, the most responsive Ursulas are selected first, and
+    Ursulas known to be unreachable are only selected as a last resort. As in nucypher's plan,
+    Ursulas already queried for a kit (its ``queried_addresses``) count towards its threshold, and
+    are selected last for other kits.
+    """
+
+    def __init__(self,
+                 treasure_map: TreasureMap,
+                 retrieval_kits: Sequence[RetrievalKit],
+                 reachability: Optional[ReachabilityTracker] = None,
+                 destinations: Optional[Sequence[ChecksumAddress]] = None):
+        self._threshold = treasure_map.threshold
+        self._kits = list(retrieval_kits)
+
+        if destinations is None:
+            destinations = [to_checksum_address(bytes(address)) for address in treasure_map.destinations]
+        destinations = list(destinations)
+        random.SystemRandom().shuffle(destinations)  # also breaks ties between equally responsive Ursulas
+        if reachability:
+            destinations.sort(key=lambda address: self._rank(address, reachability))
+
+        # addresses of Ursulas that were queried before this retrieval, per kit
+        self._queried = [{to_checksum_address(bytes(address)) for address in kit.queried_addresses}
+                         for kit in self._kits]
+        queried_before = set().union(*self._queried)
+        destinations.sort(key=lambda address: address in queried_before)  # stable, so ranking is kept
+        self._destinations = destinations
+
+        self._cfrags: List[Dict[ChecksumAddress, VerifiedCapsuleFrag]] = [dict() for _ in self._kits]
+        self._errors: List[Dict[ChecksumAddress, str]] = [dict() for _ in self._kits]
+        self._pending = [0] * len(self._kits)
+        self._reported = set()  # indices of kits whose results were already handed out
+        self._contacted = [set(queried) for queried in self._queried]
+
+    @staticmethod
+    def _rank(ursula_address: ChecksumAddress, reachability: ReachabilityTracker) -> Tuple[bool, float]:
+        status = reachability.fresh_status(ursula_address)
+        unreachable = status is not None and not status.reachable
+        return unreachable, -reachability.responsiveness(ursula_address)
+
+    def _obtained(self, kit_index: int) -> int:
+        """Number of Ursulas that reencrypted the kit's capsule, during this retrieval or before it."""
+        return len(self._queried[kit_index]) + len(self._cfrags[kit_index])
+
+    def _is_kit_complete(self, kit_index: int) -> bool:
+        return self._obtained(kit_index) >= self._threshold
+
+    def _needs_more(self, kit_index: int) -> bool:
+        return (self._obtained(kit_index) + self._pending[kit_index]) < self._threshold
+
+    def next_work_order(self) -> Optional[RetrievalWorkOrder]:
+        """
+        Returns a work order for the next Ursula that can help retrieval kits that still need
+        cfrags; returns None if no further requests are needed or possible.
+        """
+        for ursula_address in self._destinations:
+            kit_indices = [index for index in range(len(self._kits))
+                           if self._needs_more(index) and ursula_address not in self._contacted[index]]
+            if not kit_indices:
+                continue
+
+            for index in kit_indices:
+                self._contacted[index].add(ursula_address)
+                self._pending[index] += 1
+
+            kits = [self._kits[index] for index in kit_indices]
+            return RetrievalWorkOrder(ursula_address=ursula_address,
+                                      kit_indices=tuple(kit_indices),
+                                      capsules=[kit.capsule for kit in kits],
+                                      conditions=serialize_conditions([kit.conditions for kit in kits]))
+
+        return None
+
+    def add_cached_cfrags(self,
+                          lookup: Callable[[RetrievalKit, ChecksumAddress], Optional[VerifiedCapsuleFrag]]) -> None:
+        """
+        Records cfrags that were previously obtained from the Ursulas, as returned by ``lookup``, so
+        that those Ursulas aren't contacted again for them.
+        """
+        for index, kit in enumerate(self._kits):
+            for ursula_address in self._destinations:
+                if self._is_kit_complete(index):
+                    break
+                if ursula_address in self._contacted[index]:
+                    continue
+                cfrag = lookup(kit, ursula_address)
+                if cfrag is not None:
+                    self._contacted[index].add(ursula_address)
+                    self._cfrags[index][ursula_address] = cfrag
+
+    def update(self,
+               work_order: RetrievalWorkOrder,
+               cfrags: Dict[Capsule, VerifiedCapsuleFrag],
+               released: bool = False) -> None:
+        for index in work_order.kit_indices:
+            if not released:
+                self._pending[index] -= 1
+            self._cfrags[index][work_order.ursula_address] = cfrags[self._kits[index].capsule]
+
+    def update_errors(self, work_order: RetrievalWorkOrder, error_message: str, released: bool = False) -> None:
+        for index in work_order.kit_indices:
+            if not released:
+                self._pending[index] -= 1
+            self._errors[index][work_order.ursula_address] = error_message
+
+    def release(self, work_order: RetrievalWorkOrder) -> None:
+        """
+        Stops counting a work order as outstanding, so that other Ursulas can be selected for its
+        retrieval kits. Results of a released work order can still be recorded, with ``released`` set.
+        """
+        for index in work_order.kit_indices:
+            self._pending[index] -= 1
+
+    def is_complete(self) -> bool:
+        return all(self._is_kit_complete(index) for index in range(len(self._kits)))
+
+    def results(self) -> List[Tuple[Dict[ChecksumAddress, VerifiedCapsuleFrag], Dict[ChecksumAddress, str]]]:
+        return list(zip(self._cfrags, self._errors))
+
+    def pop_results(self, completed_only: bool = True) -> List[Tuple[int, Dict[ChecksumAddress, VerifiedCapsuleFrag], Dict[ChecksumAddress, str]]]:
+        """
+        Returns the results of kits that reached the threshold (or of all kits, if ``completed_only``
+        is not set) and were not returned before, along with their indices.
+        """
+        results = []
+        for index, (cfrags, errors) in enumerate(zip(self._cfrags, self._errors)):
+            if index in self._reported or (completed_only and not self._is_kit_complete(index)):
+                continue
+            self._reported.add(index)
+            # copies, since outstanding requests for other kits may still add to them
+            results.append((index, dict(cfrags), dict(errors)))
+        return results
+
+
+def _verify_reencryption_response(response: bytes,
+                                  capsules: List[bytes],
+                                  alice_verifying_key: bytes,
+                                  ursula_verifying_key: bytes,
+                                  policy_encrypting_key: bytes,
+                                  bob_encrypting_key: bytes) -> List[bytes]:
+    # runs in a worker process, so only bytes (and picklable exceptions) are passed in and out
+    try:
+        reencryption_response = ReencryptionResponse.from_bytes(response)
+    except Exception as e:
+        raise CFragVerificationPool.InvalidResponse(str(e)) from None
+
+    try:
+        verified_cfrags = reencryption_response.verify(capsules=[Capsule.from_bytes(capsule) for capsule in capsules],
+                                                       alice_verifying_key=PublicKey.from_bytes(alice_verifying_key),
+                                                       ursula_verifying_key=PublicKey.from_bytes(ursula_verifying_key),
+                                                       policy_encrypting_key=PublicKey.from_bytes(policy_encrypting_key),
+                                                       bob_encrypting_key=PublicKey.from_bytes(bob_encrypting_key))
+    except VerificationError as e:
+        # umbral's exceptions can't be pickled; re-raised as a VerificationError by the pool
+        raise CFragVerificationPool.CFragVerificationFailed(str(e)) from None
+    except Exception as e:
+        try:
+            pickle.dumps(e)
+        except Exception:
+            raise RuntimeError(f"{e.__class__.__name__}: {e}") from None
+        raise
+    return [bytes(cfrag) for cfrag in verified_cfrags]
+
+
+class CFragVerificationPool:
+    """
+    Verifies the cfrags of reencryption responses in worker processes, so that verification of
+    large responses doesn't compete for the GIL with request handling.
+    """
+
+    class InvalidResponse(ValueError):
+        """The reencryption response could not be parsed."""
+
+    class CFragVerificationFailed(ValueError):
+        """Stand-in for umbral's VerificationError on the way back from a worker process."""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or multiprocessing.cpu_count()
+        # worker processes are spawned rather than forked, since the parent process is multithreaded
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                             mp_context=multiprocessing.get_context('spawn'))
+
+    def verify(self,
+               response: bytes,
+               capsules: Sequence[Capsule],
+               alice_verifying_key: PublicKey,
+               ursula_verifying_key: PublicKey,
+               policy_encrypting_key: PublicKey,
+               bob_encrypting_key: PublicKey) -> List[VerifiedCapsuleFrag]:
+        future = self._executor.submit(_verify_reencryption_response,
+                                       response=response,
+                                       capsules=[bytes(capsule) for capsule in capsules],
+                                       alice_verifying_key=bytes(alice_verifying_key),
+                                       ursula_verifying_key=bytes(ursula_verifying_key),
+                                       policy_encrypting_key=bytes(policy_encrypting_key),
+                                       bob_encrypting_key=bytes(bob_encrypting_key))
+        try:
+            verified_cfrags = future.result()
+        except self.CFragVerificationFailed as e:
+            raise VerificationError(str(e)) from e
+        # already verified by the worker process
+        return [VerifiedCapsuleFrag.from_verified_bytes(cfrag) for cfrag in verified_cfrags]
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+
+class _ReencryptionBatch:
+    """Capsules, and their conditions, merged into a single pending reencryption request."""
+
+    def __init__(self):
+        self.capsules: Dict[bytes, Capsule] = dict()
+        self.lingos: Dict[bytes, Optional[Dict]] = dict()  # capsule conditions, as JSON
+        self.result = Future()
+        self.full = threading.Event()
+
+    def accepts(self, capsules: Sequence[Capsule], lingos: Sequence[Optional[Dict]]) -> bool:
+        # the same capsule can't be requested under different conditions in a single request
+        return all(self.lingos.get(bytes(capsule), lingo) == lingo for capsule, lingo in zip(capsules, lingos))
+
+    def add(self, capsules: Sequence[Capsule], lingos: Sequence[Optional[Dict]]) -> None:
+        for capsule, lingo in zip(capsules, lingos):
+            capsule_bytes = bytes(capsule)
+            self.capsules[capsule_bytes] = capsule
+            self.lingos[capsule_bytes] = lingo
+
+    def work_order(self, ursula_address: ChecksumAddress) -> RetrievalWorkOrder:
+        return RetrievalWorkOrder(ursula_address=ursula_address,
+                                  kit_indices=tuple(),
+                                  capsules=list(self.capsules.values()),
+                                  conditions=Conditions(json.dumps(list(self.lingos.values()))))
+
+
+class ReencryptionBatcher:
+    """
+    Merges work orders for the same Ursula, issued by concurrent retrievals with the same treasure
+    map, keys and context, into a single reencryption request. The first work order of a batch waits
+    for up to ``window`` seconds (or until ``max_capsules`` capsules were added) for others to join,
+    and then sends the batch; the resulting cfrags are split back out to each work order.
+    """
+
+    DEFAULT_WINDOW = 0.005  # 5ms
+    DEFAULT_MAX_CAPSULES = 100
+
+    def __init__(self, window: float = DEFAULT_WINDOW, max_capsules: int = DEFAULT_MAX_CAPSULES):
+        self.window = window
+        self.max_capsules = max_capsules
+        self._batches: Dict[Hashable, _ReencryptionBatch] = dict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def batch_key(ursula_address: ChecksumAddress,
+                  treasure_map: TreasureMap,
+                  alice_verifying_key: PublicKey,
+                  bob_encrypting_key: PublicKey,
+                  bob_verifying_key: PublicKey,
+                  context: Dict) -> Hashable:
+        return (ursula_address,
+                bytes(treasure_map.hrac),
+                treasure_map_digest(treasure_map),
+                bytes(alice_verifying_key),
+                bytes(bob_encrypting_key),
+                bytes(bob_verifying_key),
+                json.dumps(context, sort_keys=True))
+
+    def execute(self,
+                key: Hashable,
+                work_order: RetrievalWorkOrder,
+                send: Callable[[RetrievalWorkOrder], Dict[Capsule, VerifiedCapsuleFrag]]
+                ) -> Dict[Capsule, VerifiedCapsuleFrag]:
+        """
+        Executes the work order as part of a batch; ``send`` is used to issue the merged work order
+        if this work order starts a new batch.
+        """
+        lingos = json.loads(str(work_order.conditions))
+        with self._lock:
+            batch = self._batches.get(key)
+            is_leader = batch is None or not batch.accepts(work_order.capsules, lingos)
+            if is_leader:
+                # a conflicting batch is left to complete on its own
+                batch = _ReencryptionBatch()
+                self._batches[key] = batch
+            batch.add(work_order.capsules, lingos)
+            if len(batch.capsules) >= self.max_capsules:
+                self._batches.pop(key)
+                batch.full.set()
+
+        if is_leader:
+            batch.full.wait(timeout=self.window)
+            with self._lock:
+                if self._batches.get(key) is batch:
+                    self._batches.pop(key)
+            try:
+                batch.result.set_result(send(batch.work_order(work_order.ursula_address)))
+            except Exception as e:
+                batch.result.set_exception(e)
+
+        cfrags = batch.result.result()
+        return {capsule: cfrags[capsule] for capsule in work_order.capsules}
+
+
+class PorterRetrievalClient(RetrievalClient):
+    """
+    Retrieval client that issues reencryption requests for a retrieval concurrently on Porter's
+    shared executor, instead of contacting one Ursula after another. Retrieval stops as soon as each
+    retrieval kit has ``threshold`` cfrags. If a hedging policy is provided, spare Ursulas are
+    contacted on behalf of requests that are outstanding for longer than the policy's delay. If a
+    batcher is provided, requests to the same Ursula from concurrent retrievals are merged where possible.
+    If a reachability tracker is provided, the most responsive Ursulas are contacted first. If a
+    verification pool is provided, cfrags are verified in its worker processes. If a cfrag cache is
+    provided, cached cfrags are used instead of contacting the corresponding Ursulas.
+    The destinations of recently used treasure maps are kept resolved, so that repeated retrievals
+    for the same TreasureMap object don't resolve them again.
+    """
+
+    DEFAULT_TIMEOUT = 15
+    DEFAULT_RESOLVED_TREASURE_MAPS = 256
+
+    def __init__(self,
+                 learner: 'Learner',
+                 executor: SharedExecutor,
+                 timeout: float = DEFAULT_TIMEOUT,
+                 batcher: Optional[ReencryptionBatcher] = None,
+                 hedging: Optional[HedgingPolicy] = None,
+                 reachability: Optional[ReachabilityTracker] = None,
+                 verification_pool: Optional[CFragVerificationPool] = None,
+                 cfrag_cache: Optional[CFragCache] = None):
+        super().__init__(learner=learner)
+        self.executor = executor
+        self.timeout = timeout
+        self.batcher = batcher
+        self.hedging = hedging
+        self.reachability = reachability
+        self.verification_pool = verification_pool
+        self.cfrag_cache = cfrag_cache
+
+        self._resolved_treasure_maps = IdentityLRUCache(max_size=self.DEFAULT_RESOLVED_TREASURE_MAPS)
+
+    def _resolve_treasure_map(self, treasure_map: TreasureMap) -> ResolvedTreasureMap:
+        resolved = self._resolved_treasure_maps.get(treasure_map)
+        if resolved is None:
+            destinations = {to_checksum_address(bytes(address)): encrypted_kfrag
+                            for address, encrypted_kfrag in treasure_map.destinations.items()}
+            resolved = ResolvedTreasureMap(destinations=destinations)
+            self._resolved_treasure_maps.put(treasure_map, resolved)
+        return resolved
+
+    def _resolve_ursulas(self, treasure_map: TreasureMap) -> Dict[ChecksumAddress, 'Ursula']:
+        """Returns the known Ursulas among the destinations of the treasure map."""
+        resolved = self._resolve_treasure_map(treasure_map)
+        known_nodes = self._learner.known_nodes
+        fleet_state_checksum = known_nodes.checksum
+        if resolved.fleet_state_checksum != fleet_state_checksum:
+            # (re)resolved whenever the fleet state changes, since Ursulas may have been added or updated
+            ursulas = {address: known_nodes[address] for address in resolved.destinations if address in known_nodes}
+            resolved = resolved._replace(fleet_state_checksum=fleet_state_checksum, ursulas=ursulas)
+            self._resolved_treasure_maps.put(treasure_map, resolved)
+        return resolved.ursulas
+
+    def _ensure_ursula_availability(self, treasure_map: TreasureMap, timeout=10):
+        if len(self._resolve_ursulas(treasure_map)) >= treasure_map.threshold:
+            return  # enough of the treasure map's Ursulas are already known
+        super()._ensure_ursula_availability(treasure_map, timeout=timeout)
+
+    def _make_reencryption_request(self,
+                                   treasure_map: TreasureMap,
+                                   work_order: RetrievalWorkOrder,
+                                   bob_verifying_key: PublicKey,
+                                   context: Dict) -> ReencryptionRequest:
+        encrypted_kfrag = self._resolve_treasure_map(treasure_map).destinations[work_order.ursula_address]
+        return ReencryptionRequest(capsules=work_order.capsules,
+                                   hrac=treasure_map.hrac,
+                                   encrypted_kfrag=encrypted_kfrag,
+                                   publisher_verifying_key=treasure_map.publisher_verifying_key,
+                                   bob_verifying_key=bob_verifying_key,
+                                   conditions=work_order.conditions,
+                                   context=Context(json.dumps(context)))
+
+    def _execute_work_order(self,
+                            work_order: RetrievalWorkOrder,
+                            treasure_map: TreasureMap,
+                            alice_verifying_key: PublicKey,
+                            bob_encrypting_key: PublicKey,
+                            bob_verifying_key: PublicKey,
+                            context: Dict) -> Dict[Capsule, VerifiedCapsuleFrag]:
+        started_at = time.monotonic()
+        cfrags = self._batch_work_order(work_order=work_order,
+                                        treasure_map=treasure_map,
+                                        alice_verifying_key=alice_verifying_key,
+                                        bob_encrypting_key=bob_encrypting_key,
+                                        bob_verifying_key=bob_verifying_key,
+                                        context=context)
+        if self.hedging:
+            self.hedging.latencies.record(time.monotonic() - started_at)
+        return cfrags
+
+    def _batch_work_order(self,
+                          work_order: RetrievalWorkOrder,
+                          treasure_map: TreasureMap,
+                          alice_verifying_key: PublicKey,
+                          bob_encrypting_key: PublicKey,
+                          bob_verifying_key: PublicKey,
+                          context: Dict) -> Dict[Capsule, VerifiedCapsuleFrag]:
+        def send(order: RetrievalWorkOrder) -> Dict[Capsule, VerifiedCapsuleFrag]:
+            return self._send_work_order(work_order=order,
+                                         treasure_map=treasure_map,
+                                         alice_verifying_key=alice_verifying_key,
+                                         bob_encrypting_key=bob_encrypting_key,
+                                         bob_verifying_key=bob_verifying_key,
+                                         context=context)
+
+        if not self.batcher:
+            return send(work_order)
+
+        key = self.batcher.batch_key(ursula_address=work_order.ursula_address,
+                                     treasure_map=treasure_map,
+                                     alice_verifying_key=alice_verifying_key,
+                                     bob_encrypting_key=bob_encrypting_key,
+                                     bob_verifying_key=bob_verifying_key,
+                                     context=context)
+        return self.batcher.execute(key=key, work_order=work_order, send=send)
+
+    def _send_work_order(self,
+                         work_order: RetrievalWorkOrder,
+                         treasure_map: TreasureMap,
+                         alice_verifying_key: PublicKey,
+                         bob_encrypting_key: PublicKey,
+                         bob_verifying_key: PublicKey,
+                         context: Dict) -> Dict[Capsule, VerifiedCapsuleFrag]:
+        ursula = self._resolve_ursulas(treasure_map).get(work_order.ursula_address)
+        if ursula is None:
+            ursula = self._learner.known_nodes[work_order.ursula_address]
+        reencryption_request = self._make_reencryption_request(treasure_map=treasure_map,
+                                                               work_order=work_order,
+                                                               bob_verifying_key=bob_verifying_key,
+                                                               context=context)
+        return self._request_reencryption(ursula=ursula,
+                                          reencryption_request=reencryption_request,
+                                          alice_verifying_key=alice_verifying_key,
+                                          policy_encrypting_key=treasure_map.policy_encrypting_key,
+                                          bob_encrypting_key=bob_encrypting_key)
+
+    def _request_reencryption(self,
+                              ursula: 'Ursula',
+                              reencryption_request: ReencryptionRequest,
+                              alice_verifying_key: PublicKey,
+                              policy_encrypting_key: PublicKey,
+                              bob_encrypting_key: PublicKey) -> Dict[Capsule, VerifiedCapsuleFrag]:
+        if not self.verification_pool:
+            return super()._request_reencryption(ursula=ursula,
+                                                 reencryption_request=reencryption_request,
+                                                 alice_verifying_key=alice_verifying_key,
+                                                 policy_encrypting_key=policy_encrypting_key,
+                                                 bob_encrypting_key=bob_encrypting_key)
+
+        middleware = self._learner.network_middleware
+        try:
+            response = middleware.reencrypt(ursula, bytes(reencryption_request))
+        except NodeSeemsToBeDown as e:
+            message = f"Ursula ({ursula}) seems to be down while trying to complete ReencryptionRequest"
+            self.log.info(message)
+            raise RuntimeError(message) from e
+        except middleware.NotFound as e:
+            message = (f"Ursula ({ursula}) claims not to not know of the policy {reencryption_request.hrac}. "
+                       f"Has access been revoked?")
+            self.log.warn(message)
+            raise RuntimeError(message) from e
+
+        # same error handling as the in-process verification
+        capsules = reencryption_request.capsules
+        try:
+            verified_cfrags = self.verification_pool.verify(response=response.content,
+                                                            capsules=capsules,
+                                                            alice_verifying_key=alice_verifying_key,
+                                                            ursula_verifying_key=ursula.stamp.as_umbral_pubkey(),
+                                                            policy_encrypting_key=policy_encrypting_key,
+                                                            bob_encrypting_key=bob_encrypting_key)
+        except CFragVerificationPool.InvalidResponse as e:
+            message = f"Ursula ({ursula}) returned an invalid response: {e}."
+            self.log.warn(message)
+            raise RuntimeError(message)
+        except InvalidSignature as e:
+            self.log.warn(str(e))
+            raise
+        except VerificationError:
+            self.log.warn("Failed to verify capsule frags in the ReencryptionResponse")
+            raise
+        except Exception as e:
+            message = f"Failed to verify the ReencryptionResponse: {e}"
+            self.log.warn(message)
+            raise RuntimeError(message)
+        return dict(zip(capsules, verified_cfrags))
+
+    def retrieve_cfrags(self,
+                        treasure_map: TreasureMap,
+                        retrieval_kits: Sequence[RetrievalKit],
+                        alice_verifying_key: PublicKey,
+                        bob_encrypting_key: PublicKey,
+                        bob_verifying_key: PublicKey,
+                        **context) -> List[Tuple[Dict[ChecksumAddress, VerifiedCapsuleFrag], Dict[ChecksumAddress, str]]]:
+        """Returns the cfrags, and errors, obtained for each retrieval kit."""
+        results = [None] * len(retrieval_kits)
+        for index, cfrags, errors in self.iter_retrieve_cfrags(treasure_map,
+                                                               retrieval_kits,
+                                                               alice_verifying_key,
+                                                               bob_encrypting_key,
+                                                               bob_verifying_key,
+                                                               **context):
+            results[index] = (cfrags, errors)
+        return results
+
+    def iter_retrieve_cfrags(self,
+                             treasure_map: TreasureMap,
+                             retrieval_kits: Sequence[RetrievalKit],
+                             alice_verifying_key: PublicKey,
+                             bob_encrypting_key: PublicKey,
+                             bob_verifying_key: PublicKey,
+                             **context) -> Iterator[Tuple[int, Dict[ChecksumAddress, VerifiedCapsuleFrag], Dict[ChecksumAddress, str]]]:
+        """
+        Yields the index of each retrieval kit, with the cfrags and errors obtained for it, as soon as
+        the kit reaches the threshold; kits that could not reach the threshold are yielded last.
+        Ursula availability is checked before returning.
+        """
+        retrieval_request = RetrievalRequest(treasure_map=treasure_map,
+                                             retrieval_kits=retrieval_kits,
+                                             alice_verifying_key=alice_verifying_key,
+                                             bob_encrypting_key=bob_encrypting_key,
+                                             bob_verifying_key=bob_verifying_key,
+                                             context=context)
+        results = self.iter_retrieve_cfrags_batch([retrieval_request])
+        return ((kit_index, cfrags, errors) for _, kit_index, cfrags, errors in results)
+
+    def iter_retrieve_cfrags_batch(self, retrieval_requests: Sequence[RetrievalRequest]
+                                   ) -> Iterator[Tuple[int, int, Dict[ChecksumAddress, VerifiedCapsuleFrag], Dict[ChecksumAddress, str]]]:
+        """
+        Performs several retrievals, possibly for different treasure maps, in a single pass. Yields the
+        index of the retrieval and of the retrieval kit, with the cfrags and errors obtained for the kit,
+        as soon as the kit reaches the threshold. Ursula availability is checked before returning.
+        """
+        for retrieval_request in retrieval_requests:
+            self._ensure_ursula_availability(retrieval_request.treasure_map)
+        plans = [RetrievalPlan(treasure_map=retrieval_request.treasure_map,
+                               retrieval_kits=retrieval_request.retrieval_kits,
+                               reachability=self.reachability,
+                               destinations=self._resolve_treasure_map(retrieval_request.treasure_map).destinations)
+                 for retrieval_request in retrieval_requests]
+        return self._execute_plans(retrieval_requests=retrieval_requests, plans=plans)
+
+    def _execute_plans(self,
+                       retrieval_requests: Sequence[RetrievalRequest],
+                       plans: Sequence[RetrievalPlan]
+                       ) -> Iterator[Tuple[int, int, Dict[ChecksumAddress, VerifiedCapsuleFrag], Dict[ChecksumAddress, str]]]:
+        cache_keys = None
+        if self.cfrag_cache is not None:
+            cache_keys = [self.cfrag_cache.retrieval_key(treasure_map=retrieval_request.treasure_map,
+                                                         bob_encrypting_key=retrieval_request.bob_encrypting_key,
+                                                         context=retrieval_request.context)
+                          for retrieval_request in retrieval_requests]
+            for plan_index, plan in enumerate(plans):
+                plan.add_cached_cfrags(lookup=partial(self.cfrag_cache.get_cfrag, cache_keys[plan_index]))
+                # kits whose cfrags were all cached are done before any Ursula is contacted
+                for kit_index, cfrags, errors in plan.pop_results(completed_only=True):
+                    yield plan_index, kit_index, cfrags, errors
+
+        token = CancellationToken()
+        in_flight: Dict[Future, Tuple[int, RetrievalWorkOrder]] = dict()  # future -> (plan index, work order)
+        dispatched_at: Dict[Future, float] = dict()
+        hedged: Set[Future] = set()  # outstanding requests on whose behalf spare Ursulas were contacted
+        deadline = time.monotonic() + self.timeout
+        try:
+            while not all(plan.is_complete() for plan in plans):
+                for plan_index, (retrieval_request, plan) in enumerate(zip(retrieval_requests, plans)):
+                    work_order = plan.next_work_order()
+                    while work_order:
+                        if work_order.ursula_address not in self._learner.known_nodes:
+                            plan.release(work_order)
+                        else:
+                            future = self.executor.submit(self._execute_work_order,
+                                                          work_order=work_order,
+                                                          treasure_map=retrieval_request.treasure_map,
+                                                          alice_verifying_key=retrieval_request.alice_verifying_key,
+                                                          bob_encrypting_key=retrieval_request.bob_encrypting_key,
+                                                          bob_verifying_key=retrieval_request.bob_verifying_key,
+                                                          context=retrieval_request.context,
+                                                          token=token)
+                            in_flight[future] = (plan_index, work_order)
+                            dispatched_at[future] = time.monotonic()
+                        work_order = plan.next_work_order()
+
+                now = time.monotonic()
+                remaining = deadline - now
+                if not in_flight or remaining <= 0:
+                    # out of Ursulas to contact, or out of time
+                    break
+
+                wake_at = deadline
+                if self.hedging:
+                    hedge_delay = self.hedging.hedge_delay()
+                    slow = [future for future in in_flight
+                            if future not in hedged and (now - dispatched_at[future]) >= hedge_delay]
+                    if slow:
+                        for future in slow:
+                            # spare Ursulas are selected for the kits of slow requests, on the next pass
+                            hedged.add(future)
+                            plan_index, work_order = in_flight[future]
+                            plans[plan_index].release(work_order)
+                        continue
+                    pending_hedges = [dispatched_at[future] + hedge_delay for future in in_flight if future not in hedged]
+                    if pending_hedges:
+                        wake_at = min(wake_at, min(pending_hedges))
+
+                done, _ = wait(in_flight, timeout=max(wake_at - now, 0), return_when=FIRST_COMPLETED)
+                for future in done:
+                    plan_index, work_order = in_flight.pop(future)
+                    del dispatched_at[future]
+                    released = future in hedged
+                    hedged.discard(future)
+                    try:
+                        cfrags = future.result()
+                    except Exception as e:
+                        exception_message = f"{e.__class__.__name__}: {e}"
+                        plans[plan_index].update_errors(work_order, exception_message, released=released)
+                        self.log.warn(exception_message)
+                        continue
+                    plans[plan_index].update(work_order, cfrags, released=released)
+                    if self.cfrag_cache is not None:
+                        retrieval_kits = retrieval_requests[plan_index].retrieval_kits
+                        for kit_index in work_order.kit_indices:
+                            retrieval_kit = retrieval_kits[kit_index]
+                            self.cfrag_cache.put_cfrag(retrieval_key=cache_keys[plan_index],
+                                                       retrieval_kit=retrieval_kit,
+                                                       ursula_address=work_order.ursula_address,
+                                                       cfrag=cfrags[retrieval_kit.capsule])
+
+                for plan_index, plan in enumerate(plans):
+                    for kit_index, cfrags, errors in plan.pop_results(completed_only=True):
+                        yield plan_index, kit_index, cfrags, errors
+        finally:
+            # results of any outstanding requests are no longer needed
+            token.cancel()
+
+        for plan_index, plan in enumerate(plans):
+            for kit_index, cfrags, errors in plan.pop_results(completed_only=False):
+                yield plan_index, kit_index, cfrags, errors
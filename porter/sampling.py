@@ -0,0 +1,344 @@
+import random
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from threading import Lock
+from typing import Any, Callable, Deque, Dict, Hashable, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from eth_typing import ChecksumAddress
+from twisted.internet import task, threads
+
+from nucypher.blockchain.eth.agents import PREApplicationAgent
+from nucypher.utilities.logging import Logger
+
+
+class AliasSampler:
+    """
+    Weighted sampler (with replacement) based on Vose's alias method. Building the table is O(n),
+    after which each draw is O(1) regardless of the number of elements.
+    """
+
+    def __init__(self, weighted_elements: Dict[Hashable, int], rng: Optional[random.Random] = None):
+        self.weights = {element: weight for element, weight in weighted_elements.items() if weight > 0}
+        self._rng = rng or random.SystemRandom()
+        self._elements: List[Hashable] = list(self.weights)
+        self._probabilities: List[float] = []
+        self._aliases: List[int] = []
+        if self._elements:
+            self._build_table()
+
+    def _build_table(self):
+        size = len(self._elements)
+        total_weight = sum(self.weights.values())
+        scaled = [self.weights[element] * size / total_weight for element in self._elements]
+
+        self._probabilities = [1.0] * size
+        self._aliases = list(range(size))
+        small = [index for index, probability in enumerate(scaled) if probability < 1.0]
+        large = [index for index, probability in enumerate(scaled) if probability >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self._probabilities[less] = scaled[less]
+            self._aliases[less] = more
+            scaled[more] = (scaled[more] + scaled[less]) - 1.0
+            if scaled[more] < 1.0:
+                small.append(more)
+            else:
+                large.append(more)
+        # any leftovers are (up to floating point error) exactly 1.0, which is the default
+
+    def __len__(self) -> int:
+        return len(self._elements)
+
+    def __contains__(self, element: Hashable) -> bool:
+        return element in self.weights
+
+    def draw(self) -> Hashable:
+        if not self._elements:
+            raise ValueError("Cannot draw from an empty sampler")
+        index = int(self._rng.random() * len(self._elements))
+        if self._rng.random() < self._probabilities[index]:
+            return self._elements[index]
+        return self._elements[self._aliases[index]]
+
+
+class AliasReservoir:
+    """
+    Drop-in replacement for nucypher's ``MergedReservoir`` backed by a shared ``AliasSampler``.
+    Included values are returned first, after which values are drawn without replacement by
+    rejecting values that were already returned or excluded.
+    """
+
+    # after this many consecutive rejections the remaining values are re-tabled
+    MAX_CONSECUTIVE_REJECTIONS = 32
+
+    def __init__(self,
+                 sampler: AliasSampler,
+                 include_addresses: Optional[Iterable[ChecksumAddress]] = None,
+                 exclude_addresses: Optional[Iterable[ChecksumAddress]] = None):
+        self.values = list(include_addresses or ())
+        self._sampler = sampler
+        self._rejected = set(self.values).union(exclude_addresses or ())
+        self._remaining = len(sampler) - sum(1 for value in self._rejected if value in sampler)
+
+    def __len__(self) -> int:
+        return len(self.values) + self._remaining
+
+    def _retable(self):
+        remaining_weights = {element: weight for element, weight in self._sampler.weights.items()
+                             if element not in self._rejected}
+        self._sampler = AliasSampler(remaining_weights)
+
+    def __call__(self) -> Optional[ChecksumAddress]:
+        if self.values:
+            return self.values.pop(0)
+        if self._remaining <= 0:
+            return None
+
+        for _ in range(self.MAX_CONSECUTIVE_REJECTIONS):
+            value = self._sampler.draw()
+            if value not in self._rejected:
+                self._rejected.add(value)
+                self._remaining -= 1
+                return value
+
+        # most of the stake has been drawn or excluded - draw from a table of the remaining values
+        self._retable()
+        value = self._sampler.draw()
+        self._rejected.add(value)
+        self._remaining -= 1
+        return value
+
+
+class SamplingSnapshot(NamedTuple):
+    """Weighted set of addresses to sample from, valid for as long as its key is current."""
+    key: Any
+    timestamp: float  # monotonic time at which the snapshot was taken
+    sampler: AliasSampler
+
+
+class SamplingSnapshotCache(ABC):
+    """
+    Caches a weighted snapshot of addresses, and its alias table, so that sampling does not rebuild
+    it on every request. The snapshot is refreshed when its key changes, or, if a TTL is specified,
+    when the snapshot is older than the TTL.
+    """
+
+    # seconds for which a responsiveness-weighted table is reused
+    RESPONSIVENESS_REFRESH_INTERVAL = 5
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl
+        self.log = Logger(self.__class__.__name__)
+
+        self._snapshot: Optional[SamplingSnapshot] = None
+        self._lock = Lock()
+
+        # (base snapshot, creation time, sampler) for responsiveness-weighted sampling
+        self._responsive_sampler: Optional[Tuple[SamplingSnapshot, float, AliasSampler]] = None
+
+    @abstractmethod
+    def _current_key(self) -> Any:
+        """Key identifying the current source state; the snapshot is refreshed when it changes."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def _read_weights(self) -> Dict[ChecksumAddress, int]:
+        """Reads the weight of each address from the source."""
+        raise NotImplementedError
+
+    def _is_current(self, snapshot: Optional[SamplingSnapshot], key: Any) -> bool:
+        if snapshot is None:
+            return False
+        if self.ttl is not None:
+            return (time.monotonic() - snapshot.timestamp) <= self.ttl
+        return snapshot.key == key
+
+    def snapshot(self) -> SamplingSnapshot:
+        key = None if self.ttl is not None else self._current_key()
+
+        snapshot = self._snapshot
+        if self._is_current(snapshot, key):
+            return snapshot
+
+        with self._lock:
+            # another thread may have refreshed the snapshot while waiting for the lock
+            snapshot = self._snapshot
+            if self._is_current(snapshot, key):
+                return snapshot
+
+            sampler = AliasSampler(self._read_weights())
+            snapshot = SamplingSnapshot(key=key, timestamp=time.monotonic(), sampler=sampler)
+            self._snapshot = snapshot
+            self.log.debug(f"Refreshed sampling snapshot ({len(sampler)} addresses, key {key})")
+            return snapshot
+
+    def responsive_sampler(self, responsiveness: Callable[[ChecksumAddress], float]) -> AliasSampler:
+        """
+        Returns a sampler over the current snapshot whose weights are scaled by the responsiveness of
+        each address. The table is rebuilt at most every RESPONSIVENESS_REFRESH_INTERVAL seconds.
+        """
+        snapshot = self.snapshot()
+        cached = self._responsive_sampler
+        if cached is not None:
+            base_snapshot, created_at, sampler = cached
+            is_recent = (time.monotonic() - created_at) <= self.RESPONSIVENESS_REFRESH_INTERVAL
+            if base_snapshot is snapshot and is_recent:
+                return sampler
+
+        weights = {address: weight * responsiveness(address)
+                   for address, weight in snapshot.sampler.weights.items()}
+        sampler = AliasSampler(weights)
+        self._responsive_sampler = (snapshot, time.monotonic(), sampler)
+        return sampler
+
+    def make_reservoir(self,
+                       exclude_addresses: Optional[Sequence[ChecksumAddress]] = None,
+                       include_addresses: Optional[Sequence[ChecksumAddress]] = None,
+                       responsiveness: Optional[Callable[[ChecksumAddress], float]] = None) -> AliasReservoir:
+        """
+        Builds a reservoir over the current snapshot, with include/exclude filters applied locally.
+        If a responsiveness function is provided, weights are biased towards responsive addresses.
+        """
+        if responsiveness is not None:
+            sampler = self.responsive_sampler(responsiveness)
+        else:
+            sampler = self.snapshot().sampler
+        return AliasReservoir(sampler=sampler,
+                              include_addresses=include_addresses,
+                              exclude_addresses=exclude_addresses)
+
+
+class StakingProvidersSnapshotCache(SamplingSnapshotCache):
+    """Stake-weighted snapshot of the active staking providers, keyed on the latest block number."""
+
+    def __init__(self, application_agent: PREApplicationAgent, *args, **kwargs):
+        self.application_agent = application_agent
+        super().__init__(*args, **kwargs)
+
+    def _current_key(self) -> int:
+        return self.application_agent.blockchain.client.block_number
+
+    def _read_weights(self) -> Dict[ChecksumAddress, int]:
+        _, staking_providers = self.application_agent.get_all_active_staking_providers()
+        return staking_providers
+
+
+class KnownNodesSnapshotCache(SamplingSnapshotCache):
+    """Uniformly weighted snapshot of known nodes (federated mode), keyed on the fleet state checksum."""
+
+    def __init__(self, learner: 'Learner', *args, **kwargs):
+        self.learner = learner
+        super().__init__(*args, **kwargs)
+
+    def _current_key(self) -> str:
+        return self.learner.known_nodes.checksum
+
+    def _read_weights(self) -> Dict[ChecksumAddress, int]:
+        return {ursula.checksum_address: 1 for ursula in self.learner.known_nodes}
+
+
+class WarmSample(NamedTuple):
+    """Pre-sampled set of Ursulas, ready to be handed out."""
+    created_at: float  # monotonic time at which the sample was taken
+    ursulas_info: List['Porter.UrsulaInfo']
+
+
+class WarmSamplePool:
+    """
+    Keeps a small queue of ready-made samples for commonly requested quantities, refilled in the
+    background, so that plain sampling requests (no include/exclude lists) can be served without
+    any network activity. Each sample is handed out at most once.
+    """
+
+    DEFAULT_DEPTH = 4  # samples kept per quantity
+    DEFAULT_MAX_AGE = 30  # seconds after which a sample is discarded
+    DEFAULT_REFILL_INTERVAL = 1
+
+    def __init__(self,
+                 sampler: Callable[[int], List['Porter.UrsulaInfo']],
+                 quantities: Sequence[int],
+                 depth: int = DEFAULT_DEPTH,
+                 max_age: float = DEFAULT_MAX_AGE,
+                 refill_interval: float = DEFAULT_REFILL_INTERVAL,
+                 reachability: Optional['ReachabilityTracker'] = None):
+        self.sampler = sampler
+        self.depth = depth
+        self.max_age = max_age
+        self.refill_interval = refill_interval
+        self.reachability = reachability
+        self.log = Logger(self.__class__.__name__)
+
+        self._queues: Dict[int, Deque[WarmSample]] = {quantity: deque() for quantity in set(quantities)}
+        self._refilling_task = task.LoopingCall(self._refill_in_thread)
+
+    @property
+    def quantities(self) -> List[int]:
+        return sorted(self._queues)
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _is_usable(self, sample: WarmSample) -> bool:
+        if (time.monotonic() - sample.created_at) > self.max_age:
+            return False
+        if self.reachability is not None:
+            # drop samples with Ursulas that have since been found to be unreachable
+            for ursula_info in sample.ursulas_info:
+                status = self.reachability.status(ursula_info.checksum_address)
+                if status is not None and not status.reachable:
+                    return False
+        return True
+
+    def take(self, quantity: int) -> Optional[List['Porter.UrsulaInfo']]:
+        """Returns a ready-made sample of the quantity if one is available, otherwise None."""
+        queue = self._queues.get(quantity)
+        if queue is None:
+            return None
+        while True:
+            try:
+                sample = queue.popleft()
+            except IndexError:
+                return None
+            if self._is_usable(sample):
+                return list(sample.ursulas_info)
+
+    def refill(self) -> None:
+        """Discards unusable samples, and tops up each quantity's queue to the configured depth."""
+        for quantity, queue in self._queues.items():
+            for sample in list(queue):
+                if not self._is_usable(sample):
+                    try:
+                        queue.remove(sample)
+                    except ValueError:
+                        pass  # already handed out
+            while len(queue) < self.depth:
+                try:
+                    ursulas_info = self.sampler(quantity)
+                except Exception as e:
+                    self.log.debug(f"Unable to pre-sample {quantity} Ursulas: {e}")
+                    break
+                queue.append(WarmSample(created_at=time.monotonic(), ursulas_info=ursulas_info))
+
+    #
+    # Background Refilling
+    #
+
+    def _refill_in_thread(self):
+        return threads.deferToThread(self.refill)
+
+    def _handle_refilling_errors(self, failure):
+        self.log.warn(f"Unhandled error during warm sample refill: {failure.getTraceback()}")
+        if not self._refilling_task.running:
+            # restart since errors stop the looping call
+            self.start(now=False)
+
+    def start(self, now: bool = True) -> None:
+        if self._refilling_task.running:
+            return
+        d = self._refilling_task.start(interval=self.refill_interval, now=now)
+        d.addErrback(self._handle_refilling_errors)
+
+    def stop(self) -> None:
+        if self._refilling_task.running:
+            self._refilling_task.stop()
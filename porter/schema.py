@@ -3,13 +3,14 @@ from marshmallow import fields as marshmallow_fields, Schema, INCLUDE
 from marshmallow import validates_schema
 from marshmallow.fields import String, Dict
 from marshmallow.fields import URL
+from marshmallow.validate import Length
 
 from porter.cli.types import EIP55_CHECKSUM_ADDRESS
-from porter.fields.base import StringList, PositiveInteger, JSON
+from porter.fields.base import StringList, PositiveInteger, JSON, Boolean
 from porter.fields.exceptions import InvalidArgumentCombo
 from porter.fields.exceptions import InvalidInputData
 from porter.fields.key import Key
-from porter.fields.retrieve import RetrievalKit, CapsuleFrag
+from porter.fields.retrieve import RetrievalKitList, CapsuleFrag
 from porter.fields.treasuremap import TreasureMap
 from porter.fields.ursula import UrsulaChecksumAddress
 
@@ -94,6 +95,16 @@ class AliceGetUrsulas(BaseSchema):
         required=False,
         load_only=True)
 
+    latency_aware = Boolean(
+        click=click.option(
+            '--latency-aware',
+            help="Bias the sample, within stake weighting, towards Ursulas that respond quickly",
+            is_flag=True,
+            required=False,
+            default=False),
+        required=False,
+        load_only=True)
+
     # output
     ursulas = marshmallow_fields.List(marshmallow_fields.Nested(UrsulaInfoSchema), dump_only=True)
 
@@ -115,6 +126,19 @@ class AliceGetUrsulas(BaseSchema):
                                        f"common entries {common_ursulas}")
 
 
+class AliceGetUrsulasBatch(BaseSchema):
+    sampling_specs = marshmallow_fields.List(
+        marshmallow_fields.Nested(AliceGetUrsulas),
+        required=True,
+        load_only=True,
+        validate=Length(min=1))
+
+    # output
+    ursulas = marshmallow_fields.List(
+        marshmallow_fields.List(marshmallow_fields.Nested(UrsulaInfoSchema)),
+        dump_only=True)
+
+
 class AliceRevoke(BaseSchema):
     pass  # TODO need to understand revoke process better
 
@@ -144,8 +168,7 @@ class BobRetrieveCFrags(BaseSchema):
             help="Unencrypted Treasure Map for retrieval",
             type=click.STRING,
             required=True))
-    retrieval_kits = StringList(
-        RetrievalKit(),
+    retrieval_kits = RetrievalKitList(
         click=click.option(
             '--retrieval-kits',
             '-r',
@@ -198,3 +221,31 @@ class BobRetrieveCFrags(BaseSchema):
         marshmallow_fields.Nested(RetrievalOutcomeSchema), dump_only=True
     )
 
+
+
+class BobRetrieveCFragsStream(BobRetrieveCFrags):
+    """Same input as /retrieve_cfrags; the output is streamed, one record per retrieval kit."""
+
+    # output
+    retrieval_kit_index = marshmallow_fields.Integer(dump_only=True)
+    cfrags = Dict(keys=UrsulaChecksumAddress(), values=CapsuleFrag(), dump_only=True)
+    errors = Dict(keys=UrsulaChecksumAddress(), values=String(), dump_only=True)
+
+    class Meta(BobRetrieveCFrags.Meta):
+        ordered = True  # maintain field declaration ordering
+        exclude = ('retrieval_results',)
+
+
+class BobRetrieveCFragsBatch(BaseSchema):
+    """Several /retrieve_cfrags requests, possibly for different treasure maps, performed at once."""
+
+    retrievals = marshmallow_fields.List(
+        marshmallow_fields.Nested(BobRetrieveCFrags),
+        required=True,
+        load_only=True,
+        validate=Length(min=1))
+
+    # output
+    retrieval_results = marshmallow_fields.List(
+        marshmallow_fields.List(marshmallow_fields.Nested(RetrievalOutcomeSchema)), dump_only=True
+    )
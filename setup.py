@@ -102,8 +102,13 @@ PORTER_REQUIRES = [
     'flask-cors'
 ]  # needed for basic authentication, cors
 
+MSGPACK_REQUIRES = [
+    'msgpack'
+]  # needed for the msgpack wire format
+
 EXTRAS = {
-    'dev': DEV_REQUIRES + PORTER_REQUIRES,
+    'dev': DEV_REQUIRES + PORTER_REQUIRES + MSGPACK_REQUIRES,
+    'msgpack': MSGPACK_REQUIRES,
 }
 
 
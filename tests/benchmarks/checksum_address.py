@@ -0,0 +1,32 @@
+"""
+Micro-benchmark of checksum address conversion, memoized vs. eth_utils, for the same mix of
+repeated addresses that Porter sees (exclude/include lists, cfrag dicts keyed by address).
+
+    python tests/benchmarks/checksum_address.py
+"""
+import os
+import random
+import timeit
+
+from eth_utils import to_checksum_address as eth_utils_to_checksum_address
+
+from porter.caching import to_checksum_address
+
+FLEET_SIZE = 1000
+CONVERSIONS = 100_000
+REPEAT = 5
+
+
+def main():
+    fleet = ['0x' + os.urandom(20).hex() for _ in range(FLEET_SIZE)]
+    addresses = random.choices(fleet, k=CONVERSIONS)
+    assert [to_checksum_address(address) for address in fleet] == \
+           [eth_utils_to_checksum_address(address) for address in fleet]
+
+    for name, convert in (('eth_utils', eth_utils_to_checksum_address), ('memoized', to_checksum_address)):
+        best = min(timeit.repeat(lambda: [convert(address) for address in addresses], number=1, repeat=REPEAT))
+        print(f"{name:>10}: {best * 1e9 / CONVERSIONS:8.0f} ns per conversion")
+
+
+if __name__ == '__main__':
+    main()
@@ -42,7 +42,7 @@ def federated_porter(federated_ursulas):
                     execution_timeout=2,
                     network_middleware=MockRestMiddleware())
     yield porter
-    porter.stop_learning_loop()
+    porter.shutdown()
 
 
 @pytest.fixture(scope="module")
@@ -56,5 +56,5 @@ def blockchain_porter(blockchain_ursulas, testerchain, test_registry):
                     execution_timeout=2,
                     network_middleware=MockRestMiddleware())
     yield porter
-    porter.stop_learning_loop()
+    porter.shutdown()
 
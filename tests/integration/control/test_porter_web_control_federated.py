@@ -71,6 +71,48 @@ def test_get_ursulas(federated_porter_web_controller, federated_ursulas):
     assert response.status_code == 500
 
 
+def test_get_ursulas_batch(federated_porter_web_controller, federated_ursulas):
+    # Send bad data to assert error return
+    response = federated_porter_web_controller.post('/get_ursulas/batch', data=json.dumps({'bad': 'input'}))
+    assert response.status_code == 400
+
+    quantity = 4
+    federated_ursulas_list = list(federated_ursulas)
+    include_ursulas = [federated_ursulas_list[0].checksum_address, federated_ursulas_list[1].checksum_address]
+    exclude_ursulas = [federated_ursulas_list[2].checksum_address, federated_ursulas_list[3].checksum_address]
+    sampling_specs = [
+        {'quantity': quantity},
+        {'quantity': quantity, 'include_ursulas': include_ursulas, 'exclude_ursulas': exclude_ursulas},
+    ]
+
+    #
+    # Success
+    #
+    response = federated_porter_web_controller.post('/get_ursulas/batch',
+                                                    data=json.dumps({'sampling_specs': sampling_specs}))
+    assert response.status_code == 200
+
+    response_data = json.loads(response.data)
+    results = response_data['result']['ursulas']
+    assert len(results) == len(sampling_specs)
+    for ursulas_info in results:
+        returned_ursula_addresses = {ursula_info['checksum_address'] for ursula_info in ursulas_info}
+        assert len(returned_ursula_addresses) == quantity  # ensure no repeats
+    second_sample_addresses = {ursula_info['checksum_address'] for ursula_info in results[1]}
+    for address in include_ursulas:
+        assert address in second_sample_addresses
+    for address in exclude_ursulas:
+        assert address not in second_sample_addresses
+
+    #
+    # Failure case
+    #
+    failed_sampling_specs = [{'quantity': quantity}, {'quantity': len(federated_ursulas_list) + 1}]  # too many to get
+    response = federated_porter_web_controller.post('/get_ursulas/batch',
+                                                    data=json.dumps({'sampling_specs': failed_sampling_specs}))
+    assert response.status_code == 500
+
+
 def test_retrieve_cfrags(federated_porter,
                          federated_porter_web_controller,
                          enacted_federated_policy,
@@ -185,6 +227,66 @@ def test_retrieve_cfrags(federated_porter,
     assert response.status_code == 400  # invalid treasure map provided
 
 
+def test_retrieve_cfrags_stream(federated_porter_web_controller,
+                                enacted_federated_policy,
+                                federated_bob,
+                                federated_alice):
+    # Send bad data to assert error return
+    response = federated_porter_web_controller.post('/retrieve_cfrags/stream', data=json.dumps({'bad': 'input'}))
+    assert response.status_code == 400
+
+    retrieve_cfrags_params, _ = retrieval_request_setup(enacted_federated_policy,
+                                                        federated_bob,
+                                                        federated_alice,
+                                                        encode_for_rest=True,
+                                                        num_random_messages=4)
+    response = federated_porter_web_controller.post('/retrieve_cfrags/stream', data=json.dumps(retrieve_cfrags_params))
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+
+    # one record per retrieval kit, in order of completion
+    records = [json.loads(line)['result'] for line in response.data.decode().splitlines()]
+    assert len(records) == 4
+    assert {record['retrieval_kit_index'] for record in records} == {0, 1, 2, 3}
+    threshold = retrieval_params_decode_from_rest(retrieve_cfrags_params)['treasure_map'].threshold
+    for record in records:
+        assert len(record['cfrags']) >= threshold
+        assert len(record['errors']) == 0
+
+
+def test_retrieve_cfrags_batch(federated_porter_web_controller,
+                               enacted_federated_policy,
+                               federated_bob,
+                               federated_alice,
+                               random_context):
+    # Send bad data to assert error return
+    response = federated_porter_web_controller.post('/retrieve_cfrags/batch', data=json.dumps({'bad': 'input'}))
+    assert response.status_code == 400
+
+    retrieve_cfrags_params, _ = retrieval_request_setup(enacted_federated_policy,
+                                                        federated_bob,
+                                                        federated_alice,
+                                                        encode_for_rest=True,
+                                                        num_random_messages=2)
+    context_retrieve_cfrags_params, _ = retrieval_request_setup(enacted_federated_policy,
+                                                                federated_bob,
+                                                                federated_alice,
+                                                                encode_for_rest=True,
+                                                                context=random_context)
+    batch_params = {'retrievals': [retrieve_cfrags_params, context_retrieve_cfrags_params]}
+    response = federated_porter_web_controller.post('/retrieve_cfrags/batch', data=json.dumps(batch_params))
+    assert response.status_code == 200
+
+    response_data = json.loads(response.data)
+    retrieval_results = response_data['result']['retrieval_results']
+    assert [len(retrieval_outcomes) for retrieval_outcomes in retrieval_results] == [2, 1]
+    threshold = retrieval_params_decode_from_rest(retrieve_cfrags_params)['treasure_map'].threshold
+    for retrieval_outcomes in retrieval_results:
+        for retrieval_outcome in retrieval_outcomes:
+            assert len(retrieval_outcome['cfrags']) >= threshold
+            assert len(retrieval_outcome['errors']) == 0
+
+
 def test_endpoints_basic_auth(federated_porter_basic_auth_web_controller,
                               random_federated_treasure_map_data,
                               enacted_federated_policy,
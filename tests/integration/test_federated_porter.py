@@ -1,3 +1,10 @@
+import threading
+import time
+
+import pytest
+from twisted.internet import reactor, task
+
+from porter.main import Porter
 from porter.utils import retrieval_request_setup
 
 
@@ -72,3 +79,137 @@ def test_retrieve_cfrags_with_context(federated_porter,
 
     result = federated_porter.retrieve_cfrags(**retrieval_args)
     assert result, "valid result returned"
+
+
+def test_get_ursulas_latency_aware(federated_porter, federated_ursulas):
+    quantity = 4
+    federated_ursulas_list = list(federated_ursulas)
+    include_ursulas = [federated_ursulas_list[0].checksum_address]
+    exclude_ursulas = [federated_ursulas_list[1].checksum_address]
+    ursulas_info = federated_porter.get_ursulas(quantity=quantity,
+                                                include_ursulas=include_ursulas,
+                                                exclude_ursulas=exclude_ursulas,
+                                                latency_aware=True)
+    returned_ursula_addresses = {ursula_info.checksum_address for ursula_info in ursulas_info}
+    assert len(returned_ursula_addresses) == quantity  # ensure no repeats
+    assert include_ursulas[0] in returned_ursula_addresses
+    assert exclude_ursulas[0] not in returned_ursula_addresses
+
+
+def test_get_ursulas_batch(federated_porter, federated_ursulas):
+    quantity = 4
+    federated_ursulas_list = list(federated_ursulas)
+    include_ursulas = [federated_ursulas_list[0].checksum_address]
+    exclude_ursulas = [federated_ursulas_list[1].checksum_address]
+    sampling_specs = [
+        {'quantity': quantity},
+        {'quantity': quantity - 1, 'include_ursulas': include_ursulas},
+        {'quantity': quantity, 'exclude_ursulas': exclude_ursulas, 'latency_aware': True},
+    ]
+
+    results = federated_porter.get_ursulas_batch(sampling_specs=sampling_specs)
+    assert len(results) == len(sampling_specs)
+    for spec, ursulas_info in zip(sampling_specs, results):
+        returned_ursula_addresses = {ursula_info.checksum_address for ursula_info in ursulas_info}
+        assert len(returned_ursula_addresses) == spec['quantity']  # ensure no repeats
+        for address in spec.get('include_ursulas', []):
+            assert address in returned_ursula_addresses
+        for address in spec.get('exclude_ursulas', []):
+            assert address not in returned_ursula_addresses
+
+
+class _LearningRounds:
+    """Stands in for learn_from_teacher_node, and tracks how many learning rounds run at the same time."""
+
+    def __init__(self, duration: float = 0.2):
+        self.duration = duration
+        self.count = 0
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.duration)
+        with self._lock:
+            self.running -= 1
+            self.count += 1
+
+
+def _wait_until(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def clocked_learning_loop(federated_porter, mocker):
+    learning_rounds = _LearningRounds()
+    mocker.patch.object(federated_porter, 'learn_from_teacher_node', side_effect=learning_rounds)
+
+    # the reactor isn't running; run reactor-thread calls directly, and learning rounds on their own threads
+    mocker.patch.object(reactor, 'callFromThread', side_effect=lambda f, *args, **kwargs: f(*args, **kwargs))
+    mocker.patch.object(reactor, 'callInThread', side_effect=lambda f, *args, **kwargs: threading.Thread(
+        target=f, args=args, kwargs=kwargs, daemon=True).start())
+
+    learning_task = task.LoopingCall(federated_porter.keep_learning_about_nodes)
+    learning_task.clock = task.Clock()
+    mocker.patch.object(federated_porter, '_learning_task', learning_task)
+    learning_task.start(interval=Porter._SHORT_LEARNING_DELAY, now=False)
+    yield learning_task, learning_rounds
+
+    _wait_until(lambda: learning_rounds.running == 0)
+    if learning_task.running:
+        learning_task.stop()
+
+
+def test_requested_learning_round_runs_on_the_learning_loop(federated_porter, clocked_learning_loop):
+    learning_task, learning_rounds = clocked_learning_loop
+
+    # a scheduled round starts, and rounds are requested while it's in progress
+    learning_task.clock.advance(Porter._SHORT_LEARNING_DELAY)
+    federated_porter._request_learning()
+    federated_porter._request_learning()  # coalesced
+    _wait_until(lambda: learning_task.call is not None)  # scheduled round is done
+    assert learning_rounds.count == 1
+    assert federated_porter._learning_requested is True
+
+    # the requested round runs once the scheduled round is done, instead of at the next scheduled time
+    learning_task.clock.advance(Porter._LEARNING_REQUEST_RETRY_DELAY)
+    _wait_until(lambda: learning_rounds.count == 2 and learning_task.call is not None)
+    assert learning_rounds.max_running == 1
+    assert federated_porter._learning_requested is False
+
+    # no further rounds until the next scheduled time
+    learning_task.clock.advance(Porter._LEARNING_REQUEST_RETRY_DELAY)
+    time.sleep(learning_rounds.duration)
+    assert learning_rounds.count == 2
+
+
+def test_get_ursulas_without_learning_on_request_thread(federated_porter,
+                                                        federated_ursulas,
+                                                        clocked_learning_loop,
+                                                        mocker):
+    learning_task, learning_rounds = clocked_learning_loop
+    mocker.patch.object(federated_porter, 'learn_on_request_thread', False)
+    block_until_known_nodes = mocker.spy(federated_porter, 'block_until_number_of_known_nodes_is')
+
+    # enough nodes known - sampled from the current fleet state
+    quantity = 4
+    ursulas_info = federated_porter.get_ursulas(quantity=quantity)
+    assert len({ursula_info.checksum_address for ursula_info in ursulas_info}) == quantity
+
+    # too many nodes requested - fails fast instead of learning on this thread
+    with pytest.raises(Porter.InsufficientKnownNodes, match="Insufficient known nodes"):
+        federated_porter.get_ursulas(quantity=len(federated_ursulas) + 1)
+    assert block_until_known_nodes.call_count > 0
+    for call in block_until_known_nodes.call_args_list:
+        assert call.kwargs['learn_on_this_thread'] is False
+
+    # the learning loop ran a learning round on behalf of the request, and accepts new requests
+    _wait_until(lambda: learning_rounds.count == 1 and learning_task.call is not None)
+    assert learning_rounds.max_running == 1
+    assert federated_porter._learning_requested is False
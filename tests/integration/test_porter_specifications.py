@@ -13,7 +13,9 @@ from porter.fields.treasuremap import TreasureMap
 from porter.main import Porter
 from porter.schema import (
     AliceGetUrsulas,
+    AliceGetUrsulasBatch,
     BobRetrieveCFrags,
+    BobRetrieveCFragsBatch,
     UrsulaInfoSchema
 )
 from porter.schema import BaseSchema
@@ -67,6 +69,16 @@ def test_alice_get_ursulas_schema(get_random_checksum_address):
     updated_data['include_ursulas'] = include_ursulas
     AliceGetUrsulas().load(updated_data)
 
+    # latency aware sampling
+    updated_data = dict(required_data)
+    updated_data['latency_aware'] = True
+    data = AliceGetUrsulas().load(updated_data)
+    assert data['latency_aware'] is True
+
+    updated_data['latency_aware'] = 'not_a_boolean'
+    with pytest.raises(InvalidInputData):
+        AliceGetUrsulas().load(updated_data)
+
     # list input formatted as ',' separated strings
     updated_data = dict(required_data)
     updated_data['exclude_ursulas'] = ','.join(exclude_ursulas)
@@ -146,6 +158,36 @@ def test_alice_get_ursulas_schema(get_random_checksum_address):
     assert output == {"ursulas": expected_ursulas_info}
 
 
+def test_alice_get_ursulas_batch_schema(get_random_checksum_address):
+    # no args
+    with pytest.raises(InvalidInputData):
+        AliceGetUrsulasBatch().load({})
+
+    # empty batch
+    with pytest.raises(InvalidInputData):
+        AliceGetUrsulasBatch().load({'sampling_specs': []})
+
+    include_ursulas = [get_random_checksum_address()]
+    sampling_specs = [{'quantity': 5}, {'quantity': 3, 'include_ursulas': include_ursulas}]
+    result = AliceGetUrsulasBatch().load({'sampling_specs': sampling_specs})
+    assert result['sampling_specs'] == sampling_specs
+
+    # each spec is validated
+    with pytest.raises(InvalidInputData):
+        AliceGetUrsulasBatch().load({'sampling_specs': [{'quantity': 5}, {'quantity': -1}]})
+    with pytest.raises(InvalidInputData):
+        AliceGetUrsulasBatch().load({'sampling_specs': [{'quantity': 1,
+                                                         'include_ursulas': include_ursulas * 2}]})
+
+    # output
+    ursulas_info = [Porter.UrsulaInfo(get_random_checksum_address(),
+                                      f"https://127.0.0.1:{11500 + i}",
+                                      SecretKey.random().public_key()) for i in range(2)]
+    expected_ursulas_info = [UrsulaInfoSchema().dump(ursula_info) for ursula_info in ursulas_info]
+    output = AliceGetUrsulasBatch().dump(obj={'ursulas': [ursulas_info, ursulas_info[:1]]})
+    assert output == {"ursulas": [expected_ursulas_info, expected_ursulas_info[:1]]}
+
+
 def test_alice_revoke():
     pass  # TODO
 
@@ -314,6 +356,68 @@ def test_bob_retrieve_cfrags(federated_porter,
             assert error_message_template.format(i, j) in values
 
 
+
+def test_bob_retrieve_cfrags_batch(federated_porter,
+                                   enacted_federated_policy,
+                                   federated_bob,
+                                   federated_alice,
+                                   random_context):
+    bob_retrieve_cfrags_batch_schema = BobRetrieveCFragsBatch()
+
+    # no args
+    with pytest.raises(InvalidInputData):
+        bob_retrieve_cfrags_batch_schema.load({})
+
+    # empty batch
+    with pytest.raises(InvalidInputData):
+        bob_retrieve_cfrags_batch_schema.load({'retrievals': []})
+
+    retrieval_args, _ = retrieval_request_setup(enacted_federated_policy,
+                                                federated_bob,
+                                                federated_alice,
+                                                encode_for_rest=True,
+                                                num_random_messages=2)
+    context_retrieval_args, _ = retrieval_request_setup(enacted_federated_policy,
+                                                        federated_bob,
+                                                        federated_alice,
+                                                        encode_for_rest=True,
+                                                        context=random_context)
+    result = bob_retrieve_cfrags_batch_schema.load({'retrievals': [retrieval_args, context_retrieval_args]})
+    assert len(result['retrievals']) == 2
+    assert len(result['retrievals'][0]['retrieval_kits']) == 2
+    assert result['retrievals'][1]['context'] == random_context
+
+    # each retrieval is validated
+    missing_arg_retrieval_args = dict(retrieval_args)
+    del missing_arg_retrieval_args['bob_verifying_key']
+    with pytest.raises(InvalidInputData):
+        bob_retrieve_cfrags_batch_schema.load({'retrievals': [retrieval_args, missing_arg_retrieval_args]})
+
+    #
+    # Retrieval output, results are in the order of the retrievals
+    #
+    non_encoded_retrieval_args, _ = retrieval_request_setup(enacted_federated_policy,
+                                                            federated_bob,
+                                                            federated_alice,
+                                                            encode_for_rest=False,
+                                                            num_random_messages=3)
+    # second retrieval duplicates one of the kits of the first
+    duplicate_retrieval_args = dict(non_encoded_retrieval_args,
+                                    retrieval_kits=non_encoded_retrieval_args['retrieval_kits'][1:2])
+    retrieval_results = federated_porter.retrieve_cfrags_batch(retrievals=[non_encoded_retrieval_args,
+                                                                           duplicate_retrieval_args])
+    assert [len(retrieval_outcomes) for retrieval_outcomes in retrieval_results] == [3, 1]
+    assert retrieval_results[1][0] == retrieval_results[0][1]
+    for retrieval_outcome in retrieval_results[0]:
+        assert len(retrieval_outcome.cfrags) > 0
+        assert len(retrieval_outcome.errors) == 0
+
+    retrieval_outcome_schema = RetrievalOutcomeSchema()
+    output = bob_retrieve_cfrags_batch_schema.dump(obj={'retrieval_results': retrieval_results})
+    assert output == {'retrieval_results': [[retrieval_outcome_schema.dump(outcome) for outcome in outcomes]
+                                            for outcomes in retrieval_results]}
+
+
 def make_header(brand: bytes, major: int, minor: int) -> bytes:
     # Hardcoding this since it's too much trouble to expose it all the way from Rust
     assert len(brand) == 4
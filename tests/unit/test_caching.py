@@ -0,0 +1,111 @@
+import gc
+import json
+import weakref
+
+import pytest
+from eth_utils import to_checksum_address as eth_utils_to_checksum_address
+from nucypher_core import Conditions
+
+from porter.caching import CFragCache, IdentityLRUCache, LRUCache, to_checksum_address
+
+
+def test_lru_cache_eviction_and_expiry(mocker):
+    cache = LRUCache(max_size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1  # 'b' is now the least recently used
+    cache.put('c', 3)
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+    stats = cache.stats()
+    assert (stats.size, stats.max_size, stats.hits, stats.misses, stats.evictions) == (2, 2, 3, 1, 1)
+
+    # entries expire after the TTL
+    monotonic = mocker.patch('porter.caching.time.monotonic', return_value=100)
+    cache = LRUCache(max_size=2, ttl=10)
+    cache.put('a', 1)
+    monotonic.return_value = 110
+    assert cache.get('a') == 1
+    monotonic.return_value = 111
+    assert cache.get('a') is None
+    assert len(cache) == 0
+    assert cache.stats().evictions == 1
+
+
+def test_identity_lru_cache():
+    class Item:
+        pass
+
+    cache = IdentityLRUCache(max_size=1)
+    item = Item()
+    cache.put(item, 'value')
+    assert cache.get(item) == 'value'
+    assert cache.get(Item()) is None  # equal ids only, not equal values
+
+    # cached entries keep their object alive, so its id can't be reused
+    item_reference = weakref.ref(item)
+    item_id = id(item)
+    del item
+    gc.collect()
+    assert item_reference() is not None
+
+    # once evicted, the object can be collected, and a new object with the same id isn't a hit
+    cache.put(Item(), 'other value')
+    gc.collect()
+    assert item_reference() is None
+    for _ in range(1000):
+        new_item = Item()
+        assert cache.get(new_item) is None
+        if id(new_item) == item_id:
+            break
+
+    # an entry stored under the id of a different object is never returned
+    item, other_item = Item(), Item()
+    LRUCache.put(cache, id(other_item), (item, 'stale value'))
+    assert cache.get(other_item) is None
+
+
+def test_cfrag_cache_conditions(mocker, get_random_checksum_address):
+    ursula_address = get_random_checksum_address()
+    conditions = Conditions(json.dumps({'returnValueTest': {'comparator': '>', 'value': 0}}))
+    kit = mocker.Mock(capsule=b'capsule', conditions=None)
+    conditional_kit = mocker.Mock(capsule=b'capsule', conditions=conditions)
+
+    treasure_map = mocker.Mock(hrac=b'hrac')
+    retrieval_key = CFragCache.retrieval_key(treasure_map=treasure_map,
+                                             bob_encrypting_key=b'bob encrypting key',
+                                             context={'a': 1, 'b': 2})
+    assert retrieval_key == CFragCache.retrieval_key(treasure_map=treasure_map,
+                                                     bob_encrypting_key=b'bob encrypting key',
+                                                     context={'b': 2, 'a': 1})
+    assert retrieval_key != CFragCache.retrieval_key(treasure_map=treasure_map,
+                                                     bob_encrypting_key=b'bob encrypting key',
+                                                     context=None)
+
+    # cfrags of kits with conditions are not cached by default
+    cache = CFragCache()
+    cache.put_cfrag(retrieval_key, kit, ursula_address, 'cfrag')
+    cache.put_cfrag(retrieval_key, conditional_kit, ursula_address, 'conditional cfrag')
+    assert len(cache) == 1
+    assert cache.get_cfrag(retrieval_key, kit, ursula_address) == 'cfrag'
+    assert cache.get_cfrag(retrieval_key, conditional_kit, ursula_address) is None
+    assert cache.get_cfrag(retrieval_key, kit, get_random_checksum_address()) is None
+
+    # unless explicitly allowed
+    cache = CFragCache(cache_conditions=True)
+    cache.put_cfrag(retrieval_key, conditional_kit, ursula_address, 'conditional cfrag')
+    assert cache.get_cfrag(retrieval_key, conditional_kit, ursula_address) == 'conditional cfrag'
+    assert cache.get_cfrag(retrieval_key, kit, ursula_address) is None
+
+
+def test_to_checksum_address(get_random_checksum_address):
+    checksum_address = get_random_checksum_address()
+    for value in (checksum_address, checksum_address.lower(), bytes.fromhex(checksum_address[2:])):
+        assert to_checksum_address(value) == eth_utils_to_checksum_address(value) == checksum_address
+        assert to_checksum_address(value) == checksum_address  # memoized
+
+    with pytest.raises(ValueError):
+        to_checksum_address('0xdeadbeef')
@@ -0,0 +1,229 @@
+import threading
+import time
+
+import pytest
+
+from nucypher.utilities.concurrency import WorkerPool
+from porter.concurrency import (
+    CancellationToken,
+    ExecutorWorkerPool,
+    HedgingPolicy,
+    LatencyTracker,
+    SharedExecutor,
+    SingleFlight
+)
+
+
+class AllAtOnceFactory:
+    def __init__(self, values):
+        self.values = values
+        self._produced = False
+
+    def __call__(self, successes):
+        if self._produced:
+            return None
+        self._produced = True
+        return self.values
+
+
+@pytest.fixture(scope='module')
+def shared_executor():
+    executor = SharedExecutor(max_workers=4)
+    yield executor
+    executor.shutdown(wait=True)
+
+
+def test_shared_executor_is_bounded(shared_executor):
+    barrier = threading.Event()
+    futures = [shared_executor.submit(barrier.wait) for _ in range(10)]
+    time.sleep(0.1)
+
+    stats = shared_executor.stats()
+    assert stats.max_workers == 4
+    assert stats.threads <= 4
+    assert stats.active == 4
+    assert stats.queued == 6
+
+    barrier.set()
+    for future in futures:
+        future.result()
+    stats = shared_executor.stats()
+    assert stats.active == 0
+    assert stats.queued == 0
+
+
+def test_cancellation_token(shared_executor):
+    barrier = threading.Event()
+    token = CancellationToken()
+    blockers = [shared_executor.submit(barrier.wait) for _ in range(4)]
+    futures = [shared_executor.submit(lambda: 1, token=token) for _ in range(3)]
+
+    token.cancel()
+    assert token.cancelled
+    assert all(future.cancelled() for future in futures)
+
+    # tasks submitted after cancellation never run
+    future = shared_executor.submit(lambda: 1, token=token)
+    assert future.cancelled()
+
+    barrier.set()
+    for blocker in blockers:
+        blocker.result()
+
+
+def test_executor_worker_pool_success(shared_executor):
+    def worker(value):
+        if value % 2:
+            raise ValueError(f"odd value {value}")
+        return value * 10
+
+    pool = ExecutorWorkerPool(executor=shared_executor,
+                              worker=worker,
+                              value_factory=AllAtOnceFactory(list(range(10))),
+                              target_successes=3,
+                              timeout=5)
+    pool.start()
+    try:
+        successes = pool.block_until_target_successes()
+    finally:
+        pool.cancel()
+
+    assert len(successes) == 3
+    for value, result in successes.items():
+        assert result == value * 10
+
+
+def test_executor_worker_pool_out_of_values(shared_executor):
+    def worker(value):
+        raise ValueError(f"failure for {value}")
+
+    pool = ExecutorWorkerPool(executor=shared_executor,
+                              worker=worker,
+                              value_factory=AllAtOnceFactory(list(range(5))),
+                              target_successes=3,
+                              timeout=5)
+    pool.start()
+    with pytest.raises(WorkerPool.OutOfValues) as exc_info:
+        pool.block_until_target_successes()
+    pool.cancel()
+    assert len(exc_info.value.failures) == 5
+
+
+def test_executor_worker_pool_timeout(shared_executor):
+    barrier = threading.Event()
+
+    def worker(value):
+        barrier.wait()
+        return value
+
+    pool = ExecutorWorkerPool(executor=shared_executor,
+                              worker=worker,
+                              value_factory=AllAtOnceFactory([1, 2]),
+                              target_successes=2,
+                              timeout=0.5)
+    pool.start()
+    try:
+        with pytest.raises(WorkerPool.TimedOut):
+            pool.block_until_target_successes()
+    finally:
+        pool.cancel()
+        barrier.set()
+
+
+class OneAtATimeFactory:
+    def __init__(self, values):
+        self.values = list(values)
+
+    def __call__(self, successes):
+        if not self.values:
+            return None
+        return [self.values.pop(0)]
+
+
+def test_latency_tracker_and_hedging_policy():
+    latencies = LatencyTracker(window_size=100)
+    assert latencies.percentile(90) is None
+
+    policy = HedgingPolicy(latencies=latencies, fallback_delay=1, min_delay=0.01)
+    assert policy.hedge_delay() == 1  # not enough observations
+
+    for i in range(1, 101):
+        latencies.record(i / 100)
+    assert latencies.percentile(50) == 0.51
+    assert latencies.percentile(90) == 0.91
+    assert latencies.percentile(100) == 1.0
+    assert policy.hedge_delay() == 0.91
+
+    # window is bounded
+    for _ in range(100):
+        latencies.record(0.001)
+    assert len(latencies) == 100
+    assert policy.hedge_delay() == 0.01  # min delay
+
+
+def test_executor_worker_pool_hedging(shared_executor):
+    slow_value_released = threading.Event()
+
+    def worker(value):
+        if value == 'slow':
+            slow_value_released.wait()
+        return value
+
+    latencies = LatencyTracker()
+    for _ in range(HedgingPolicy.MIN_OBSERVATIONS):
+        latencies.record(0.05)
+    hedging = HedgingPolicy(latencies=latencies)
+
+    pool = ExecutorWorkerPool(executor=shared_executor,
+                              worker=worker,
+                              value_factory=OneAtATimeFactory(['slow', 'fast_1', 'fast_2']),
+                              target_successes=1,
+                              timeout=5,
+                              hedging=hedging)
+    start = time.monotonic()
+    pool.start()
+    try:
+        successes = pool.block_until_target_successes()
+    finally:
+        pool.cancel()
+        slow_value_released.set()
+
+    # the slow value was hedged after ~p90 latency instead of waiting for it
+    assert list(successes) == ['fast_1']
+    assert time.monotonic() - start < 1
+
+
+def test_single_flight(shared_executor):
+    calls = []
+    release = threading.Event()
+
+    def slow_call(value):
+        calls.append(value)
+        release.wait()
+        return value * 2
+
+    single_flight = SingleFlight()
+    futures = [shared_executor.submit(single_flight.do, 'key', slow_call, 21) for _ in range(3)]
+    time.sleep(0.1)
+    release.set()
+    assert [future.result() for future in futures] == [42, 42, 42]
+    assert calls == [21]  # executed once for all concurrent callers
+
+    # results are not remembered once the call completes
+    assert len(single_flight) == 0
+    assert single_flight.do('key', slow_call, 1) == 2
+    assert calls == [21, 1]
+
+    # unless requested
+    remembering = SingleFlight(remember_results=True)
+    assert remembering.do('key', slow_call, 2) == 4
+    assert remembering.do('key', slow_call, 3) == 4
+    assert calls == [21, 1, 2]
+
+    # exceptions are shared as well
+    def failing_call():
+        raise ValueError("failed")
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            remembering.do('failure', failing_call)
@@ -0,0 +1,71 @@
+import pytest
+
+from porter.concurrency import SharedExecutor
+from porter.discovery import NodeDiscovery
+
+
+class FleetState(dict):
+    """Minimal stand-in for the learner's fleet state, keyed on checksum address."""
+    checksum = b'fleet state checksum'
+
+    def __iter__(self):
+        return iter(list(self.values()))
+
+    def record_fleet_state(self):
+        self.recorded = True
+
+
+@pytest.fixture(scope='module')
+def shared_executor():
+    executor = SharedExecutor(max_workers=4)
+    yield executor
+    executor.shutdown(wait=True)
+
+
+def test_node_discovery_resolves_only_requested_nodes(mocker, shared_executor, get_random_checksum_address):
+    teachers = [mocker.Mock(checksum_address=get_random_checksum_address()) for _ in range(3)]
+    known_nodes = FleetState({teacher.checksum_address: teacher for teacher in teachers})
+
+    requested = get_random_checksum_address()
+    other = get_random_checksum_address()
+    never_seen = get_random_checksum_address()
+
+    def remember_node(sprout, record_fleet_state):
+        known_nodes[sprout.checksum_address] = sprout
+        return sprout
+
+    learner = mocker.Mock(known_nodes=known_nodes)
+    learner.remember_node.side_effect = remember_node
+
+    # every teacher knows about the requested node, and one other node
+    metadata_response = mocker.patch('porter.discovery.MetadataResponse')
+    metadata_response.from_bytes.return_value.verify.return_value.announce_nodes = [requested, other]
+    mocker.patch('porter.discovery.NodeSprout', side_effect=lambda address: mocker.Mock(checksum_address=address))
+
+    discovery = NodeDiscovery(learner=learner, executor=shared_executor, max_teachers=2)
+    resolved = discovery.resolve([requested, teachers[0].checksum_address], timeout=5)
+    assert resolved == {requested}
+    assert requested in known_nodes
+    assert other not in known_nodes  # only requested nodes are remembered
+    assert known_nodes.recorded
+    assert 1 <= learner.network_middleware.get_nodes_via_rest.call_count <= 2
+
+    # already known - no teachers queried
+    learner.network_middleware.get_nodes_via_rest.reset_mock()
+    assert discovery.resolve([requested], timeout=5) == set()
+    assert learner.network_middleware.get_nodes_via_rest.call_count == 0
+
+    # not known by any teacher
+    assert discovery.resolve([never_seen], timeout=5) == set()
+    assert never_seen not in known_nodes
+
+
+def test_node_discovery_teacher_failures(mocker, shared_executor, get_random_checksum_address):
+    teachers = [mocker.Mock(checksum_address=get_random_checksum_address()) for _ in range(3)]
+    learner = mocker.Mock(known_nodes=FleetState({teacher.checksum_address: teacher for teacher in teachers}))
+    learner.network_middleware.get_nodes_via_rest.side_effect = ConnectionError("teacher is down")
+
+    discovery = NodeDiscovery(learner=learner, executor=shared_executor)
+    assert discovery.resolve([get_random_checksum_address()], timeout=5) == set()
+    assert learner.network_middleware.get_nodes_via_rest.call_count == len(teachers)
+    assert learner.remember_node.call_count == 0
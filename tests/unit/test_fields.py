@@ -1,16 +1,20 @@
+import hashlib
 import json
+import os
 from base64 import b64encode
 
 import pytest
 from eth_utils import to_canonical_address
-from nucypher_core import RetrievalKit as RetrievalKitClass, Address, MessageKit
-from nucypher_core.umbral import SecretKey
+from nucypher_core import HRAC, RetrievalKit as RetrievalKitClass, Address, MessageKit, TreasureMap as TreasureMapClass
+from nucypher_core.umbral import SecretKey, Signer, generate_kfrags
 
-from porter.fields.base import PositiveInteger, String, Base64BytesRepresentation, JSON
+from porter.caching import treasure_map_digest
+from porter.fields.base import PositiveInteger, String, Base64BytesRepresentation, JSON, raw_bytes_representation
 from porter.fields.base import StringList
 from porter.fields.exceptions import InvalidInputData
 from porter.fields.key import Key
-from porter.fields.retrieve import RetrievalKit
+from porter.fields.retrieve import RetrievalKit, RetrievalKitList
+from porter.fields.treasuremap import TreasureMap
 from porter.fields.ursula import UrsulaChecksumAddress
 
 
@@ -104,6 +108,33 @@ def test_retrieval_kit_field(get_random_checksum_address):
         field._deserialize(value=b64encode(b"invalid_retrieval_kit_bytes").decode(), attr=None, data=None)
 
 
+def test_retrieval_kit_list_field():
+    field = RetrievalKitList()
+    encrypting_key = SecretKey.random().public_key()
+    kits = [RetrievalKitClass.from_message_kit(MessageKit(encrypting_key, b'retrieval kit list'))
+            for _ in range(3)]
+    serialized = [b64encode(bytes(kit)).decode() for kit in kits]
+
+    deserialized = field._deserialize(value=serialized + serialized[:1], attr=None, data=None)
+    assert [bytes(kit) for kit in deserialized] == [bytes(kit) for kit in kits + kits[:1]]
+    assert deserialized[3] is deserialized[0]  # repeated kits are only decoded once
+
+    # delimited string
+    deserialized = field._deserialize(value=",".join(serialized), attr=None, data=None)
+    assert [bytes(kit) for kit in deserialized] == [bytes(kit) for kit in kits]
+
+    with raw_bytes_representation():
+        deserialized = field._deserialize(value=[bytes(kit) for kit in kits], attr=None, data=None)
+    assert [bytes(kit) for kit in deserialized] == [bytes(kit) for kit in kits]
+
+    # all invalid kits are reported, by index
+    invalid = [serialized[0], "non_base_64_data?", serialized[1], b64encode(b"invalid_retrieval_kit_bytes").decode()]
+    with pytest.raises(InvalidInputData, match=r"indices \[1, 3\]"):
+        field._deserialize(value=invalid, attr=None, data=None)
+    with pytest.raises(InvalidInputData, match="and 2 more"):
+        field._deserialize(value=["invalid"] * (RetrievalKitList.MAX_REPORTED_ERRORS + 2), attr=None, data=None)
+
+
 def test_key():
     field = Key()
 
@@ -121,6 +152,14 @@ def test_key():
     with pytest.raises(InvalidInputData):
         field._deserialize(value=b"PublicKey".hex(), attr=None, data=None)
 
+    # deserialized keys are interned
+    assert field._deserialize(value=serialized, attr=None, data=None) is deserialized
+    assert Key()._deserialize(value=serialized, attr=None, data=None) is deserialized
+    with raw_bytes_representation():
+        assert field._deserialize(value=bytes(umbral_pub_key), attr=None, data=None) == umbral_pub_key
+        assert field._serialize(value=umbral_pub_key, attr=None, obj=None) == bytes(umbral_pub_key)
+    assert field._serialize(value=other_umbral_pub_key, attr=None, obj=None) == bytes(other_umbral_pub_key).hex()
+
 
 def test_positive_integer_field():
     field = PositiveInteger()
@@ -167,6 +206,66 @@ def test_base64_representation_field():
         field._deserialize(value=b"raw bytes with non base64 chars ?&^%", attr=None, data=None)
 
 
+def test_raw_bytes_representation():
+    data = b"man in the arena"
+    umbral_pub_key = SecretKey.random().public_key()
+    base64_field = Base64BytesRepresentation()
+    key_field = Key()
+
+    with raw_bytes_representation():
+        assert base64_field._serialize(value=data, attr=None, obj=None) == data
+        assert base64_field._deserialize(value=data, attr=None, data=None) == data
+        assert key_field._serialize(value=umbral_pub_key, attr=None, obj=None) == bytes(umbral_pub_key)
+        assert key_field._deserialize(value=bytes(umbral_pub_key), attr=None, data=None) == umbral_pub_key
+
+        # text representations are still understood
+        assert base64_field._deserialize(value=b64encode(data).decode(), attr=None, data=None) == data
+        assert key_field._deserialize(value=bytes(umbral_pub_key).hex(), attr=None, data=None) == umbral_pub_key
+
+    # only within the context
+    assert base64_field._serialize(value=data, attr=None, obj=None) == b64encode(data).decode()
+
+
+def test_treasure_map_field_cache():
+    alice_key, bob_key, delegating_key = (SecretKey.random() for _ in range(3))
+    kfrags = generate_kfrags(delegating_sk=delegating_key,
+                             receiving_pk=bob_key.public_key(),
+                             signer=Signer(alice_key),
+                             threshold=2,
+                             shares=3,
+                             sign_delegating_key=True,
+                             sign_receiving_key=True)
+    treasure_map = TreasureMapClass(signer=Signer(alice_key),
+                                    hrac=HRAC(alice_key.public_key(), bob_key.public_key(), b'label'),
+                                    policy_encrypting_key=delegating_key.public_key(),
+                                    assigned_kfrags={Address(os.urandom(20)): (SecretKey.random().public_key(), kfrag)
+                                                     for kfrag in kfrags},
+                                    threshold=2)
+    field = TreasureMap()
+    serialized = b64encode(bytes(treasure_map)).decode()
+
+    deserialized = field._deserialize(value=serialized, attr=None, data=None)
+    assert bytes(deserialized) == bytes(treasure_map)
+
+    # repeated input is served from the cache, shared by all treasure map fields
+    assert field._deserialize(value=serialized, attr=None, data=None) is deserialized
+    assert TreasureMap()._deserialize(value=serialized, attr=None, data=None) is deserialized
+    with raw_bytes_representation():
+        raw_deserialized = field._deserialize(value=bytes(treasure_map), attr=None, data=None)
+    assert bytes(raw_deserialized) == bytes(treasure_map)
+
+    # the digest of the input is recorded for the parsed map, and reused instead of hashing the map again
+    assert treasure_map_digest(deserialized) == hashlib.sha256(serialized.encode()).digest()
+    assert treasure_map_digest(raw_deserialized) == hashlib.sha256(bytes(treasure_map)).digest()
+    assert treasure_map_digest(treasure_map) == hashlib.sha256(bytes(treasure_map)).digest()  # not parsed
+
+    # invalid input is not cached
+    with pytest.raises(InvalidInputData):
+        field._deserialize(value=serialized[:-8], attr=None, data=None)
+    with pytest.raises(InvalidInputData):
+        field._deserialize(value=serialized[:-8], attr=None, data=None)
+
+
 def test_json_field():
     # test data
     dict_data = {
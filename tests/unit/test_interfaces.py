@@ -0,0 +1,72 @@
+import threading
+import time
+
+from porter.caching import record_treasure_map_digest
+from porter.concurrency import SharedExecutor
+from porter.interfaces import PorterInterface
+
+
+def _make_treasure_map(mocker, hrac=b'hrac', digest=b'treasure map digest'):
+    treasure_map = mocker.Mock(hrac=hrac)
+    record_treasure_map_digest(treasure_map, digest)  # as if parsed by the TreasureMap field
+    return treasure_map
+
+
+def test_identical_retrievals_are_coalesced(mocker):
+    release = threading.Event()
+
+    def retrieve_cfrags(**kwargs):
+        release.wait()
+        return [mocker.Mock()]
+
+    porter = mocker.Mock()
+    porter.retrieve_cfrags.side_effect = retrieve_cfrags
+    interface = PorterInterface(porter=porter)
+
+    retrieval_params = dict(treasure_map=_make_treasure_map(mocker),
+                            retrieval_kits=[b'kit 1', b'kit 2'],
+                            alice_verifying_key=b'alice verifying key',
+                            bob_encrypting_key=b'bob encrypting key',
+                            bob_verifying_key=b'bob verifying key',
+                            context={'a': 1, 'b': 2})
+    executor = SharedExecutor(max_workers=4)
+    try:
+        futures = [executor.submit(interface.retrieve_cfrags, **retrieval_params) for _ in range(3)]
+        # same request but with a different context
+        different_params = dict(retrieval_params, context={'a': 1})
+        futures.append(executor.submit(interface.retrieve_cfrags, **different_params))
+        time.sleep(0.1)
+        release.set()
+        results = [future.result() for future in futures]
+    finally:
+        executor.shutdown(wait=True)
+
+    # identical requests shared a single retrieval
+    assert porter.retrieve_cfrags.call_count == 2
+    assert results[0] == results[1] == results[2]
+    assert results[3] != results[0]
+
+    # completed retrievals are not reused
+    release.set()
+    interface.retrieve_cfrags(**retrieval_params)
+    assert porter.retrieve_cfrags.call_count == 3
+
+
+def test_retrieval_key(mocker):
+    retrieval_params = dict(treasure_map=_make_treasure_map(mocker),
+                            retrieval_kits=[b'kit 1', b'kit 2'],
+                            alice_verifying_key=b'alice verifying key',
+                            bob_encrypting_key=b'bob encrypting key',
+                            bob_verifying_key=b'bob verifying key',
+                            context={'a': 1, 'b': 2})
+    key = PorterInterface._retrieval_key(**retrieval_params)
+    assert key == PorterInterface._retrieval_key(**dict(retrieval_params, context={'b': 2, 'a': 1}))
+    assert key != PorterInterface._retrieval_key(**dict(retrieval_params, retrieval_kits=[b'kit 1']))
+    assert key != PorterInterface._retrieval_key(**dict(retrieval_params, retrieval_kits=[b'kit 1kit 2']))
+    assert key != PorterInterface._retrieval_key(**dict(retrieval_params, bob_verifying_key=b'other key'))
+    other_map = _make_treasure_map(mocker, digest=b'other digest')
+    assert key != PorterInterface._retrieval_key(**dict(retrieval_params, treasure_map=other_map))
+    other_map = _make_treasure_map(mocker, hrac=b'other hrac')
+    assert key != PorterInterface._retrieval_key(**dict(retrieval_params, treasure_map=other_map))
+    assert PorterInterface._retrieval_key(**dict(retrieval_params, context=None)) == \
+           PorterInterface._retrieval_key(**dict(retrieval_params, context={}))
@@ -0,0 +1,189 @@
+import datetime
+import ipaddress
+import os
+import socket
+import ssl
+import threading
+import time
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+from porter.middleware import (
+    CertificateCache,
+    PorterMiddlewareClient,
+    PorterRestMiddleware,
+    ResumableSSLContext,
+)
+
+
+def test_middleware_client_uses_pooled_session():
+    middleware = PorterRestMiddleware(pool_connections=10, pool_maxsize=3, idle_timeout=30)
+    client = middleware.client
+    assert isinstance(client, PorterMiddlewareClient)
+    assert client.idle_timeout == 30
+
+    # all HTTP verbs go through the same session, and therefore the same connection pools
+    adapter = client.library.get_adapter('https://127.0.0.1:9151/ping')
+    assert adapter is client._adapter
+    assert adapter._pool_connections == 10
+    assert adapter._pool_maxsize == 3
+
+    client.close()
+
+
+def test_middleware_client_evicts_idle_connections(mocker):
+    client = PorterMiddlewareClient(idle_timeout=30)
+    pool_manager = client._adapter.poolmanager
+    pool_manager.connection_from_host('127.0.0.1', 9151, scheme='https')
+    pool_manager.connection_from_host('127.0.0.1', 9152, scheme='https')
+    assert len(pool_manager.pools) == 2
+
+    method = mocker.Mock()
+    client._execute_method(None, '127.0.0.1', 9151, method, 'https://127.0.0.1:9151/ping')
+    client._execute_method(None, '127.0.0.1', 9152, method, 'https://127.0.0.1:9152/ping')
+    assert method.call_count == 2
+
+    # nothing is idle yet
+    assert client.evict_idle_connections() == 0
+    assert len(pool_manager.pools) == 2
+
+    # one interface goes idle
+    client._last_used[('127.0.0.1', 9151)] = time.monotonic() - 31
+    assert client.evict_idle_connections() == 1
+    remaining = {(pool_key.key_host, pool_key.key_port) for pool_key in pool_manager.pools.keys()}
+    assert remaining == {('127.0.0.1', 9152)}
+
+    client.close()
+
+
+def _make_self_signed_certificate(host: str):
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, host)])
+    now = datetime.datetime.utcnow()
+    certificate = (x509.CertificateBuilder()
+                   .subject_name(name)
+                   .issuer_name(name)
+                   .public_key(private_key.public_key())
+                   .serial_number(x509.random_serial_number())
+                   .not_valid_before(now - datetime.timedelta(days=1))
+                   .not_valid_after(now + datetime.timedelta(days=1))
+                   .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address(host))]),
+                                  critical=False)
+                   .sign(private_key, hashes.SHA256()))
+    return private_key, certificate
+
+
+def test_certificate_cache(tmp_path):
+    cache = CertificateCache(certificates_dir=tmp_path / 'certificates', max_certificates=2)
+    assert len(cache) == 0
+
+    _, certificate = _make_self_signed_certificate('127.0.0.1')
+    filepath = cache.store_node_certificate(certificate=certificate, port=9151)
+    assert filepath == cache.generate_certificate_filepath(host='127.0.0.1', port=9151)
+    assert x509.load_pem_x509_certificate(filepath.read_bytes()) == certificate
+
+    # survives a restart
+    restarted_cache = CertificateCache(certificates_dir=tmp_path / 'certificates', max_certificates=2)
+    assert restarted_cache.generate_certificate_filepath(host='127.0.0.1', port=9151).exists()
+
+    # bounded - oldest certificates are removed
+    for port in (9152, 9153):
+        time.sleep(0.01)  # distinct modification times
+        cache.store_node_certificate(certificate=certificate, port=port)
+    assert len(cache) == 2
+    assert not filepath.exists()
+
+
+def test_resumable_tls_adapter_gives_each_pool_its_own_context():
+    client = PorterMiddlewareClient()
+    pool_manager = client._adapter.poolmanager
+    first_pool = client._adapter._with_resumable_tls(pool_manager.connection_from_host('127.0.0.1', 9151, scheme='https'))
+    second_pool = client._adapter._with_resumable_tls(pool_manager.connection_from_host('127.0.0.1', 9152, scheme='https'))
+    first_context = first_pool.conn_kw['ssl_context']
+    assert isinstance(first_context, ResumableSSLContext)
+    assert isinstance(second_pool.conn_kw['ssl_context'], ResumableSSLContext)
+    assert second_pool.conn_kw['ssl_context'] is not first_context
+
+    # context is kept for the lifetime of the pool
+    same_pool = client._adapter._with_resumable_tls(pool_manager.connection_from_host('127.0.0.1', 9151, scheme='https'))
+    assert same_pool.conn_kw['ssl_context'] is first_context
+    client.close()
+
+
+def test_resumable_tls_adapter_replaces_context_when_certificate_changes(tmp_path, mocker):
+    _, certificate = _make_self_signed_certificate('127.0.0.1')
+    certificate_filepath = tmp_path / 'certificate.pem'
+    certificate_filepath.write_bytes(certificate.public_bytes(serialization.Encoding.PEM))
+
+    client = PorterMiddlewareClient()
+    adapter = client._adapter
+    pool = adapter.poolmanager.connection_from_host('127.0.0.1', 9151, scheme='https')
+    adapter.cert_verify(pool, 'https://127.0.0.1:9151', str(certificate_filepath), None)
+    context = pool.conn_kw['ssl_context']
+    assert isinstance(context, ResumableSSLContext)
+
+    # same certificate
+    adapter.cert_verify(pool, 'https://127.0.0.1:9151', str(certificate_filepath), None)
+    assert pool.conn_kw['ssl_context'] is context
+
+    # certificate refreshed; idle connections set up with the previous context are closed
+    idle_connection = mocker.Mock()
+    pool.pool.get(block=False)
+    pool.pool.put(idle_connection, block=False)
+    _, new_certificate = _make_self_signed_certificate('127.0.0.1')
+    certificate_filepath.write_bytes(new_certificate.public_bytes(serialization.Encoding.PEM))
+    os.utime(certificate_filepath, ns=(time.time_ns(), time.time_ns() + 1_000_000_000))
+    adapter.cert_verify(pool, 'https://127.0.0.1:9151', str(certificate_filepath), None)
+    assert pool.conn_kw['ssl_context'] is not context
+    assert isinstance(pool.conn_kw['ssl_context'], ResumableSSLContext)
+    idle_connection.close.assert_called_once()
+    assert pool.pool.qsize() == pool.pool.maxsize  # capacity is unchanged
+
+    # different certificate file
+    other_filepath = tmp_path / 'other.pem'
+    other_filepath.write_bytes(certificate.public_bytes(serialization.Encoding.PEM))
+    context = pool.conn_kw['ssl_context']
+    adapter.cert_verify(pool, 'https://127.0.0.1:9151', str(other_filepath), None)
+    assert pool.conn_kw['ssl_context'] is not context
+    client.close()
+
+
+def test_resumable_ssl_context_resumes_sessions(tmp_path):
+    private_key, certificate = _make_self_signed_certificate('127.0.0.1')
+    certificate_filepath = tmp_path / 'certificate.pem'
+    certificate_filepath.write_bytes(certificate.public_bytes(serialization.Encoding.PEM))
+    key_filepath = tmp_path / 'key.pem'
+    key_filepath.write_bytes(private_key.private_bytes(serialization.Encoding.PEM,
+                                                       serialization.PrivateFormat.PKCS8,
+                                                       serialization.NoEncryption()))
+
+    server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    server_context.load_cert_chain(certificate_filepath, key_filepath)
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen()
+    port = listener.getsockname()[1]
+
+    def serve(connections):
+        for _ in range(connections):
+            connection, _ = listener.accept()
+            with server_context.wrap_socket(connection, server_side=True) as tls_connection:
+                tls_connection.sendall(b'ok')
+
+    server = threading.Thread(target=serve, args=(2,), daemon=True)
+    server.start()
+
+    client_context = ResumableSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    client_context.load_verify_locations(certificate_filepath)
+    reused = []
+    for _ in range(2):
+        with client_context.wrap_socket(socket.create_connection(('127.0.0.1', port))) as tls_socket:
+            assert tls_socket.recv(2) == b'ok'
+            reused.append(tls_socket.session_reused)
+
+    server.join(timeout=5)
+    listener.close()
+    assert reused == [False, True]  # second connection used an abbreviated handshake
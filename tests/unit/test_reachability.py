@@ -0,0 +1,136 @@
+import threading
+
+import pytest
+
+from porter.concurrency import SharedExecutor
+from porter.reachability import ReachabilityTracker
+
+
+def test_reachability_check_uses_fresh_status(mocker, get_random_checksum_address):
+    learner = mocker.Mock()
+    ursula = mocker.Mock(checksum_address=get_random_checksum_address())
+    tracker = ReachabilityTracker(learner=learner, freshness_window=60)
+
+    # unknown node is pinged on demand
+    status = tracker.check(ursula)
+    assert status.reachable
+    assert status.failures == 0
+    assert status.rtt is not None
+    assert learner.network_middleware.ping.call_count == 1
+
+    # fresh status is used without pinging
+    tracker.check(ursula)
+    tracker.check(ursula)
+    assert learner.network_middleware.ping.call_count == 1
+
+    # stale status causes a new ping
+    tracker.check(ursula, max_age=0)
+    assert learner.network_middleware.ping.call_count == 2
+
+
+def test_reachability_check_unreachable(mocker, get_random_checksum_address):
+    learner = mocker.Mock()
+    learner.network_middleware.ping.side_effect = ConnectionError("node is down")
+    ursula = mocker.Mock(checksum_address=get_random_checksum_address())
+    tracker = ReachabilityTracker(learner=learner, freshness_window=60)
+
+    with pytest.raises(ReachabilityTracker.Unreachable):
+        tracker.check(ursula)
+    status = tracker.status(ursula.checksum_address)
+    assert not status.reachable
+    assert status.failures == 1
+    assert status.last_seen is None
+
+    # fresh failure is reported without pinging again
+    with pytest.raises(ReachabilityTracker.Unreachable):
+        tracker.check(ursula)
+    assert learner.network_middleware.ping.call_count == 1
+
+    # consecutive failures are counted
+    with pytest.raises(ReachabilityTracker.Unreachable):
+        tracker.check(ursula, max_age=0)
+    assert tracker.status(ursula.checksum_address).failures == 2
+
+    # success resets failures
+    learner.network_middleware.ping.side_effect = None
+    status = tracker.check(ursula, max_age=0)
+    assert status.reachable
+    assert status.failures == 0
+
+
+def test_reachability_probe_known_nodes(mocker, get_random_checksum_address):
+    ursulas = [mocker.Mock(checksum_address=get_random_checksum_address()) for _ in range(5)]
+    learner = mocker.Mock()
+    learner.known_nodes = ursulas
+    tracker = ReachabilityTracker(learner=learner, probe_interval=30, freshness_window=60)
+
+    tracker.probe_known_nodes()
+    assert len(tracker) == len(ursulas)
+    assert learner.network_middleware.ping.call_count == len(ursulas)
+
+    # nodes no longer known are dropped from the table
+    forgotten_ursula = ursulas.pop()
+    tracker.probe_known_nodes()
+    assert forgotten_ursula.checksum_address not in tracker
+    assert len(tracker) == len(ursulas)
+
+
+def test_reachability_probing_is_concurrent_and_bounded(mocker, get_random_checksum_address):
+    ursulas = [mocker.Mock(checksum_address=get_random_checksum_address()) for _ in range(6)]
+    release = threading.Event()
+    lock = threading.Lock()
+    in_flight, max_in_flight = [0], [0]
+
+    def ping(ursula):
+        with lock:
+            in_flight[0] += 1
+            max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+        release.wait(timeout=5)
+        with lock:
+            in_flight[0] -= 1
+
+    learner = mocker.Mock(known_nodes=ursulas)
+    learner.network_middleware.ping.side_effect = ping
+    executor = SharedExecutor(max_workers=8)
+    tracker = ReachabilityTracker(learner=learner, executor=executor, max_concurrent_probes=3)
+    try:
+        probing = threading.Thread(target=tracker.probe_known_nodes)
+        probing.start()
+        while learner.network_middleware.ping.call_count < 3:
+            release.wait(timeout=0.01)
+
+        # a round is skipped while the previous one is still running
+        tracker.probe_known_nodes()
+        assert learner.network_middleware.ping.call_count == 3
+
+        release.set()
+        probing.join(timeout=5)
+    finally:
+        release.set()
+        executor.shutdown(wait=True)
+
+    assert learner.network_middleware.ping.call_count == len(ursulas)
+    assert max_in_flight[0] == 3
+    assert len(tracker) == len(ursulas)
+
+
+def test_reachability_responsiveness(mocker, get_random_checksum_address):
+    tracker = ReachabilityTracker(learner=mocker.Mock())
+    fast_ursula = get_random_checksum_address()
+    slow_ursula = get_random_checksum_address()
+    flaky_ursula = get_random_checksum_address()
+    down_ursula = get_random_checksum_address()
+
+    # no measurements
+    assert tracker.responsiveness(get_random_checksum_address()) == 0.5
+
+    tracker.record_success(fast_ursula, rtt=0.01)
+    tracker.record_success(slow_ursula, rtt=2)
+    tracker.record_success(flaky_ursula, rtt=0.01)
+    tracker.record_failure(flaky_ursula)
+    tracker.record_failure(down_ursula)
+
+    assert tracker.responsiveness(fast_ursula) > tracker.responsiveness(flaky_ursula)
+    assert tracker.responsiveness(fast_ursula) > tracker.responsiveness(slow_ursula)
+    assert tracker.status(flaky_ursula).success_rate < 1
+    assert tracker.responsiveness(down_ursula) == ReachabilityTracker.MIN_RESPONSIVENESS
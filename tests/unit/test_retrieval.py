@@ -0,0 +1,407 @@
+import json
+import os
+import pickle
+import threading
+import time
+
+from eth_utils import to_checksum_address
+import pytest
+from nucypher_core import Conditions, MessageKit, ReencryptionResponse
+from nucypher_core.umbral import SecretKey, Signer, VerificationError, generate_kfrags, reencrypt
+
+from porter.caching import CFragCache
+from porter.concurrency import HedgingPolicy, LatencyTracker, SharedExecutor
+from porter.reachability import ReachabilityTracker
+from porter.retrieval import (
+    CFragVerificationPool,
+    PorterRetrievalClient,
+    ReencryptionBatcher,
+    RetrievalPlan,
+    RetrievalRequest,
+    RetrievalWorkOrder,
+    _verify_reencryption_response,
+    serialize_conditions,
+)
+
+
+def _make_capsules(quantity):
+    policy_encrypting_key = SecretKey.random().public_key()
+    return [MessageKit(policy_encrypting_key, b'plaintext', None).capsule for _ in range(quantity)]
+
+
+def _make_work_order(ursula_address, capsules, conditions=None):
+    return RetrievalWorkOrder(ursula_address=ursula_address,
+                              kit_indices=tuple(range(len(capsules))),
+                              capsules=capsules,
+                              conditions=serialize_conditions([conditions] * len(capsules)))
+
+
+def test_reencryption_batcher_merges_concurrent_work_orders(get_random_checksum_address):
+    ursula_address = get_random_checksum_address()
+    capsules = _make_capsules(3)
+    sent = []
+    lock = threading.Lock()
+
+    def send(work_order):
+        with lock:
+            sent.append(work_order)
+        return {capsule: f"cfrag for {bytes(capsule).hex()}" for capsule in work_order.capsules}
+
+    batcher = ReencryptionBatcher(window=0.5)
+    work_orders = [_make_work_order(ursula_address, [capsules[0], capsules[1]]),
+                   _make_work_order(ursula_address, [capsules[1], capsules[2]])]
+    executor = SharedExecutor(max_workers=2)
+    try:
+        futures = [executor.submit(batcher.execute, key='key', work_order=work_order, send=send)
+                   for work_order in work_orders]
+        results = [future.result() for future in futures]
+    finally:
+        executor.shutdown(wait=True)
+
+    # one request for the union of the capsules
+    assert len(sent) == 1
+    assert sent[0].ursula_address == ursula_address
+    assert set(sent[0].capsules) == set(capsules)
+    assert json.loads(str(sent[0].conditions)) == [None, None, None]
+
+    # each work order only gets the cfrags for its own capsules
+    for work_order, cfrags in zip(work_orders, results):
+        assert set(cfrags) == set(work_order.capsules)
+        for capsule in work_order.capsules:
+            assert cfrags[capsule] == f"cfrag for {bytes(capsule).hex()}"
+
+
+def test_reencryption_batcher_separates_conflicting_conditions(get_random_checksum_address):
+    ursula_address = get_random_checksum_address()
+    capsule = _make_capsules(1)[0]
+    conditions = Conditions(json.dumps({'returnValueTest': {'comparator': '>', 'value': 0}}))
+    sent = []
+
+    def send(work_order):
+        sent.append(work_order)
+        return {capsule: 'cfrag' for capsule in work_order.capsules}
+
+    batcher = ReencryptionBatcher(window=0)
+    batcher.execute(key='key', work_order=_make_work_order(ursula_address, [capsule]), send=send)
+    batcher.execute(key='key', work_order=_make_work_order(ursula_address, [capsule], conditions), send=send)
+    assert len(sent) == 2
+    assert json.loads(str(sent[1].conditions)) == [json.loads(str(conditions))]
+
+
+def test_reencryption_batcher_failures_reach_every_work_order(get_random_checksum_address):
+    ursula_address = get_random_checksum_address()
+    capsules = _make_capsules(4)
+
+    def send(work_order):
+        raise RuntimeError("Ursula is down")
+
+    # batch is sent as soon as it is full
+    batcher = ReencryptionBatcher(window=30, max_capsules=4)
+    executor = SharedExecutor(max_workers=2)
+    try:
+        futures = [executor.submit(batcher.execute,
+                                   key='key',
+                                   work_order=_make_work_order(ursula_address, capsules[index:index + 2]),
+                                   send=send)
+                   for index in (0, 2)]
+        exceptions = [future.exception(timeout=5) for future in futures]
+    finally:
+        executor.shutdown(wait=True)
+    assert all(isinstance(exception, RuntimeError) for exception in exceptions)
+
+
+def test_retrieval_hedges_slow_ursulas_and_stops_at_threshold(mocker):
+    capsules = _make_capsules(2)
+    kits = [mocker.Mock(capsule=capsule, conditions=None, queried_addresses=[]) for capsule in capsules]
+    destinations = [os.urandom(20) for _ in range(4)]
+    treasure_map = mocker.Mock(threshold=2, destinations={address: b'kfrag' for address in destinations})
+    addresses = [to_checksum_address(address) for address in destinations]
+    learner = mocker.Mock(known_nodes={address: mocker.Mock() for address in addresses})
+
+    slow_ursula = threading.Event()
+    contacted = []
+
+    def send_work_order(work_order, **kwargs):
+        contacted.append(work_order.ursula_address)
+        if len(contacted) == 1:
+            slow_ursula.wait(timeout=5)  # first Ursula contacted is slow
+        return {capsule: f"cfrag from {work_order.ursula_address}" for capsule in work_order.capsules}
+
+    executor = SharedExecutor(max_workers=4)
+    hedging = HedgingPolicy(latencies=LatencyTracker(), fallback_delay=0.1)
+    client = PorterRetrievalClient(learner=learner, executor=executor, timeout=5, hedging=hedging)
+    mocker.patch.object(client, '_ensure_ursula_availability')
+    mocker.patch.object(client, '_send_work_order', side_effect=send_work_order)
+    try:
+        started = time.monotonic()
+        results = client.retrieve_cfrags(treasure_map, kits, None, None, None)
+        elapsed = time.monotonic() - started
+        observed_latencies = len(hedging.latencies)
+    finally:
+        slow_ursula.set()
+        executor.shutdown(wait=True)
+
+    # a spare Ursula was contacted instead of waiting on the slow one; no more Ursulas than needed
+    assert elapsed < 5
+    assert len(contacted) == 3
+    slow_address = contacted[0]
+    for cfrags, errors in results:
+        assert len(cfrags) == 2
+        assert slow_address not in cfrags
+        assert not errors
+    assert observed_latencies == 2  # latencies of completed requests
+
+
+def test_batch_retrieval_shares_a_single_pass(mocker):
+    destinations = [os.urandom(20) for _ in range(3)]
+    addresses = [to_checksum_address(address) for address in destinations]
+    learner = mocker.Mock(known_nodes={address: mocker.Mock() for address in addresses})
+
+    retrieval_requests = []
+    for threshold, num_kits in ((1, 2), (3, 1)):
+        kits = [mocker.Mock(capsule=capsule, conditions=None, queried_addresses=[])
+                for capsule in _make_capsules(num_kits)]
+        treasure_map = mocker.Mock(threshold=threshold, destinations={address: b'kfrag' for address in destinations})
+        retrieval_requests.append(RetrievalRequest(treasure_map=treasure_map,
+                                                   retrieval_kits=kits,
+                                                   alice_verifying_key=None,
+                                                   bob_encrypting_key=None,
+                                                   bob_verifying_key=None,
+                                                   context=dict()))
+
+    def send_work_order(work_order, **kwargs):
+        if work_order.ursula_address == addresses[0]:
+            raise RuntimeError("Ursula is down")
+        return {capsule: f"cfrag from {work_order.ursula_address}" for capsule in work_order.capsules}
+
+    executor = SharedExecutor(max_workers=2)
+    client = PorterRetrievalClient(learner=learner, executor=executor, timeout=5)
+    mocker.patch.object(client, '_ensure_ursula_availability')
+    mocker.patch.object(client, '_send_work_order', side_effect=send_work_order)
+    try:
+        results = list(client.iter_retrieve_cfrags_batch(retrieval_requests))
+    finally:
+        executor.shutdown(wait=True)
+
+    # every kit of every request is reported exactly once
+    assert sorted((request_index, kit_index) for request_index, kit_index, _, _ in results) == [(0, 0), (0, 1), (1, 0)]
+    for request_index, kit_index, cfrags, errors in results:
+        if request_index == 0:
+            assert len(cfrags) == 1
+            assert set(cfrags) | set(errors) <= set(addresses)
+        else:
+            # threshold can't be reached with an Ursula down
+            assert len(cfrags) == 2
+            assert set(errors) == {addresses[0]}
+
+
+def test_cached_cfrags_are_not_retrieved_again(mocker):
+    kits = [mocker.Mock(capsule=capsule, conditions=None, queried_addresses=[]) for capsule in _make_capsules(2)]
+    destinations = [os.urandom(20) for _ in range(3)]
+    treasure_map = mocker.Mock(threshold=2, hrac=b'hrac', destinations={address: b'kfrag' for address in destinations})
+    addresses = [to_checksum_address(address) for address in destinations]
+    learner = mocker.Mock(known_nodes={address: mocker.Mock() for address in addresses})
+
+    def send_work_order(work_order, **kwargs):
+        return {capsule: f"cfrag from {work_order.ursula_address}" for capsule in work_order.capsules}
+
+    executor = SharedExecutor(max_workers=2)
+    client = PorterRetrievalClient(learner=learner, executor=executor, timeout=5, cfrag_cache=CFragCache())
+    mocker.patch.object(client, '_ensure_ursula_availability')
+    send = mocker.patch.object(client, '_send_work_order', side_effect=send_work_order)
+    try:
+        results = client.retrieve_cfrags(treasure_map, kits, None, b'bob encrypting key', None)
+        assert send.call_count == 2
+        assert client.cfrag_cache.stats().size == 4
+
+        # same capsules and Bob; Ursulas are only contacted for capsules that weren't retrieved yet
+        cached_results = client.retrieve_cfrags(treasure_map, kits, None, b'bob encrypting key', None)
+        assert cached_results == results
+        assert send.call_count == 2
+
+        new_kit = mocker.Mock(capsule=_make_capsules(1)[0], conditions=None, queried_addresses=[])
+        client.retrieve_cfrags(treasure_map, [kits[0], new_kit], None, b'bob encrypting key', None)
+        assert send.call_count == 4
+        assert all(call.kwargs['work_order'].capsules == [new_kit.capsule] for call in send.call_args_list[2:])
+
+        # different context
+        client.retrieve_cfrags(treasure_map, kits, None, b'bob encrypting key', None, a=1)
+        assert send.call_count == 6
+    finally:
+        executor.shutdown(wait=True)
+
+
+def test_treasure_map_destinations_are_resolved_once(mocker):
+    destinations = {os.urandom(20): f"kfrag {index}" for index in range(3)}
+    treasure_map = mocker.Mock(threshold=2, destinations=destinations)
+    addresses = [to_checksum_address(address) for address in destinations]
+    known_nodes = mocker.MagicMock(checksum='fleet state 1')
+    known_nodes.__contains__.side_effect = lambda address: address in addresses[:2]
+    known_nodes.__getitem__.side_effect = lambda address: f"ursula {address}"
+    client = PorterRetrievalClient(learner=mocker.Mock(known_nodes=known_nodes), executor=mocker.Mock())
+
+    resolved = client._resolve_treasure_map(treasure_map)
+    assert resolved.destinations == dict(zip(addresses, destinations.values()))
+    assert client._resolve_ursulas(treasure_map) == {address: f"ursula {address}" for address in addresses[:2]}
+    client._ensure_ursula_availability(treasure_map)  # enough Ursulas are known
+
+    # the same treasure map is not resolved again
+    treasure_map.destinations = dict()
+    assert client._resolve_treasure_map(treasure_map).destinations == resolved.destinations
+    assert client._resolve_ursulas(treasure_map) == {address: f"ursula {address}" for address in addresses[:2]}
+    assert known_nodes.__getitem__.call_count == 2
+
+    # Ursulas are resolved again once the fleet state changes
+    known_nodes.checksum = 'fleet state 2'
+    known_nodes.__contains__.side_effect = lambda address: address in addresses
+    assert set(client._resolve_ursulas(treasure_map)) == set(addresses)
+    assert known_nodes.__getitem__.call_count == 5
+
+
+def test_retrieval_plan_counts_queried_addresses(mocker):
+    destinations = [os.urandom(20) for _ in range(4)]
+    addresses = [to_checksum_address(address) for address in destinations]
+    treasure_map = mocker.Mock(threshold=2, destinations={address: b'kfrag' for address in destinations})
+    capsules = _make_capsules(3)
+    kits = [mocker.Mock(capsule=capsules[0], conditions=None, queried_addresses=destinations[:2]),  # done
+            mocker.Mock(capsule=capsules[1], conditions=None, queried_addresses=destinations[:1]),
+            mocker.Mock(capsule=capsules[2], conditions=None, queried_addresses=[])]
+
+    plan = RetrievalPlan(treasure_map=treasure_map, retrieval_kits=kits)
+    assert not plan.is_complete()
+    # Ursulas queried before are selected last
+    assert set(plan._destinations[:2]) == set(addresses[2:])
+
+    work_orders = [plan.next_work_order(), plan.next_work_order()]
+    assert plan.next_work_order() is None
+    assert {work_order.ursula_address for work_order in work_orders} == set(addresses[2:])
+    # the completed kit is never requested, the partially queried kit only needs one more cfrag
+    assert sorted(index for work_order in work_orders for index in work_order.kit_indices) == [1, 2, 2]
+
+    # the completed kit is reported first
+    assert [index for index, _, _ in plan.pop_results()] == [0]
+    for work_order in work_orders:
+        plan.update(work_order, {capsule: f"cfrag from {work_order.ursula_address}" for capsule in work_order.capsules})
+    assert plan.is_complete()
+    results = plan.pop_results()
+    assert [index for index, _, _ in results] == [1, 2]  # in the order of the kits
+    assert len(results[1][1]) == 2
+
+
+def test_retrieval_plan_runs_out_of_destinations(mocker):
+    destinations = [os.urandom(20) for _ in range(3)]
+    treasure_map = mocker.Mock(threshold=2, destinations={address: b'kfrag' for address in destinations})
+    kits = [mocker.Mock(capsule=capsule, conditions=None, queried_addresses=destinations[:1])
+            for capsule in _make_capsules(2)]
+
+    plan = RetrievalPlan(treasure_map=treasure_map, retrieval_kits=kits)
+    first_order = plan.next_work_order()
+    assert first_order.kit_indices == (0, 1)
+    assert plan.next_work_order() is None  # one more cfrag is enough, and it is outstanding
+
+    plan.update_errors(first_order, "failed")
+    second_order = plan.next_work_order()
+    assert second_order.ursula_address != first_order.ursula_address
+    plan.update(second_order, {kit.capsule: 'cfrag' for kit in kits})
+    assert plan.is_complete()
+
+    # no destinations left once every Ursula failed
+    plan = RetrievalPlan(treasure_map=treasure_map, retrieval_kits=kits)
+    for _ in range(2):
+        plan.update_errors(plan.next_work_order(), "failed")
+    assert plan.next_work_order() is None
+    assert not plan.is_complete()
+    assert plan.pop_results(completed_only=True) == []
+    results = plan.pop_results(completed_only=False)
+    assert [index for index, _, _ in results] == [0, 1]
+    assert all(not cfrags and len(errors) == 2 for _, cfrags, errors in results)
+
+
+def test_retrieval_plan_prefers_responsive_ursulas(mocker):
+    kits = [mocker.Mock(capsule=capsule, conditions=None, queried_addresses=[]) for capsule in _make_capsules(1)]
+    destinations = [os.urandom(20) for _ in range(5)]
+    treasure_map = mocker.Mock(threshold=2, destinations={address: b'kfrag' for address in destinations})
+    unreachable, slow, fast, fastest, unmeasured = [to_checksum_address(address) for address in destinations]
+
+    reachability = ReachabilityTracker(learner=mocker.Mock())
+    reachability.record_success(fastest, rtt=0.01)
+    reachability.record_success(fast, rtt=0.1)
+    reachability.record_success(slow, rtt=2)
+    reachability.record_failure(unreachable)
+
+    plan = RetrievalPlan(treasure_map=treasure_map, retrieval_kits=kits, reachability=reachability)
+    assert plan._destinations == [fastest, fast, unmeasured, slow, unreachable]
+
+    # the fastest threshold Ursulas are contacted first
+    first_order, second_order = plan.next_work_order(), plan.next_work_order()
+    assert [first_order.ursula_address, second_order.ursula_address] == [fastest, fast]
+    assert plan.next_work_order() is None
+
+    # the unreachable Ursula is only used as a last resort
+    for address in (fastest, fast):
+        plan.update_errors(RetrievalWorkOrder(address, (0,), [], None), "failed")
+    assert [plan.next_work_order().ursula_address for _ in range(2)] == [unmeasured, slow]
+    plan.update_errors(RetrievalWorkOrder(unmeasured, (0,), [], None), "failed")
+    assert plan.next_work_order().ursula_address == unreachable
+
+
+def test_cfrag_verification_pool():
+    alice_signing_key, delegating_key, bob_key, ursula_signing_key = (SecretKey.random() for _ in range(4))
+    policy_encrypting_key = delegating_key.public_key()
+    kfrag = generate_kfrags(delegating_sk=delegating_key,
+                            receiving_pk=bob_key.public_key(),
+                            signer=Signer(alice_signing_key),
+                            threshold=1,
+                            shares=1,
+                            sign_delegating_key=True,
+                            sign_receiving_key=True)[0]
+    capsules = [MessageKit(policy_encrypting_key, b'plaintext', None).capsule for _ in range(3)]
+    cfrags = [reencrypt(capsule=capsule, kfrag=kfrag) for capsule in capsules]
+    response = ReencryptionResponse(signer=Signer(ursula_signing_key), capsules_and_vcfrags=list(zip(capsules, cfrags)))
+
+    verification_pool = CFragVerificationPool(max_workers=1)
+    try:
+        verified_cfrags = verification_pool.verify(response=bytes(response),
+                                                   capsules=capsules,
+                                                   alice_verifying_key=alice_signing_key.public_key(),
+                                                   ursula_verifying_key=ursula_signing_key.public_key(),
+                                                   policy_encrypting_key=policy_encrypting_key,
+                                                   bob_encrypting_key=bob_key.public_key())
+        assert [bytes(cfrag) for cfrag in verified_cfrags] == [bytes(cfrag) for cfrag in cfrags]
+
+        # signed by someone other than the Ursula
+        with pytest.raises(ValueError, match="ReencryptionResponse verification failed"):
+            verification_pool.verify(response=bytes(response),
+                                     capsules=capsules,
+                                     alice_verifying_key=alice_signing_key.public_key(),
+                                     ursula_verifying_key=SecretKey.random().public_key(),
+                                     policy_encrypting_key=policy_encrypting_key,
+                                     bob_encrypting_key=bob_key.public_key())
+
+
+        with pytest.raises(CFragVerificationPool.InvalidResponse):
+            verification_pool.verify(response=b'not a response',
+                                     capsules=capsules,
+                                     alice_verifying_key=alice_signing_key.public_key(),
+                                     ursula_verifying_key=ursula_signing_key.public_key(),
+                                     policy_encrypting_key=policy_encrypting_key,
+                                     bob_encrypting_key=bob_key.public_key())
+    finally:
+        verification_pool.shutdown()
+
+
+def test_cfrag_verification_errors_survive_worker_process(mocker):
+    response = mocker.Mock()
+    response.verify.side_effect = VerificationError("Invalid capsule frag")
+    mocker.patch('porter.retrieval.ReencryptionResponse.from_bytes', return_value=response)
+    keys = [bytes(SecretKey.random().public_key()) for _ in range(4)]
+
+    # umbral's VerificationError can't be pickled, so it is sent back as a stand-in
+    with pytest.raises(CFragVerificationPool.CFragVerificationFailed, match="Invalid capsule frag") as exc_info:
+        _verify_reencryption_response(b'response', [], *keys)
+    assert pickle.loads(pickle.dumps(exc_info.value)).args == ("Invalid capsule frag",)
+
+    # other exceptions are left as they are
+    response.verify.side_effect = ValueError("ReencryptionResponse verification failed")
+    with pytest.raises(ValueError, match="ReencryptionResponse verification failed"):
+        _verify_reencryption_response(b'response', [], *keys)
@@ -0,0 +1,229 @@
+from collections import Counter
+
+import pytest
+
+from porter.sampling import (
+    AliasReservoir,
+    AliasSampler,
+    KnownNodesSnapshotCache,
+    SamplingSnapshotCache,
+    StakingProvidersSnapshotCache,
+    WarmSamplePool
+)
+from porter.reachability import ReachabilityTracker
+
+
+def _draw_all(reservoir):
+    values = []
+    value = reservoir()
+    while value is not None:
+        values.append(value)
+        value = reservoir()
+    return values
+
+
+def test_staking_providers_snapshot_cache_keyed_on_block(mocker, get_random_checksum_address):
+    staking_providers = {get_random_checksum_address(): i + 1 for i in range(10)}
+    application_agent = mocker.Mock()
+    application_agent.get_all_active_staking_providers.return_value = (sum(staking_providers.values()),
+                                                                       staking_providers)
+    application_agent.blockchain.client.block_number = 1
+    cache = StakingProvidersSnapshotCache(application_agent=application_agent)
+
+    snapshot = cache.snapshot()
+    assert snapshot.key == 1
+    assert snapshot.sampler.weights == staking_providers
+
+    # same block - no contract reads
+    cache.snapshot()
+    cache.make_reservoir()
+    assert application_agent.get_all_active_staking_providers.call_count == 1
+
+    # new block
+    application_agent.blockchain.client.block_number = 2
+    snapshot = cache.snapshot()
+    assert snapshot.key == 2
+    assert application_agent.get_all_active_staking_providers.call_count == 2
+
+
+def test_staking_providers_snapshot_cache_ttl(mocker, get_random_checksum_address):
+    staking_providers = {get_random_checksum_address(): 1 for _ in range(10)}
+    application_agent = mocker.Mock()
+    application_agent.get_all_active_staking_providers.return_value = (len(staking_providers), staking_providers)
+    cache = StakingProvidersSnapshotCache(application_agent=application_agent, ttl=60)
+
+    cache.snapshot()
+    cache.snapshot()
+    assert application_agent.get_all_active_staking_providers.call_count == 1
+
+    # expired
+    cache.ttl = 0
+    cache.snapshot()
+    assert application_agent.get_all_active_staking_providers.call_count == 2
+
+
+def test_staking_providers_snapshot_cache_reservoir_filters(mocker, get_random_checksum_address):
+    addresses = [get_random_checksum_address() for _ in range(10)]
+    staking_providers = {address: 1 for address in addresses}
+    application_agent = mocker.Mock()
+    application_agent.get_all_active_staking_providers.return_value = (len(staking_providers), staking_providers)
+    application_agent.blockchain.client.block_number = 1
+    cache = StakingProvidersSnapshotCache(application_agent=application_agent)
+
+    include_addresses = addresses[:2]
+    exclude_addresses = addresses[2:5]
+    reservoir = cache.make_reservoir(exclude_addresses=exclude_addresses, include_addresses=include_addresses)
+    drawn = _draw_all(reservoir)
+
+    # included addresses come first, and there are no repeats
+    assert drawn[:2] == include_addresses
+    assert len(drawn) == len(set(drawn)) == len(addresses) - len(exclude_addresses)
+    assert not set(drawn).intersection(exclude_addresses)
+
+    # cached snapshot is not modified by filtering
+    assert cache.snapshot().sampler.weights == staking_providers
+
+
+def test_known_nodes_snapshot_cache_keyed_on_fleet_state(mocker, get_random_checksum_address):
+    ursulas = [mocker.Mock(checksum_address=get_random_checksum_address()) for _ in range(5)]
+    learner = mocker.Mock()
+    learner.known_nodes = mocker.MagicMock()
+    learner.known_nodes.__iter__.side_effect = lambda: iter(ursulas)
+    learner.known_nodes.checksum = "fleet_state_1"
+    cache = KnownNodesSnapshotCache(learner=learner)
+
+    snapshot = cache.snapshot()
+    assert snapshot.sampler.weights == {ursula.checksum_address: 1 for ursula in ursulas}
+    assert cache.snapshot() is snapshot
+
+    # fleet state changed
+    ursulas.append(mocker.Mock(checksum_address=get_random_checksum_address()))
+    learner.known_nodes.checksum = "fleet_state_2"
+    snapshot = cache.snapshot()
+    assert len(snapshot.sampler) == len(ursulas)
+
+
+def test_sampling_snapshot_cache_is_abstract():
+    class IncompleteSnapshotCache(SamplingSnapshotCache):
+        def _current_key(self):
+            return None
+
+    # fails on construction, rather than on the first sample
+    with pytest.raises(TypeError):
+        SamplingSnapshotCache()
+    with pytest.raises(TypeError):
+        IncompleteSnapshotCache()
+
+
+def test_alias_sampler_distribution():
+    weighted_elements = {'a': 1, 'b': 2, 'c': 7, 'd': 0}
+    sampler = AliasSampler(weighted_elements)
+    assert len(sampler) == 3
+    assert 'd' not in sampler  # zero weight is never drawn
+
+    num_draws = 20000
+    counts = Counter(sampler.draw() for _ in range(num_draws))
+    assert set(counts) == {'a', 'b', 'c'}
+    for element, expected_share in (('a', 0.1), ('b', 0.2), ('c', 0.7)):
+        assert abs(counts[element] / num_draws - expected_share) < 0.03
+
+
+def test_alias_reservoir(get_random_checksum_address):
+    addresses = [get_random_checksum_address() for _ in range(20)]
+    sampler = AliasSampler({address: i + 1 for i, address in enumerate(addresses)})
+
+    include_addresses = addresses[:3]
+    exclude_addresses = addresses[3:8]
+    reservoir = AliasReservoir(sampler=sampler,
+                               include_addresses=include_addresses,
+                               exclude_addresses=exclude_addresses)
+    assert len(reservoir) == len(addresses) - len(exclude_addresses)
+
+    drawn = _draw_all(reservoir)
+    assert drawn[:3] == include_addresses
+    assert len(drawn) == len(set(drawn)) == len(addresses) - len(exclude_addresses)
+    assert not set(drawn).intersection(exclude_addresses)
+    assert len(reservoir) == 0
+
+    # heavily skewed weights force re-tabling of the remaining values
+    sampler = AliasSampler({'heavy': 10**9, 'light_1': 1, 'light_2': 1})
+    reservoir = AliasReservoir(sampler=sampler, exclude_addresses=['heavy'])
+    assert set(_draw_all(reservoir)) == {'light_1', 'light_2'}
+
+
+def test_warm_sample_pool(mocker, get_random_checksum_address):
+    def sampler(quantity):
+        return [mocker.Mock(checksum_address=get_random_checksum_address()) for _ in range(quantity)]
+
+    sampler_spy = mocker.Mock(side_effect=sampler)
+    pool = WarmSamplePool(sampler=sampler_spy, quantities=[3, 5], depth=2)
+    assert pool.quantities == [3, 5]
+
+    # nothing sampled yet
+    assert pool.take(3) is None
+
+    pool.refill()
+    assert len(pool) == 4
+    assert sampler_spy.call_count == 4
+
+    # unconfigured quantity
+    assert pool.take(4) is None
+
+    # each sample is only handed out once
+    first_sample = pool.take(3)
+    second_sample = pool.take(3)
+    assert len(first_sample) == len(second_sample) == 3
+    assert first_sample != second_sample
+    assert pool.take(3) is None
+    assert len(pool.take(5)) == 5
+
+    # stale samples are discarded
+    pool.refill()
+    pool.max_age = 0
+    assert pool.take(3) is None
+
+
+def test_warm_sample_pool_discards_unreachable(mocker, get_random_checksum_address):
+    learner = mocker.Mock()
+    reachability = ReachabilityTracker(learner=learner)
+    unreachable_address = get_random_checksum_address()
+    samples = [
+        [mocker.Mock(checksum_address=unreachable_address)],
+        [mocker.Mock(checksum_address=get_random_checksum_address())],
+    ]
+    pool = WarmSamplePool(sampler=mocker.Mock(side_effect=samples),
+                          quantities=[1],
+                          depth=2,
+                          reachability=reachability)
+    pool.refill()
+
+    reachability.record_failure(unreachable_address)
+    ursulas_info = pool.take(1)
+    assert ursulas_info == samples[1]
+
+
+def test_responsive_sampler(mocker):
+    application_agent = mocker.Mock()
+    application_agent.get_all_active_staking_providers.return_value = (4, {'fast': 2, 'slow': 2})
+    application_agent.blockchain.client.block_number = 1
+    cache = StakingProvidersSnapshotCache(application_agent=application_agent)
+
+    responsiveness = mocker.Mock(side_effect=lambda address: 0.9 if address == 'fast' else 0.1)
+    sampler = cache.responsive_sampler(responsiveness)
+    assert sampler.weights == {'fast': 2 * 0.9, 'slow': 2 * 0.1}
+
+    # table is reused while recent
+    assert cache.responsive_sampler(responsiveness) is sampler
+    assert responsiveness.call_count == 2
+
+    num_draws = 5000
+    counts = Counter(sampler.draw() for _ in range(num_draws))
+    assert abs(counts['fast'] / num_draws - 0.9) < 0.03
+
+    # stake weighting still applies to the reservoir
+    reservoir = cache.make_reservoir(responsiveness=responsiveness)
+    assert set(_draw_all(reservoir)) == {'fast', 'slow'}
+
+    # new snapshot results in a new table
+    application_agent.blockchain.client.block_number = 2
+    assert cache.responsive_sampler(responsiveness) is not sampler
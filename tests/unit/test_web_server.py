@@ -1,11 +1,15 @@
 import json
 
+import msgpack
 import sys
 from flask import Response, request
+from nucypher_core.umbral import SecretKey
 
 from nucypher.control.controllers import WebController
 from nucypher.utilities.concurrency import WorkerPoolException
 
+from porter.controllers import MSGPACK_CONTENT_TYPE, PorterWebController, PorterWebEmitter, StreamedResponse
+from porter.fields.base import raw_bytes_representation
 from porter.interfaces import PorterInterface
 
 
@@ -61,3 +65,99 @@ def test_web_controller_handling_worker_pool_exception(mocker):
         # remove checked entry
         values.remove(failure['value'])
         errors.remove(failure['error'])
+
+
+def test_web_emitter_streams_records():
+    def records():
+        yield {'retrieval_kit_index': 1}
+        yield {'retrieval_kit_index': 0}
+        raise ValueError("Ursulas went away")
+
+    emitter = PorterWebEmitter(crash_on_error=False)
+    response = emitter.respond(json_response=StreamedResponse(records=records()))
+    assert response.status_code == 200
+    assert response.mimetype == PorterWebEmitter.STREAMED_CONTENT_TYPE
+
+    # records are sent as they are produced; a failure ends the stream with an error record
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line['result'] for line in lines[:2]] == [{'retrieval_kit_index': 1}, {'retrieval_kit_index': 0}]
+    assert lines[2]['result'] == {'failure_message': "Ursulas went away"}
+    assert all(line['version'] == lines[0]['version'] for line in lines)
+
+
+def test_web_emitter_interrupted_msgpack_stream():
+    def records():
+        yield {'retrieval_kit_index': 0}
+        raise RuntimeError()
+
+    emitter = PorterWebEmitter(crash_on_error=False)
+    with raw_bytes_representation():
+        response = emitter.respond(json_response=StreamedResponse(records=records()))
+    assert response.status_code == 200
+    assert response.mimetype == MSGPACK_CONTENT_TYPE
+
+    # the stream is cut off after the first record, and ends with an error record in the same envelope
+    unpacker = msgpack.Unpacker(raw=False)
+    unpacker.feed(response.get_data())
+    records = list(unpacker)
+    assert len(records) == 2
+    assert records[0]['result'] == {'retrieval_kit_index': 0}
+    assert records[1]['result'] == {'failure_message': "RuntimeError"}
+    assert records[1]['version'] == records[0]['version']
+
+
+def test_web_controller_msgpack_wire_format(mocker, get_random_checksum_address):
+    encrypting_key = SecretKey.random().public_key()
+    ursula_info = mocker.Mock(checksum_address=get_random_checksum_address(),
+                              uri="https://127.0.0.1:9151",
+                              encrypting_key=encrypting_key)
+    interface_impl = mocker.Mock()
+    interface_impl.get_ursulas.return_value = [ursula_info]
+    controller = PorterWebController(app_name="web_controller_app_test",
+                                     crash_on_error=False,
+                                     interface=PorterInterface(porter=interface_impl))
+    control_transport = controller.make_control_transport()
+
+    @control_transport.route('/get_ursulas', methods=['GET'])
+    def get_ursulas() -> Response:
+        response = controller(method_name='get_ursulas', control_request=request)
+        return response
+
+    client = controller.test_client()
+    exclude_ursula = get_random_checksum_address()
+    msgpack_params = msgpack.packb({'quantity': 1, 'exclude_ursulas': [exclude_ursula]}, use_bin_type=True)
+
+    # msgpack in, msgpack out
+    response = client.get('/get_ursulas',
+                          data=msgpack_params,
+                          headers={'Content-Type': MSGPACK_CONTENT_TYPE, 'Accept': MSGPACK_CONTENT_TYPE})
+    assert response.status_code == 200
+    assert response.mimetype == MSGPACK_CONTENT_TYPE
+    interface_impl.get_ursulas.assert_called_with(quantity=1,
+                                                  exclude_ursulas=[exclude_ursula],
+                                                  include_ursulas=None,
+                                                  latency_aware=False)
+    ursulas = msgpack.unpackb(response.data, raw=False)['result']['ursulas']
+    assert ursulas[0]['encrypting_key'] == bytes(encrypting_key)  # raw bytes, not hex
+
+    # msgpack in, JSON out by default
+    response = client.get('/get_ursulas', data=msgpack_params, headers={'Content-Type': MSGPACK_CONTENT_TYPE})
+    assert response.status_code == 200
+    ursulas = json.loads(response.data)['result']['ursulas']
+    assert ursulas[0]['encrypting_key'] == bytes(encrypting_key).hex()
+
+    # JSON in, msgpack out
+    response = client.get('/get_ursulas', data=json.dumps({'quantity': 1}), headers={'Accept': MSGPACK_CONTENT_TYPE})
+    assert response.status_code == 200
+    assert msgpack.unpackb(response.data, raw=False)['result']['ursulas'][0]['checksum_address'] == ursula_info.checksum_address
+
+    # invalid msgpack
+    response = client.get('/get_ursulas', data=b'\xc1', headers={'Content-Type': MSGPACK_CONTENT_TYPE})
+    assert response.status_code == 400
+
+    # query string parameters override the body, the same way for JSON and msgpack requests
+    for data, headers in ((json.dumps({'quantity': 1}), {}),
+                          (msgpack.packb({'quantity': 1}), {'Content-Type': MSGPACK_CONTENT_TYPE})):
+        response = client.get('/get_ursulas?quantity=2', data=data, headers=headers)
+        assert response.status_code == 200
+        assert interface_impl.get_ursulas.call_args.kwargs['quantity'] == 2